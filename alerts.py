@@ -0,0 +1,354 @@
+"""
+Luật cảnh báo chạy trên luồng mẫu: ngưỡng kéo dài và xu hướng (rò rỉ bộ nhớ).
+
+Các loại luật (metric là 'cpu' theo % hoặc 'ram' theo MB):
+- above: giá trị > threshold liên tục trong duration_s giây ("CPU > 80% trong 5 phút").
+- slope: độ dốc hồi quy tuyến tính trong cửa sổ trượt window_s giây > threshold (đơn vị/giờ),
+  ví dụ "RSS tăng > 50 MB/h trong 1 giờ" để phát hiện rò rỉ.
+- baseline: giá trị > phân vị threshold (ví dụ 99) của chính lịch sử process đó, liên tục
+  trong duration_s giây ("RSS vượt baseline p99").
+
+Mọi cập nhật là O(1) cho mỗi mẫu. Các tổng hợp theo cửa sổ được dùng chung giữa các luật:
+mỗi process chỉ có một SlidingRegression cho mỗi (metric, window_s) và một QuantileSketch
+cho mỗi metric, dù có bao nhiêu luật dùng tới. Phân vị baseline được tính lại mỗi
+BASELINE_REFRESH_S giây thay vì mỗi mẫu. Mỗi luật chỉ giữ thêm hai giá trị cho mỗi process
+(thời điểm điều kiện bắt đầu đúng và đang cảnh báo hay không).
+
+Luật được lưu ra file JSON cạnh file luật auto-attach. Module này không import Qt.
+"""
+import json
+import os
+import time
+from collections import deque
+
+from rules import default_rules_path
+
+ALERTS_FILENAME = "alerts.json"
+ALERT_LOG_FILENAME = "alerts.log"
+ALERT_KINDS = ('above', 'slope', 'baseline')
+ALERT_METRICS = {'cpu': ("CPU", "%"), 'ram': ("RAM", "MB")}
+METRIC_INDEX = {'cpu': 1, 'ram': 2}  # Vị trí trong mẫu (timestamp, cpu, ram[, phụ])
+BASELINE_REFRESH_S = 10.0
+BASELINE_MIN_SAMPLES = 100  # Chưa đủ mẫu thì chưa có baseline
+SLOPE_MIN_COVERAGE = 0.5  # Cửa sổ phải có dữ liệu ít nhất nửa window_s mới tính độ dốc
+SLOPE_REBASE_SAMPLES = 10000  # Tính lại các tổng từ deque sau chừng này mẫu để tránh sai số tích lũy
+
+
+def default_alerts_path():
+    """Đường dẫn file luật cảnh báo mặc định (cùng thư mục với file luật auto-attach)."""
+    return os.path.join(os.path.dirname(default_rules_path()), ALERTS_FILENAME)
+
+
+def default_alert_log_path():
+    return os.path.join(os.path.dirname(default_rules_path()), ALERT_LOG_FILENAME)
+
+
+def _format_duration(seconds):
+    if seconds >= 3600 and seconds % 3600 == 0:
+        return f"{seconds // 3600:g} h"
+    if seconds >= 60 and seconds % 60 == 0:
+        return f"{seconds // 60:g} min"
+    return f"{seconds:g} s"
+
+
+class AlertRule:
+    """Một luật cảnh báo. name_contains để trống: áp dụng cho mọi process."""
+
+    def __init__(self, rule_id, kind, metric, threshold, duration_s=0.0, window_s=3600.0, name_contains=""):
+        if kind not in ALERT_KINDS:
+            raise ValueError(f"unknown alert kind '{kind}'")
+        if metric not in ALERT_METRICS:
+            raise ValueError(f"unknown metric '{metric}'")
+        self.rule_id = rule_id
+        self.kind = kind
+        self.metric = metric
+        self.threshold = threshold
+        self.duration_s = duration_s
+        self.window_s = window_s
+        self.name_contains = name_contains
+        self._name_lower = name_contains.lower()
+
+    def applies_to(self, name):
+        return not self._name_lower or self._name_lower in name.lower()
+
+    def describe(self):
+        label, unit = ALERT_METRICS[self.metric]
+        if self.kind == 'above':
+            text = f"{label} > {self.threshold:g} {unit}"
+        elif self.kind == 'slope':
+            text = f"{label} slope > {self.threshold:g} {unit}/h over {_format_duration(self.window_s)}"
+        else:
+            text = f"{label} above p{self.threshold:g} baseline"
+        if self.duration_s:
+            text += f" for {_format_duration(self.duration_s)}"
+        if self.name_contains:
+            text += f" (name ~ '{self.name_contains}')"
+        return text
+
+    def to_dict(self):
+        return {
+            'id': self.rule_id,
+            'kind': self.kind,
+            'metric': self.metric,
+            'threshold': self.threshold,
+            'duration_s': self.duration_s,
+            'window_s': self.window_s,
+            'name_contains': self.name_contains,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['id'], data['kind'], data['metric'], data['threshold'], data.get('duration_s', 0.0),
+                   data.get('window_s', 3600.0), data.get('name_contains', ""))
+
+
+def default_alert_rules():
+    """Các luật dùng khi chưa có file luật cảnh báo."""
+    return [
+        AlertRule(1, 'above', 'cpu', 80.0, duration_s=300.0),
+        AlertRule(2, 'slope', 'ram', 50.0, window_s=3600.0),
+        AlertRule(3, 'baseline', 'ram', 99.0, duration_s=300.0),
+    ]
+
+
+def load_alert_rules(path=None):
+    """Đọc luật cảnh báo từ file JSON. File chưa tồn tại thì dùng default_alert_rules()."""
+    path = path or default_alerts_path()
+    try:
+        with open(path, encoding='utf-8') as f:
+            return [AlertRule.from_dict(item) for item in json.load(f)]
+    except FileNotFoundError:
+        return default_alert_rules()
+
+
+def save_alert_rules(rules, path=None):
+    path = path or default_alerts_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump([rule.to_dict() for rule in rules], f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class SlidingRegression:
+    """Độ dốc bình phương tối thiểu của (t, x) trong cửa sổ trượt window_s giây, O(1) khấu hao."""
+
+    def __init__(self, window_s):
+        self.window_s = window_s
+        self._points = deque()
+        self._origin = None  # Thời gian tính so với mốc này để các tổng không quá lớn
+        self._clear_sums()
+        self._since_rebase = 0
+
+    def _clear_sums(self):
+        self._n = 0
+        self._st = self._sx = self._stt = self._stx = 0.0
+
+    def add(self, t, x):
+        if self._origin is None:
+            self._origin = t
+        points = self._points
+        points.append((t, x))
+        self._accumulate(t - self._origin, x, 1)
+        while points[0][0] < t - self.window_s:
+            old_t, old_x = points.popleft()
+            self._accumulate(old_t - self._origin, old_x, -1)
+        self._since_rebase += 1
+        if self._since_rebase >= SLOPE_REBASE_SAMPLES:
+            self._rebase()
+
+    def _accumulate(self, t, x, sign):
+        self._n += sign
+        self._st += sign * t
+        self._sx += sign * x
+        self._stt += sign * t * t
+        self._stx += sign * t * x
+
+    def _rebase(self):
+        self._since_rebase = 0
+        self._origin = self._points[0][0]
+        self._clear_sums()
+        for t, x in self._points:
+            self._accumulate(t - self._origin, x, 1)
+
+    @property
+    def span(self):
+        return self._points[-1][0] - self._points[0][0] if self._points else 0.0
+
+    def slope(self):
+        """Độ dốc (đơn vị/giây), hoặc None nếu chưa đủ dữ liệu."""
+        n = self._n
+        if n < 3:
+            return None
+        denominator = n * self._stt - self._st * self._st
+        if denominator <= 0:
+            return None
+        return (n * self._stx - self._st * self._sx) / denominator
+
+
+class _Baseline:
+    """Phân phối toàn phiên của một metric; các phân vị được làm mới định kỳ."""
+
+    def __init__(self):
+        # stats kéo theo numpy: chỉ import khi có luật baseline, để record.py vẫn khởi động nhanh
+        from stats import QuantileSketch
+        self.sketch = QuantileSketch()
+        self._cached = {}  # phân vị (0–100) -> giá trị
+        self._refreshed = None
+
+    def add(self, t, x):
+        self.sketch.add(x)
+        if self._refreshed is None or t - self._refreshed >= BASELINE_REFRESH_S:
+            self._refreshed = t
+            self._cached.clear()
+
+    def value(self, percentile):
+        if self.sketch.count < BASELINE_MIN_SAMPLES:
+            return None
+        value = self._cached.get(percentile)
+        if value is None:
+            value = self._cached[percentile] = self.sketch.quantile(percentile / 100)
+        return value
+
+
+class Alert:
+    """Một lần luật chuyển sang cảnh báo (firing=True) hoặc hết cảnh báo (firing=False)."""
+    __slots__ = ('key', 'name', 'rule', 'time', 'value', 'firing')
+
+    def __init__(self, key, name, rule, timestamp, value, firing):
+        self.key = key
+        self.name = name
+        self.rule = rule
+        self.time = timestamp
+        self.value = value
+        self.firing = firing
+
+    def message(self):
+        label, unit = ALERT_METRICS[self.rule.metric]
+        if self.rule.kind == 'slope':
+            unit += "/h"
+        state = "ALERT" if self.firing else "resolved"
+        return f"{state}: {self.name} ({self.key}): {self.rule.describe()} [now {self.value:.1f} {unit}]"
+
+
+class _Series:
+    """Trạng thái cảnh báo của một process: tổng hợp dùng chung và trạng thái từng luật."""
+    __slots__ = ('name', 'rules', 'regressions', 'baselines', 'since', 'firing')
+
+    def __init__(self, name):
+        self.name = name
+        self.rules = []
+        self.regressions = {}  # (metric, window_s) -> SlidingRegression
+        self.baselines = {}  # metric -> _Baseline
+        self.since = {}  # rule_id -> thời điểm điều kiện bắt đầu đúng
+        self.firing = {}  # rule_id -> Alert đang cảnh báo
+
+
+class AlertEngine:
+    """
+    Đánh giá các luật trên mẫu của nhiều process. key của process là giá trị bất kỳ (PID, hoặc
+    (địa chỉ collector, PID)). feed() trả về các Alert mới phát sinh.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self._series = {}  # key -> _Series
+
+    def set_rules(self, rules):
+        """Đổi danh sách luật; tổng hợp còn được dùng thì giữ lại, trạng thái của luật đã xóa bị bỏ."""
+        self.rules = list(rules)
+        for series in self._series.values():
+            self._configure(series)
+
+    def _configure(self, series):
+        series.rules = [rule for rule in self.rules if rule.applies_to(series.name)]
+        regressions = {}
+        baselines = {}
+        for rule in series.rules:
+            if rule.kind == 'slope':
+                key = (rule.metric, rule.window_s)
+                regressions[key] = series.regressions.get(key) or SlidingRegression(rule.window_s)
+            elif rule.kind == 'baseline':
+                baselines[rule.metric] = series.baselines.get(rule.metric) or _Baseline()
+        series.regressions = regressions
+        series.baselines = baselines
+        rule_ids = {rule.rule_id for rule in series.rules}
+        series.since = {rule_id: since for rule_id, since in series.since.items() if rule_id in rule_ids}
+        series.firing = {rule_id: alert for rule_id, alert in series.firing.items() if rule_id in rule_ids}
+
+    def remove(self, key):
+        """Bỏ trạng thái của một process (đã kết thúc hoặc thôi theo dõi)."""
+        self._series.pop(key, None)
+
+    def firing(self, key):
+        """Các Alert đang cảnh báo của một process."""
+        series = self._series.get(key)
+        return list(series.firing.values()) if series is not None else []
+
+    def feed(self, key, name, samples):
+        """Đưa các mẫu mới (timestamp, cpu, ram[, phụ]) của một process vào, trả về các Alert mới."""
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(name)
+            self._configure(series)
+        if not series.rules:
+            return []
+        events = []
+        since = series.since
+        for sample in samples:
+            t = sample[0]
+            # Các tổng hợp dùng chung được cập nhật và tính một lần cho mỗi mẫu, không phải mỗi luật
+            slopes = {}
+            for key_window, regression in series.regressions.items():
+                regression.add(t, sample[METRIC_INDEX[key_window[0]]])
+                if regression.span >= regression.window_s * SLOPE_MIN_COVERAGE:
+                    slope = regression.slope()
+                    slopes[key_window] = slope * 3600 if slope is not None else None
+            for rule in series.rules:
+                value = sample[METRIC_INDEX[rule.metric]]
+                if rule.kind == 'above':
+                    active = value > rule.threshold
+                elif rule.kind == 'slope':
+                    value = slopes.get((rule.metric, rule.window_s))
+                    active = value is not None and value > rule.threshold
+                    if value is None:
+                        value = 0.0
+                else:
+                    reference = series.baselines[rule.metric].value(rule.threshold)
+                    active = reference is not None and value > reference
+                if active or rule.rule_id in since:
+                    self._update(series, key, rule, t, value, active, events)
+            # Mẫu chỉ vào baseline sau khi được so với nó
+            for metric, baseline in series.baselines.items():
+                baseline.add(t, sample[METRIC_INDEX[metric]])
+        return events
+
+    @staticmethod
+    def _update(series, key, rule, t, value, active, events):
+        rule_id = rule.rule_id
+        if not active:
+            series.since.pop(rule_id, None)
+            alert = series.firing.pop(rule_id, None)
+            if alert is not None:
+                events.append(Alert(key, series.name, rule, t, value, False))
+            return
+        since = series.since.setdefault(rule_id, t)
+        if rule_id not in series.firing and t - since >= rule.duration_s:
+            alert = series.firing[rule_id] = Alert(key, series.name, rule, t, value, True)
+            events.append(alert)
+
+
+class AlertLog:
+    """Ghi nối các Alert vào file văn bản, mỗi dòng một sự kiện."""
+
+    def __init__(self, path=None):
+        self.path = path or default_alert_log_path()
+
+    def write(self, alerts):
+        if not alerts:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for alert in alerts:
+                stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(alert.time))
+                f.write(f"{stamp}\t{alert.message()}\n")
@@ -0,0 +1,248 @@
+"""
+Các backend lấy mẫu cho SamplingEngine.
+
+Mỗi backend trả về cùng một bộ giá trị (timestamp, cpu_percent_irix, memory_mb):
+- PsutilBackend: dùng psutil, chạy được trên mọi nền tảng.
+- ProcfsBackend: chỉ dành cho Linux, giữ sẵn file descriptor của /proc/<pid>/stat và
+  /proc/<pid>/statm rồi đọc lại bằng os.pread, tự tính % CPU từ chênh lệch jiffies.
+
+Thời gian dùng để tính % CPU trong ProcfsBackend là CLOCK_BOOTTIME, cùng gốc với trường
+starttime của /proc/<pid>/stat, nhờ vậy có thể lấy thời điểm process bắt đầu làm mốc.
+
+Timestamp của mẫu lấy từ wall_clock(): đồng hồ đơn điệu quy về epoch, nên khoảng cách
+giữa các mẫu đúng với thời gian thực kể cả khi giờ hệ thống bị chỉnh (NTP, người dùng).
+
+Nếu engine đã theo dõi một PID bằng pidfd (lifecycle.py), PID đó nằm trong backend.watched:
+PsutilBackend bỏ bước kiểm tra is_running()/status() mỗi tick vì việc process kết thúc đã
+được báo theo sự kiện. ProcfsBackend không có bước kiểm tra riêng (đọc stat là đủ).
+
+Cả hai backend đều báo lỗi bằng psutil.NoSuchProcess / psutil.AccessDenied để engine
+xử lý giống nhau.
+"""
+import errno
+import os
+import sys
+import time
+
+import psutil
+
+_WALL_CLOCK_OFFSET = time.time() - time.monotonic()
+
+
+def wall_clock():
+    """Thời điểm hiện tại (giây kể từ epoch) theo đồng hồ đơn điệu, không nhảy khi chỉnh giờ hệ thống."""
+    return _WALL_CLOCK_OFFSET + time.monotonic()
+
+
+class SamplingBackend:
+    """Giao diện chung của một backend lấy mẫu."""
+    name = "base"
+
+    def __init__(self):
+        self.num_cores = psutil.cpu_count(logical=True) or 1
+        self.watched = set()  # PID có pidfd: việc kết thúc được báo theo sự kiện
+
+    def open(self, pid, process=None, fresh=False):
+        """
+        Chuẩn bị lấy mẫu cho PID (khởi tạo mốc CPU). Gọi trên thread lấy mẫu.
+        fresh=True dùng thời điểm process bắt đầu làm mốc CPU, để process vừa được tạo
+        có giá trị CPU đúng ngay ở mẫu đầu tiên (dùng cho các process con mới phát hiện).
+        """
+        raise NotImplementedError
+
+    def close(self, pid):
+        """Giải phóng tài nguyên đã cấp cho PID."""
+        raise NotImplementedError
+
+    def sample(self, pid):
+        """Trả về (timestamp, cpu_percent_irix, memory_mb) của PID."""
+        raise NotImplementedError
+
+    def close_all(self):
+        for pid in list(self.pids()):
+            self.close(pid)
+
+    def pids(self):
+        raise NotImplementedError
+
+
+class PsutilBackend(SamplingBackend):
+    """Backend mặc định, dùng psutil.Process.oneshot()."""
+    name = "psutil"
+
+    def __init__(self):
+        super().__init__()
+        self._processes = {}
+        self._fresh = set()  # PID có mẫu đầu tiên tính từ lúc process bắt đầu
+
+    def pids(self):
+        return self._processes.keys()
+
+    def open(self, pid, process=None, fresh=False):
+        if process is None:
+            process = psutil.Process(pid)
+        if fresh:
+            self._fresh.add(pid)
+        else:
+            # Gọi cpu_percent() một lần khởi tạo, giá trị thật có từ tick sau
+            process.cpu_percent(interval=None)
+        self._processes[pid] = process
+
+    def close(self, pid):
+        self._processes.pop(pid, None)
+        self._fresh.discard(pid)
+
+    def sample(self, pid):
+        process = self._processes[pid]
+        with process.oneshot():
+            # Process zombie được coi như đã kết thúc (giống ProcfsBackend). PID có pidfd không
+            # cần kiểm tra: LifecycleWatcher báo ngay khi process kết thúc.
+            if pid not in self.watched and (not process.is_running() or process.status() == psutil.STATUS_ZOMBIE):
+                raise psutil.NoSuchProcess(pid)
+
+            # Lấy % CPU và chuyển sang IRIX mode
+            if pid in self._fresh:
+                self._fresh.discard(pid)
+                cpu_times = process.cpu_times()
+                lifetime = max(time.time() - process.create_time(), 1e-6)
+                cpu_percent = round((cpu_times.user + cpu_times.system) / lifetime * 100, 1)
+                process.cpu_percent(interval=None)
+            else:
+                cpu_percent = process.cpu_percent(interval=None)
+            cpu_percent_irix = cpu_percent / self.num_cores
+            memory_info = process.memory_info()
+            memory_mb = (memory_info.rss - memory_info.shared) / (1000 * 1000)  # Chuyển byte sang MB
+        return wall_clock(), cpu_percent_irix, memory_mb
+
+
+class _ProcfsHandle:
+    """File descriptor và mốc CPU của một PID trong ProcfsBackend."""
+    __slots__ = ('stat_fd', 'statm_fd', 'start_ticks', 'cpu_ticks', 'cpu_time')
+
+    def __init__(self, stat_fd, statm_fd):
+        self.stat_fd = stat_fd
+        self.statm_fd = statm_fd
+        self.start_ticks = None
+        self.cpu_ticks = 0
+        self.cpu_time = 0.0
+
+
+class ProcfsBackend(SamplingBackend):
+    """Backend Linux đọc trực tiếp /proc/<pid>/stat và /proc/<pid>/statm."""
+    name = "procfs"
+
+    READ_SIZE = 1024  # /proc/<pid>/stat luôn ngắn hơn 1 KB
+
+    def __init__(self):
+        super().__init__()
+        self._handles = {}
+        self._clock_ticks = os.sysconf('SC_CLK_TCK')
+        self._page_size = os.sysconf('SC_PAGE_SIZE')
+
+    @staticmethod
+    def is_supported():
+        return sys.platform.startswith('linux') and hasattr(os, 'pread') and os.path.exists('/proc/self/stat')
+
+    def pids(self):
+        return self._handles.keys()
+
+    def open(self, pid, process=None, fresh=False):
+        self.close(pid)
+        stat_fd = self._open_proc_file(pid, 'stat')
+        try:
+            statm_fd = self._open_proc_file(pid, 'statm')
+        except psutil.Error:
+            os.close(stat_fd)
+            raise
+
+        handle = _ProcfsHandle(stat_fd, statm_fd)
+        self._handles[pid] = handle
+        try:
+            handle.start_ticks, handle.cpu_ticks = self._read_stat(pid, handle)
+        except psutil.Error:
+            self.close(pid)
+            raise
+        if fresh:
+            # Mốc là lúc process bắt đầu: chưa dùng jiffy CPU nào
+            handle.cpu_ticks = 0
+            handle.cpu_time = handle.start_ticks / self._clock_ticks
+        else:
+            handle.cpu_time = time.clock_gettime(time.CLOCK_BOOTTIME)
+
+    def close(self, pid):
+        handle = self._handles.pop(pid, None)
+        if handle is not None:
+            os.close(handle.stat_fd)
+            os.close(handle.statm_fd)
+
+    def sample(self, pid):
+        handle = self._handles[pid]
+        start_ticks, cpu_ticks = self._read_stat(pid, handle)
+        if start_ticks != handle.start_ticks:
+            # PID đã bị tái sử dụng cho một process khác
+            raise psutil.NoSuchProcess(pid)
+        now = time.clock_gettime(time.CLOCK_BOOTTIME)
+        statm = self._pread(pid, handle.statm_fd).split()
+
+        # Cùng công thức với psutil.Process.cpu_percent(), sau đó chuyển sang IRIX mode
+        delta_time = now - handle.cpu_time
+        delta_cpu = (cpu_ticks - handle.cpu_ticks) / self._clock_ticks
+        cpu_percent = round(delta_cpu / delta_time * 100, 1) if delta_time > 0 else 0.0
+        handle.cpu_ticks = cpu_ticks
+        handle.cpu_time = now
+
+        # statm: size resident shared ... (đơn vị trang)
+        memory_mb = (int(statm[1]) - int(statm[2])) * self._page_size / (1000 * 1000)
+        return wall_clock(), cpu_percent / self.num_cores, memory_mb
+
+    def _read_stat(self, pid, handle):
+        """Trả về (starttime, utime + stime) tính bằng jiffies."""
+        data = self._pread(pid, handle.stat_fd)
+        # Tên process nằm trong ngoặc và có thể chứa khoảng trắng, nên tách từ dấu ')' cuối cùng
+        fields = data[data.rfind(b')') + 2:].split()
+        if not fields or fields[0] in (b'Z', b'X'):
+            raise psutil.NoSuchProcess(pid)
+        # fields[0] là trường thứ 3 (state): utime=14, stime=15, starttime=22
+        return int(fields[19]), int(fields[11]) + int(fields[12])
+
+    def _pread(self, pid, fd):
+        try:
+            data = os.pread(fd, self.READ_SIZE, 0)
+        except ProcessLookupError:
+            raise psutil.NoSuchProcess(pid)
+        except PermissionError:
+            raise psutil.AccessDenied(pid)
+        if not data:
+            raise psutil.NoSuchProcess(pid)
+        return data
+
+    @staticmethod
+    def _open_proc_file(pid, name):
+        try:
+            return os.open(f'/proc/{pid}/{name}', os.O_RDONLY)
+        except FileNotFoundError:
+            raise psutil.NoSuchProcess(pid)
+        except PermissionError:
+            raise psutil.AccessDenied(pid)
+        except OSError as e:
+            if e.errno == errno.ESRCH:
+                raise psutil.NoSuchProcess(pid)
+            raise
+
+
+BACKENDS = {
+    PsutilBackend.name: PsutilBackend,
+    ProcfsBackend.name: ProcfsBackend,
+}
+
+
+def create_backend(name="auto"):
+    """Chọn backend lúc khởi động. 'auto' dùng procfs trên Linux, nếu không thì psutil."""
+    if name == "auto":
+        name = ProcfsBackend.name if ProcfsBackend.is_supported() else PsutilBackend.name
+    if name == ProcfsBackend.name and not ProcfsBackend.is_supported():
+        raise ValueError("Backend 'procfs' chỉ hỗ trợ Linux.")
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Backend không hợp lệ: {name}")
@@ -0,0 +1,134 @@
+"""
+Benchmark băng thông của collector (collector.py) với nhiều collector trên localhost.
+
+Chạy --collectors collector, mỗi cái theo dõi --pids process tải (phần lớn ngủ, một số chạy CPU
+và tăng bộ nhớ để giá trị thay đổi thật), mỗi collector có một CollectorClient nối tới (TCP, riêng
+collector cuối dùng Unix socket). Giữa chừng ngắt kết nối của client đầu tiên để kiểm tra việc
+kết nối lại và backfill: số mẫu nhận được phải bằng các client còn lại. In ra số byte trên dây
+mỗi giây cho 100 PID, số byte mỗi mẫu và so với cùng dữ liệu gửi dạng JSON. Các con số tính từ
+sau WARMUP_TICKS tick đầu, để không gồm danh sách process gửi một lần lúc mới nối (phần này
+vẫn được tính lại khi client nối lại).
+
+    python benchmarks/bench_collector.py
+    python benchmarks/bench_collector.py --pids 500 --interval 0.1 --json out.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import psutil  # noqa: E402
+
+from collector import Collector, CollectorClient  # noqa: E402
+from loadgen import LoadGroup  # noqa: E402
+
+LOAD_CPU_SHARE = 0.25  # Tổng CPU của các process tải, tính theo số core
+WARMUP_TICKS = 3
+
+
+def spawn_load(load, count):
+    """count process: 1/10 chạy CPU, 1/10 tăng bộ nhớ, còn lại ngủ."""
+    busy = max(count // 10, 1)
+    duty = min(LOAD_CPU_SHARE * psutil.cpu_count() / busy, 1.0)
+    pids = load.spawn('cpu', busy, duty=duty)
+    pids += load.spawn('memory', busy, rate_mb=1, max_mb=50)
+    pids += load.spawn('idle', count - 2 * busy)
+    return pids
+
+
+def run(collectors, pid_count, interval_s, duration, drop_after):
+    socket_dir = tempfile.mkdtemp(prefix="pmon-bench-")
+    results = []
+    with LoadGroup() as load:
+        servers, clients, counters = [], [], []
+        for index in range(collectors):
+            pids = spawn_load(load, pid_count)
+            server = Collector(interval_s, buffer_s=max(duration, 60))
+            if index == collectors - 1 and collectors > 1:
+                address = "unix:" + os.path.join(socket_dir, f"collector{index}.sock")
+                server.listen(address)
+            else:
+                host, port = server.listen("127.0.0.1:0")
+                address = f"{host}:{port}"
+            for pid in pids:
+                server.add_process(psutil.Process(pid))
+            counter = {'samples': 0, 'json_bytes': 0, 'connects': 0}
+
+            def on_batch(batch, counter=counter):
+                counter['samples'] += len(batch)
+                counter['json_bytes'] += len(json.dumps({str(pid): sample for pid, sample in batch.items()}))
+
+            def on_state(connected, message, counter=counter):
+                counter['connects'] += connected
+
+            servers.append(server)
+            clients.append(CollectorClient(address, on_batch, on_state=on_state))
+            counters.append(counter)
+        load.settle()
+        for server in servers:
+            server.start()
+        for client in clients:
+            client.start()
+
+        time.sleep(WARMUP_TICKS * interval_s)
+        start = time.monotonic()
+        marks = [(client.bytes_received, counter['samples'], counter['json_bytes'])
+                 for client, counter in zip(clients, counters)]
+        time.sleep(drop_after)
+        sock = clients[0]._socket
+        if sock is not None:
+            sock.shutdown(2)  # Mất kết nối giữa chừng: client phải nối lại và backfill
+        time.sleep(duration - drop_after)
+        for server in servers:
+            server.stop()  # Dừng lấy mẫu trước, rồi chờ client nhận hết phần còn lại
+        elapsed = time.monotonic() - start
+        time.sleep(min(interval_s * 5, 2.0) + 0.5)
+        for client, counter, (bytes_mark, samples_mark, json_mark) in zip(clients, counters, marks):
+            client.stop()
+            wire_bytes = client.bytes_received - bytes_mark
+            samples = counter['samples'] - samples_mark
+            results.append({
+                'address': client.address,
+                'pids': pid_count,
+                'connects': counter['connects'],
+                'samples': samples,
+                'missed': client.missed,
+                'wire_bytes': wire_bytes,
+                'wire_bytes_per_s_per_100_pids': wire_bytes / elapsed * 100 / pid_count,
+                'bytes_per_sample': wire_bytes / max(samples, 1),
+                'json_bytes_per_sample': (counter['json_bytes'] - json_mark) / max(samples, 1),
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark băng thông collector trên localhost")
+    parser.add_argument("--collectors", type=int, default=3)
+    parser.add_argument("--pids", type=int, default=100, help="Số PID mỗi collector")
+    parser.add_argument("--interval", type=float, default=1.0, help="Chu kỳ lấy mẫu (giây)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Thời gian đo (giây)")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.collectors, args.pids, args.interval, args.duration, args.duration / 3)
+    print(f"{'collector':<36} {'conn':>4} {'samples':>8} {'B/s/100PID':>11} {'B/sample':>9} {'JSON B/sample':>14}")
+    for result in results:
+        print(f"{result['address']:<36} {result['connects']:>4} {result['samples']:>8} "
+              f"{result['wire_bytes_per_s_per_100_pids']:>11.0f} {result['bytes_per_sample']:>9.2f} "
+              f"{result['json_bytes_per_sample']:>14.1f}")
+    counts = {result['samples'] for result in results}
+    if len(counts) > 1:
+        print("Note: sample counts differ between collectors (processes may have exited or a backfill was lost).")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'interval_s': args.interval, 'duration_s': args.duration, 'results': results}, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Benchmark chế độ lấy mẫu tần số cao.
+
+Tạo N process con (một nửa chạy CPU theo từng đợt ngắn, một nửa ngủ), lấy mẫu chúng ở chu kỳ
+--interval-ms trong --duration giây rồi in ra: số tick/giây đạt được, jitter, số tick bị bỏ và
+% CPU (một core) của chính tiến trình benchmark.
+
+    python benchmarks/bench_highfreq.py                  # chỉ SamplingEngine, mọi backend
+    python benchmarks/bench_highfreq.py --gui            # cả GUI (offscreen): tab, thống kê, vẽ
+    python benchmarks/bench_highfreq.py --json out.json  # ghi kết quả ra file JSON
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import BACKENDS, ProcfsBackend, create_backend  # noqa: E402
+from sampler import SamplingEngine  # noqa: E402
+
+# Process con: chạy CPU ~5 ms rồi ngủ ~95 ms (các đợt ngắn mà chu kỳ 1 s bỏ lỡ)
+BURSTY_CHILD = """
+import time
+while True:
+    end = time.perf_counter() + 0.005
+    while time.perf_counter() < end:
+        pass
+    time.sleep(0.095)
+"""
+IDLE_CHILD = "import time; time.sleep(3600)"
+
+
+def spawn_children(count):
+    children = []
+    for i in range(count):
+        code = BURSTY_CHILD if i % 2 == 0 else IDLE_CHILD
+        children.append(subprocess.Popen([sys.executable, "-c", code]))
+    return children
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_engine(backend_name, pids, interval_s, duration):
+    """Chỉ SamplingEngine: chi phí lấy mẫu thuần, không có GUI."""
+    samples = [0]
+
+    def on_batch(batch):
+        samples[0] += len(batch)
+
+    engine = SamplingEngine(interval_s, on_batch=on_batch, backend=create_backend(backend_name))
+    for pid in pids:
+        engine.add(pid)
+    engine.start()
+    time.sleep(1.0)  # Bỏ qua giai đoạn khởi động
+    engine.timing.reset()
+    samples[0] = 0
+    cpu_start, wall_start = cpu_seconds(), time.monotonic()
+    time.sleep(duration)
+    cpu_used, elapsed = cpu_seconds() - cpu_start, time.monotonic() - wall_start
+    engine.timing.publish()
+    engine.stop()
+    return _result(f"engine/{backend_name}", engine.timing.summary, samples[0], cpu_used, elapsed)
+
+
+_app = None  # Giữ QApplication sống tới hết lượt chạy (phải tồn tại trước và lâu hơn các widget)
+
+
+def bench_gui(pids, interval_ms, duration):
+    """Toàn bộ GUI (offscreen): lấy mẫu, gom batch, cập nhật tab và vẽ tab đang hiển thị."""
+    global _app
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import psutil
+    from PyQt6.QtCore import QEventLoop, QTimer
+    from PyQt6.QtWidgets import QApplication
+    _app = QApplication.instance() or QApplication([sys.argv[0]])
+    import run
+
+    window = run.MainWindow()
+    window.show()
+    for pid in pids:
+        window.add_process_tab(psutil.Process(pid))
+    window.update_interval_ms = interval_ms
+    window.monitor_worker.set_interval(interval_ms)
+
+    def run_for(seconds):
+        # Vòng lặp sự kiện riêng: app.quit() sẽ gọi closeEvent (hộp thoại xác nhận) của cửa sổ
+        loop = QEventLoop()
+        QTimer.singleShot(int(seconds * 1000), loop.quit)
+        loop.exec()
+
+    run_for(1.0)
+    engine = window.monitor_worker.engine
+    engine.timing.reset()
+    samples_before = sum(len(data['tab'].history) for data in window.monitored_processes.values())
+    cpu_start, wall_start = cpu_seconds(), time.monotonic()
+    run_for(duration)
+    cpu_used, elapsed = cpu_seconds() - cpu_start, time.monotonic() - wall_start
+    samples = sum(len(data['tab'].history) for data in window.monitored_processes.values()) - samples_before
+    engine.timing.publish()
+    window.monitor_worker.stop()
+    return _result(f"gui/{engine.backend.name}", engine.timing.summary, samples, cpu_used, elapsed)
+
+
+def _result(name, timing, samples, cpu_used, elapsed):
+    timing = timing or {}
+    return {
+        'name': name,
+        'ticks_per_s': timing.get('ticks', 0) / elapsed,
+        'samples_per_s': samples / elapsed,
+        'jitter_mean_ms': timing.get('jitter_mean_ms'),
+        'jitter_p99_ms': timing.get('jitter_p99_ms'),
+        'jitter_max_ms': timing.get('jitter_max_ms'),
+        'skipped_ticks': timing.get('skipped', 0),
+        'cost_mean_ms': timing.get('cost_mean_ms'),
+        'cpu_percent': cpu_used / elapsed * 100,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="High-frequency sampling benchmark")
+    parser.add_argument("--processes", type=int, default=10)
+    parser.add_argument("--interval-ms", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--backend", choices=list(BACKENDS), action="append",
+                        help="Backend cần đo (mặc định: tất cả backend hỗ trợ)")
+    parser.add_argument("--gui", action="store_true", help="Đo cả GUI (offscreen) thay vì chỉ engine")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args(argv)
+
+    backends = args.backend or [name for name in BACKENDS if name != 'procfs' or ProcfsBackend.is_supported()]
+    children = spawn_children(args.processes)
+    try:
+        time.sleep(0.5)
+        pids = [child.pid for child in children]
+        if args.gui:
+            results = [bench_gui(pids, args.interval_ms, args.duration)]
+        else:
+            results = [bench_engine(name, pids, args.interval_ms / 1000, args.duration) for name in backends]
+    finally:
+        for child in children:
+            child.kill()
+            child.wait()
+
+    print(f"{args.processes} processes, interval {args.interval_ms} ms, {args.duration:.0f} s")
+    for result in results:
+        print(f"{result['name']:<16} ticks/s {result['ticks_per_s']:7.1f}  samples/s {result['samples_per_s']:7.1f}  "
+              f"jitter avg {result['jitter_mean_ms']:.3f} ms p99 {result['jitter_p99_ms']:.3f} ms "
+              f"max {result['jitter_max_ms']:.3f} ms  skipped {result['skipped_ticks']}  "
+              f"cost {result['cost_mean_ms']:.3f} ms/tick  CPU {result['cpu_percent']:.1f}%")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'processes': args.processes, 'interval_ms': args.interval_ms,
+                       'duration_s': args.duration, 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
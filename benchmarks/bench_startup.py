@@ -0,0 +1,151 @@
+"""
+Benchmark thời gian khởi động, có ngân sách (budget) để chặn regression.
+
+Các phép đo (mỗi phép chạy --runs lần trong tiến trình mới, báo lần đầu và trung vị):
+- gui_window: từ lúc chạy `run.py --measure-startup` tới khi cửa sổ chính đã hiện (Qt offscreen
+  nếu không có màn hình). Đồng thời kiểm tra pyqtgraph chưa được nạp ở thời điểm đó.
+- gui_first_tab: thời gian tạo ProcessTabWidget đầu tiên, gồm cả việc nạp pyqtgraph/NumPy.
+- record_ready: từ lúc chạy record.py tới khi engine bắt đầu lấy mẫu.
+- headless_qt_free: record.py, collector.py, export.py và alerts.py không được import Qt.
+- --exe: như gui_window nhưng cho bản đóng gói (so sánh `create_app.sh` với `--fast`).
+
+Lần chạy đầu thường chậm hơn vì cache file của hệ điều hành còn lạnh. Mã thoát 1 nếu trung vị
+vượt ngân sách STARTUP_BUDGET_MS (nhân --budget-scale cho máy chậm) hoặc đường headless import Qt.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --exe dist/onedir/ProcessMonitor/ProcessMonitor --exe dist/ProcessMonitor
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_BUDGET_MS = {'gui_window': 1500.0, 'gui_first_tab': 1500.0, 'record_ready': 500.0}
+TIMEOUT_S = 60
+
+FIRST_TAB_CODE = """
+import os, sys, time
+sys.argv = ['run.py']
+from PyQt6.QtWidgets import QApplication
+import run
+app = QApplication(sys.argv)
+window = run.MainWindow()
+started = time.perf_counter()
+tab = run.ProcessTabWidget(os.getpid(), 'bench')
+print((time.perf_counter() - started) * 1000, flush=True)
+window.monitor_worker.stop()
+os._exit(0)
+"""
+
+QT_FREE_CODE = """
+import sys
+import record, collector, export, alerts
+print(' '.join(sorted({name.split('.')[0] for name in sys.modules} & {'PyQt6', 'PyQt5', 'PySide6', 'pyqtgraph'})))
+"""
+
+
+def _qt_env():
+    env = dict(os.environ)
+    if not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY'):
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+    return env
+
+
+def _time_until(command, marker, stream='stdout'):
+    """Thời gian (ms) từ lúc chạy command tới khi nó in dòng chứa marker; trả về (ms, dòng)."""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=_qt_env(), text=True,
+                               stdout=subprocess.PIPE if stream == 'stdout' else subprocess.DEVNULL,
+                               stderr=subprocess.PIPE if stream == 'stderr' else subprocess.DEVNULL)
+    try:
+        for line in getattr(process, stream):
+            if marker in line:
+                return (time.perf_counter() - started) * 1000, line.strip()
+        raise RuntimeError(f"{command[0]} exited without printing '{marker}'")
+    finally:
+        process.kill()
+        process.wait()
+
+
+def measure_gui_window(command):
+    elapsed, line = _time_until(command, "startup-ready")
+    return elapsed, "plotting_loaded=False" in line
+
+
+def measure_first_tab():
+    output = subprocess.run([sys.executable, "-c", FIRST_TAB_CODE], cwd=ROOT, env=_qt_env(),
+                            capture_output=True, text=True, timeout=TIMEOUT_S)
+    return float(output.stdout.split()[-1])
+
+
+def measure_record_ready():
+    sleeper = subprocess.Popen(['sleep', '60'])
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            command = [sys.executable, "record.py", "--pid", str(sleeper.pid), "-o", os.path.join(directory, "s.csv")]
+            return _time_until(command, "Started in", stream='stderr')[0]
+    finally:
+        sleeper.kill()
+        sleeper.wait()
+
+
+def _summary(values):
+    return {'first_ms': values[0], 'median_ms': statistics.median(values), 'min_ms': min(values)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark thời gian khởi động")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--exe", action="append", default=[], help="Đo thêm bản đóng gói (có thể lặp lại)")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Nhân ngân sách (máy chậm hơn)")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    failures = []
+    gui_command = [sys.executable, "run.py", "--measure-startup"]
+    windows = [measure_gui_window(gui_command) for _ in range(args.runs)]
+    results['gui_window'] = _summary([elapsed for elapsed, _ in windows])
+    if not all(lazy for _, lazy in windows):
+        failures.append("pyqtgraph was loaded before the main window was shown")
+    results['gui_first_tab'] = _summary([measure_first_tab() for _ in range(args.runs)])
+    results['record_ready'] = _summary([measure_record_ready() for _ in range(args.runs)])
+    for exe in args.exe:
+        results[f"exe:{exe}"] = _summary([measure_gui_window([os.path.abspath(exe), "--measure-startup"])[0]
+                                          for _ in range(args.runs)])
+
+    qt_modules = subprocess.run([sys.executable, "-c", QT_FREE_CODE], cwd=ROOT, capture_output=True,
+                                text=True, timeout=TIMEOUT_S, check=True).stdout.split()
+    results['headless_qt_free'] = not qt_modules
+    if qt_modules:
+        failures.append(f"headless modules import {', '.join(qt_modules)}")
+
+    for name, result in results.items():
+        if isinstance(result, bool):
+            print(f"{name:<40} {'yes' if result else 'NO'}")
+            continue
+        budget = STARTUP_BUDGET_MS.get(name)
+        line = (f"{name:<40} first {result['first_ms']:7.0f} ms  median {result['median_ms']:7.0f} ms"
+                f"  min {result['min_ms']:7.0f} ms")
+        if budget is not None:
+            budget *= args.budget_scale
+            line += f"  (budget {budget:.0f} ms)"
+            if result['median_ms'] > budget:
+                failures.append(f"{name}: median {result['median_ms']:.0f} ms > budget {budget:.0f} ms")
+        print(line)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'runs': args.runs, 'results': results, 'failures': failures}, f, indent=1)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
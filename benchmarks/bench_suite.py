@@ -0,0 +1,353 @@
+"""
+Bộ benchmark tái lập được cho các đường nóng (hot path) của lấy mẫu và vẽ đồ thị.
+
+Các nhóm đo (xem --case):
+- sampling: thời gian CPU trung bình cho một tick của SamplingEngine theo số PID, cho từng backend,
+  với tải tổng hợp (benchmarks/loadgen.py): phần lớn process ngủ, cộng một số process chạy CPU
+  và tăng bộ nhớ. Tổng tải CPU được giữ dưới LOAD_CPU_SHARE số core để chính tải không làm
+  chậm engine.
+- tree: chi phí một tick khi theo dõi các cây process fork liên tục (forktree).
+- memory: bộ nhớ tăng thêm của lịch sử một ProcessTabWidget (SampleStore, rollup, thống kê)
+  sau N mẫu, đo bằng tracemalloc (NumPy báo cáo cấp phát của nó cho tracemalloc).
+- plot: thời gian CPU của update_plot() cộng một lần vẽ đồ thị CPU và RAM (offscreen) theo độ
+  dài lịch sử và display_duration.
+- alerts: thời gian CPU của AlertEngine cho mỗi mẫu theo số PID và số luật (mẫu tổng hợp,
+  không cần process thật).
+- picker: ProcessIndex của hộp thoại Add Process trên bảng process tổng hợp: thời gian dựng chỉ
+  mục, thời gian trung bình một lần tìm (các câu PICKER_QUERIES) và một lần cập nhật khi 1%
+  process kết thúc và 1% process mới xuất hiện.
+
+Thời gian được đo bằng thời gian CPU của tiến trình benchmark (time.process_time) thay vì thời
+gian thực, để việc bị các process khác chiếm core không làm nhiễu kết quả.
+
+Kết quả là JSON {'meta': ..., 'results': {tên: {'value', 'unit'}}}; mọi giá trị đều càng thấp
+càng tốt. --save ghi thành baseline, --compare so với baseline và trả về mã thoát 1 nếu có
+giá trị chậm hơn baseline quá --tolerance (mặc định 30%) và quá --min-delta (bỏ qua chênh lệch
+quá nhỏ so với nhiễu đo). Baseline phụ thuộc máy: chỉ so các lần chạy trên cùng một máy.
+
+    python benchmarks/bench_suite.py --quick --save benchmarks/baselines/local.json
+    python benchmarks/bench_suite.py --quick --compare benchmarks/baselines/local.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import psutil  # noqa: E402
+
+from backends import BACKENDS, ProcfsBackend, create_backend  # noqa: E402
+from loadgen import LoadGroup, tree_size  # noqa: E402
+from sampler import SamplingEngine  # noqa: E402
+from alerts import AlertEngine, AlertRule  # noqa: E402
+from processindex import ProcessIndex  # noqa: E402
+
+CASES = ('sampling', 'tree', 'memory', 'plot', 'alerts', 'picker')
+SAMPLING_TICK_S = 0.05
+SAMPLING_DURATION_S = 3.0
+PLOT_REPEATS = 20
+PLOT_SIZE = (1200, 900)
+ALERT_RULE_COUNTS = (3, 24)
+ALERT_WARMUP_TICKS = 200  # Đủ để luật baseline có baseline
+ALERT_TICKS = 100
+PICKER_NAMES = ('python3', 'java', 'nginx', 'postgres', 'bash', 'sleep', 'node', 'worker', 'redis-server', 'chrome')
+PICKER_USERS = ('root', 'www-data', 'alice', 'bob')
+# Gõ dần từng ký tự, tiền tố, lọc theo trường, nhiều từ và theo cha
+PICKER_QUERIES = ('p', 'py', 'pyt', 'python', 'a', '^ngi', 'cmd:--port=80', 'user:alice nginx',
+                  'java conf4', 'parent:bash', 'ppid:1', 'pid:12345', 'zzz')
+DEFAULT_TOLERANCE = 0.3
+DEFAULT_MIN_DELTA = 0.05  # Đơn vị của từng kết quả (ms, KB/1k mẫu)
+LOAD_CPU_SHARE = 0.25  # Tổng CPU của các process tải, tính theo số core
+
+# (số PID, số cây) cho chế độ đầy đủ và --quick
+SCALES = {
+    'full': {'pids': (10, 100, 500, 1000), 'trees': (1, 5), 'samples': (10_000, 100_000, 1_000_000),
+             'durations': (60, 3600, 86400, None), 'processes': (5000, 20_000, 50_000)},
+    'quick': {'pids': (10, 100, 300), 'trees': (1, 3), 'samples': (10_000, 100_000),
+              'durations': (60, 3600, None), 'processes': (5000, 20_000)},
+}
+
+
+def _engine_tick_ms(backend_name, pids=(), trees=()):
+    """Thời gian CPU trung bình một tick (ms) khi engine lấy mẫu các PID/cây cho trước."""
+    engine = SamplingEngine(SAMPLING_TICK_S, on_batch=lambda batch: None, backend=create_backend(backend_name))
+    for pid in pids:
+        engine.add(pid)
+    for pid in trees:
+        engine.add_tree(pid)
+    engine.start()
+    time.sleep(1.0)  # Khởi tạo handle, bảng process, mốc CPU
+    # Ngoài thread lấy mẫu, tiến trình benchmark gần như không chạy gì trong lúc đo
+    ticks_before, cpu_before = engine.timing.ticks, time.process_time()
+    time.sleep(SAMPLING_DURATION_S)
+    cpu_used, ticks = time.process_time() - cpu_before, engine.timing.ticks - ticks_before
+    engine.stop()
+    return cpu_used / max(ticks, 1) * 1000
+
+
+def bench_sampling(scale, backends):
+    results = {}
+    largest = max(scale['pids'])
+    with LoadGroup() as load:
+        # Trộn tải: 10% chạy CPU, 5% tăng bộ nhớ, còn lại ngủ; xen kẽ để mọi mức số PID đều có đủ loại
+        busy = max(largest // 10, 1)
+        cpu_pids = load.spawn('cpu', busy, duty=min(0.05, LOAD_CPU_SHARE * psutil.cpu_count() / busy))
+        memory_pids = load.spawn('memory', max(largest // 20, 1), rate_mb=1, max_mb=20)
+        idle_pids = load.spawn('idle', largest - len(cpu_pids) - len(memory_pids))
+        groups = (idle_pids, cpu_pids, memory_pids)
+        pids = [pid for _, pid in sorted((i / len(group), pid) for group in groups for i, pid in enumerate(group))]
+        load.settle(1.0 + largest / 500)
+        for backend_name in backends:
+            for count in scale['pids']:
+                tick_ms = _engine_tick_ms(backend_name, pids[:count])
+                results[f"sampling/{backend_name}/tick_ms/{count}_pids"] = {'value': tick_ms, 'unit': 'ms'}
+                results[f"sampling/{backend_name}/per_pid_us/{count}_pids"] = {'value': tick_ms * 1000 / count,
+                                                                               'unit': 'us'}
+    return results
+
+
+def bench_tree(scale, backends):
+    results = {}
+    depth, fanout = 2, 4
+    with LoadGroup() as load:
+        roots = load.spawn('forktree', max(scale['trees']), depth=depth, fanout=fanout, churn_per_s=20)
+        load.settle(1.5)
+        for backend_name in backends:
+            for count in scale['trees']:
+                tick_ms = _engine_tick_ms(backend_name, trees=roots[:count])
+                name = f"tree/{backend_name}/tick_ms/{count}x{tree_size(depth, fanout)}_procs"
+                results[name] = {'value': tick_ms, 'unit': 'ms'}
+    return results
+
+
+_app = None  # Giữ QApplication sống suốt lượt chạy (widget không được tồn tại lâu hơn nó)
+
+
+def _qt_app():
+    global _app
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtWidgets import QApplication
+    if _app is None:
+        _app = QApplication.instance() or QApplication([sys.argv[0]])
+    return _app
+
+
+def _fill_tab(tab, count, batch_size=1000):
+    """Nạp count mẫu (cách nhau 1 s) vào tab qua update_data, như các batch từ worker."""
+    start = tab.start_time
+    for first in range(0, count, batch_size):
+        tab.update_data([(start + i, 50 + 40 * ((i * 7919) % 100) / 100, 100 + i * 1e-4)
+                         for i in range(first, min(first + batch_size, count))])
+
+
+def bench_memory(scale):
+    _qt_app()
+    from run import ProcessTabWidget
+
+    results = {}
+    for count in scale['samples']:
+        tab = ProcessTabWidget(os.getpid(), "bench")
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        _fill_tab(tab, count)
+        grown = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        results[f"memory/tab_history/kb_per_1k_samples/{count}"] = {'value': grown / count, 'unit': 'KB/1k'}
+        results[f"memory/tab_history/mb_total/{count}"] = {'value': grown / 1e6, 'unit': 'MB'}
+        tab.deleteLater()
+    return results
+
+
+def bench_plot(scale):
+    app = _qt_app()
+    from run import ProcessTabWidget
+
+    results = {}
+    for count in scale['samples']:
+        tab = ProcessTabWidget(os.getpid(), "bench")
+        tab.resize(*PLOT_SIZE)
+        tab.show()
+        _fill_tab(tab, count)
+        app.processEvents()
+        for duration in scale['durations']:
+            tab.display_duration = duration or count
+            timings = []
+            for _ in range(PLOT_REPEATS):
+                started = time.process_time()
+                tab.update_plot()
+                # grab() vẽ đồng bộ vào pixmap, kể cả khi nền tảng offscreen không thực sự hiển thị
+                tab.cpu_plot_widget.grab()
+                tab.ram_plot_widget.grab()
+                timings.append(time.process_time() - started)
+            label = f"{duration}s" if duration else "all"
+            # Lần nhanh nhất: ít bị nhiễu bởi GC và các tác vụ khác nhất (như timeit)
+            results[f"plot/update_ms/{count}_samples/{label}"] = {'value': min(timings) * 1000,
+                                                                  'unit': 'ms'}
+        tab.hide()
+        tab.deleteLater()
+        app.processEvents()
+    return results
+
+
+def _alert_rules(count):
+    """count luật chia đều ba loại; các luật slope dùng chung vài cửa sổ như cấu hình thực tế."""
+    rules = []
+    for i in range(count):
+        kind = ('above', 'slope', 'baseline')[i % 3]
+        if kind == 'above':
+            rules.append(AlertRule(i + 1, kind, 'cpu', 50.0 + i, duration_s=60.0))
+        elif kind == 'slope':
+            rules.append(AlertRule(i + 1, kind, 'ram', 10.0 + i, window_s=(600.0, 3600.0)[i % 2]))
+        else:
+            rules.append(AlertRule(i + 1, kind, ('cpu', 'ram')[i % 2], 90.0 + i % 10, duration_s=60.0))
+    return rules
+
+
+def bench_alerts(scale):
+    results = {}
+    for pid_count in scale['pids']:
+        for rule_count in ALERT_RULE_COUNTS:
+            engine = AlertEngine(_alert_rules(rule_count))
+            measured = 0.0
+            for tick in range(ALERT_WARMUP_TICKS + ALERT_TICKS):
+                started = time.process_time()
+                for pid in range(pid_count):
+                    cpu = (pid * 7 + tick * 13) % 100
+                    engine.feed(pid, "bench", ((1e9 + tick, float(cpu), 100.0 + pid + tick * 0.01),))
+                if tick >= ALERT_WARMUP_TICKS:
+                    measured += time.process_time() - started
+            name = f"alerts/per_sample_us/{pid_count}_pids_{rule_count}_rules"
+            results[name] = {'value': measured / (ALERT_TICKS * pid_count) * 1e6, 'unit': 'us'}
+    return results
+
+
+def _picker_info(pid):
+    """(ppid, tên, cmdline, user) tổng hợp, xác định theo pid."""
+    name = PICKER_NAMES[pid % len(PICKER_NAMES)]
+    cmdline = f"/usr/bin/{name} --port={pid % 1000} --config /etc/{name}/conf{pid % 97}.yaml --id={pid}"
+    return (1 if pid % 50 == 0 else pid - pid % 50), name, cmdline, PICKER_USERS[pid % len(PICKER_USERS)]
+
+
+def bench_picker(scale):
+    results = {}
+    for count in scale['processes']:
+        index = ProcessIndex()
+        pids = range(2, count + 2)
+        started = time.process_time()
+        for start in range(0, count, 500):
+            index._insert([(pid, _picker_info(pid)) for pid in pids[start:start + 500]])
+            index.generation += 1
+        results[f"picker/build_ms/{count}_processes"] = {'value': (time.process_time() - started) * 1000, 'unit': 'ms'}
+
+        index.search('warmup')  # Chuỗi ghép cho tìm chuỗi con được dựng một lần sau mỗi thay đổi
+        started = time.process_time()
+        for query in PICKER_QUERIES:
+            index.search(query)
+        results[f"picker/search_ms/{count}_processes"] = {
+            'value': (time.process_time() - started) * 1000 / len(PICKER_QUERIES), 'unit': 'ms'}
+
+        churn = max(count // 100, 1)
+        started = time.process_time()
+        with index._lock:
+            index._forget(set(pids[:churn]))
+            index._insert([(pid, _picker_info(pid)) for pid in range(count + 2, count + 2 + churn)])
+            index.generation += 1
+        index.search('python')
+        results[f"picker/churn_ms/{count}_processes"] = {'value': (time.process_time() - started) * 1000, 'unit': 'ms'}
+    return results
+
+
+def run_suite(cases, scale_name, backends):
+    scale = SCALES[scale_name]
+    results = {}
+    for case in cases:
+        started = time.monotonic()
+        if case == 'sampling':
+            results.update(bench_sampling(scale, backends))
+        elif case == 'tree':
+            results.update(bench_tree(scale, backends))
+        elif case == 'memory':
+            results.update(bench_memory(scale))
+        elif case == 'plot':
+            results.update(bench_plot(scale))
+        elif case == 'alerts':
+            results.update(bench_alerts(scale))
+        elif case == 'picker':
+            results.update(bench_picker(scale))
+        print(f"{case}: done in {time.monotonic() - started:.1f} s", file=sys.stderr)
+    meta = {
+        'scale': scale_name,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': psutil.cpu_count(logical=True),
+        'machine': platform.machine(),
+    }
+    return {'meta': meta, 'results': results}
+
+
+def compare(current, baseline, tolerance, min_delta):
+    """Các kết quả chậm hơn baseline: [(tên, baseline, hiện tại)]."""
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        old, new = reference['value'], result['value']
+        if new > old * (1 + tolerance) and new - old > min_delta:
+            regressions.append((name, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process Monitor benchmark suite")
+    parser.add_argument("--case", choices=CASES, action="append", help="Nhóm cần đo (mặc định: tất cả)")
+    parser.add_argument("--quick", action="store_true", help="Quy mô nhỏ hơn (~1 phút)")
+    parser.add_argument("--backend", choices=list(BACKENDS), action="append",
+                        help="Backend cần đo (mặc định: tất cả backend hỗ trợ)")
+    parser.add_argument("--save", help="Ghi kết quả ra file JSON (baseline)")
+    parser.add_argument("--compare", help="So với baseline JSON; mã thoát 1 nếu có regression")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Tỷ lệ chậm hơn cho phép so với baseline")
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA,
+                        help="Bỏ qua chênh lệch tuyệt đối nhỏ hơn giá trị này")
+    args = parser.parse_args(argv)
+
+    backends = args.backend or [name for name in BACKENDS if name != 'procfs' or ProcfsBackend.is_supported()]
+    report = run_suite(args.case or CASES, 'quick' if args.quick else 'full', backends)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    for name, result in report['results'].items():
+        line = f"{name:<52} {result['value']:10.3f} {result['unit']}"
+        if baseline is not None and name in baseline['results']:
+            old = baseline['results'][name]['value']
+            line += f"   (baseline {old:.3f}, {(result['value'] / old - 1) * 100 if old else 0.0:+.0f}%)"
+        print(line)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if baseline is not None:
+        if baseline['meta'].get('scale') != report['meta']['scale']:
+            print("Warning: baseline was recorded at a different scale; only matching results are compared.",
+                  file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old:.3f} -> {new:.3f}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against baseline.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
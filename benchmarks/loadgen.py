@@ -0,0 +1,121 @@
+"""
+Process tải tổng hợp (synthetic load) cho các benchmark.
+
+Mỗi loại tải là một đoạn code chạy bằng `python -c` trong session riêng, nên cả cây process
+của nó bị dừng cùng lúc bằng killpg:
+- idle: chỉ ngủ (dùng lệnh sleep nếu có, để hàng nghìn process không tốn bộ nhớ của Python).
+- cpu: chạy CPU theo chu kỳ 100 ms với tỷ lệ bận `duty` (0–1).
+- memory: cấp phát thêm `rate_mb` MB mỗi giây (có ghi vào từng trang) tới tối đa `max_mb`.
+- forktree: dựng một cây `depth` tầng, mỗi process có `fanout` con đang ngủ; process gốc còn
+  liên tục fork con sống ngắn (`churn_per_s` lần mỗi giây) để mô phỏng cây fork nhiều.
+
+Dùng trực tiếp:
+    with LoadGroup() as load:
+        pids = load.spawn('cpu', 10, duty=0.2)
+"""
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+IDLE_CODE = "import time; time.sleep(3600)"
+
+CPU_CODE = """
+import time
+duty = {duty}
+while True:
+    start = time.perf_counter()
+    while time.perf_counter() - start < 0.1 * duty:
+        pass
+    time.sleep(max(0.1 - (time.perf_counter() - start), 0))
+"""
+
+MEMORY_CODE = """
+import time
+chunks = []
+step = int({rate_mb} * 1000 * 1000 / 10)
+while sum(map(len, chunks)) + step <= {max_mb} * 1000 * 1000:
+    chunk = bytearray(step)
+    chunk[::4096] = b'x' * len(range(0, step, 4096))  # Ghi vào từng trang để RSS thực sự tăng
+    chunks.append(chunk)
+    time.sleep(0.1)
+time.sleep(3600)
+"""
+
+FORKTREE_CODE = """
+import os, time
+def grow(level):
+    if level >= {depth}:
+        return
+    for _ in range({fanout}):
+        if os.fork() == 0:
+            grow(level + 1)
+            while True:
+                time.sleep(3600)
+grow(0)
+period = 1.0 / {churn_per_s} if {churn_per_s} else 3600
+while True:
+    time.sleep(period)
+    if {churn_per_s}:
+        pid = os.fork()
+        if pid == 0:
+            time.sleep(period * 5)
+            os._exit(0)
+    try:
+        while os.waitpid(-1, os.WNOHANG)[0]:
+            pass
+    except ChildProcessError:
+        pass
+"""
+
+LOAD_CODE = {'idle': IDLE_CODE, 'cpu': CPU_CODE, 'memory': MEMORY_CODE, 'forktree': FORKTREE_CODE}
+LOAD_DEFAULTS = {
+    'idle': {},
+    'cpu': {'duty': 0.2},
+    'memory': {'rate_mb': 5, 'max_mb': 200},
+    'forktree': {'depth': 2, 'fanout': 3, 'churn_per_s': 10},
+}
+
+
+def tree_size(depth, fanout):
+    """Số process trong một cây forktree (không tính các con sống ngắn)."""
+    return sum(fanout ** level for level in range(depth + 1))
+
+
+class LoadGroup:
+    """Nhóm các process tải; stop() (hoặc thoát khỏi with) dừng mọi process và con cháu của chúng."""
+
+    def __init__(self):
+        self.processes = []
+
+    def spawn(self, kind, count, **params):
+        """Khởi động count process loại kind, trả về danh sách PID (PID gốc với forktree)."""
+        if kind == 'idle' and shutil.which('sleep'):
+            command = ['sleep', '3600']
+        else:
+            command = [sys.executable, "-c", LOAD_CODE[kind].format(**dict(LOAD_DEFAULTS[kind], **params))]
+        processes = [subprocess.Popen(command, start_new_session=True) for _ in range(count)]
+        self.processes.extend(processes)
+        return [process.pid for process in processes]
+
+    def settle(self, seconds=0.5):
+        """Chờ các process khởi động xong (import, dựng cây)."""
+        time.sleep(seconds)
+
+    def stop(self):
+        for process in self.processes:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                process.kill()
+        for process in self.processes:
+            process.wait()
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,519 @@
+"""
+Collector chạy trên từng máy và giao thức gửi mẫu qua mạng, để một GUI theo dõi nhiều máy.
+
+Collector dùng lại HeadlessRecorder (record.py), tức là cùng SamplingEngine và cùng cách chọn
+process (--pid/--name/--tree/--rule) như GUI và recorder, rồi giữ các mẫu của BUFFER_S giây gần
+nhất trong bộ đệm. Mỗi GUI kết nối qua TCP hoặc Unix socket nhận lại bộ đệm (backfill) rồi
+nhận các batch mới ngay khi có. Khi mất kết nối, client tự kết nối lại và chỉ xin các mục sau
+số thứ tự (seq) cuối cùng nó đã nhận, nên không mất mẫu nếu mất kết nối ngắn hơn bộ đệm.
+
+Giao thức: mỗi thông điệp có 4 byte độ dài rồi 1 byte loại.
+- Client -> collector: 'S' JSON {'instance', 'resume'}: seq cuối đã nhận từ instance đó của
+  collector, hoặc null (một lần, ngay khi nối). Collector đã khởi động lại thì bỏ qua resume.
+- Collector -> client:
+  'H' JSON {'version', 'instance', 'host', 'interval_s', 'buffer_s'}: chào, gửi đầu tiên.
+  'P' JSON {'seq', 'processes': [[pid, tên, start_time], ...]}: process mới (lúc nối: mọi process
+  đang theo dõi; process đã kết thúc hay lỗi chỉ còn trong các mục 'T'/'E' của bộ đệm).
+  'B' batch mẫu đã delta-encode (xem SampleEncoder).
+  'T' JSON {'seq', 'pid'}: process kết thúc. 'E' JSON {'seq', 'pid', 'message'}: lỗi.
+  'G' JSON {'missed'}: bộ đệm không còn đủ mẫu để backfill (có khoảng trống).
+  'K': giữ kết nối khi không có dữ liệu mới (mỗi HEARTBEAT_S giây).
+Chỉ dùng JSON và số nguyên, không dùng pickle, để không thực thi dữ liệu nhận từ mạng.
+
+Batch 'B': header BATCH_HEADER (seq, thời điểm gốc, số mẫu, độ dài phần JSON phụ), rồi mỗi mẫu
+là 4 varint zigzag theo thứ tự PID tăng dần: chênh lệch PID so với mẫu trước, chênh lệch thời
+gian (µs) so với thời điểm gốc, CPU (0.01%) và RAM (KB) tính chênh lệch so với mẫu trước của
+cùng PID trên cùng kết nối. Process ổn định tốn khoảng 5–6 byte mỗi mẫu. Phần tử thứ tư của
+mẫu (cây process, metric mở rộng) nếu có được gửi dạng JSON ở cuối.
+
+Module này không import Qt. Chạy collector:
+    python collector.py --listen 0.0.0.0:7878 --name nginx --rule cmdline:'gunicorn .*app'
+    python collector.py --listen unix:/run/pmon.sock --pid 1234 --tree
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import threading
+from collections import deque
+
+import psutil
+
+from backends import BACKENDS, wall_clock
+from record import HeadlessRecorder, add_alert_arguments, apply_alert_arguments, find_process_by_name, parse_rule
+from rules import default_rules_path, load_rules, next_rule_id
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 7878
+BUFFER_S = 600.0  # Số giây mẫu gần nhất giữ lại để backfill
+HEARTBEAT_S = 5.0
+HANDSHAKE_TIMEOUT_S = 10.0
+RECONNECT_MIN_S = 0.5
+RECONNECT_MAX_S = 10.0
+
+FRAME = struct.Struct('<I')
+BATCH_HEADER = struct.Struct('<QdII')  # seq, thời điểm gốc, số mẫu, độ dài JSON phụ
+CPU_SCALE = 100  # CPU gửi theo đơn vị 0.01%
+RAM_SCALE = 1000  # RAM gửi theo KB (memory_mb tính theo 1000 * 1000 byte)
+TIME_SCALE = 1000000  # Thời gian gửi theo µs so với thời điểm gốc
+
+
+def parse_address(text):
+    """'unix:/đường/dẫn', 'host:port' hoặc 'port' -> (family, địa chỉ cho socket)."""
+    if text.startswith('unix:'):
+        return socket.AF_UNIX, text[len('unix:'):]
+    host, _, port = text.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port or DEFAULT_PORT))
+
+
+def _put_varint(out, value):
+    value = value << 1 if value >= 0 else ((-value) << 1) - 1  # zigzag
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data, position):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1) ^ -(value & 1), position
+
+
+class SampleEncoder:
+    """Mã hóa batch mẫu cho một kết nối (giữ giá trị trước của từng PID để tính chênh lệch)."""
+
+    def __init__(self):
+        self._previous = {}  # pid -> (cpu, ram) đã lượng tử hóa
+
+    def encode(self, seq, batch):
+        pids = sorted(batch)
+        base = min(batch[pid][0] for pid in pids) if pids else 0.0
+        body = bytearray()
+        extras = {}
+        previous_pid = 0
+        previous = self._previous
+        for pid in pids:
+            sample = batch[pid]
+            cpu = round(sample[1] * CPU_SCALE)
+            ram = round(sample[2] * RAM_SCALE)
+            last_cpu, last_ram = previous.get(pid, (0, 0))
+            _put_varint(body, pid - previous_pid)
+            _put_varint(body, round((sample[0] - base) * TIME_SCALE))
+            _put_varint(body, cpu - last_cpu)
+            _put_varint(body, ram - last_ram)
+            previous[pid] = (cpu, ram)
+            previous_pid = pid
+            if len(sample) > 3:
+                extras[pid] = sample[3]
+        extra = json.dumps(extras).encode('utf-8') if extras else b''
+        return b'B' + BATCH_HEADER.pack(seq, base, len(pids), len(extra)) + bytes(body) + extra
+
+    def forget(self, pid):
+        self._previous.pop(pid, None)
+
+
+class SampleDecoder:
+    """Giải mã batch 'B' của một kết nối; phải nhận đúng thứ tự như lúc mã hóa."""
+
+    def __init__(self):
+        self._previous = {}
+
+    def decode(self, payload):
+        """payload (bỏ byte loại) -> (seq, {pid: (timestamp, cpu, ram[, phụ])})."""
+        seq, base, count, extra_size = BATCH_HEADER.unpack_from(payload)
+        position = BATCH_HEADER.size
+        batch = {}
+        pid = 0
+        previous = self._previous
+        for _ in range(count):
+            delta_pid, position = _get_varint(payload, position)
+            offset, position = _get_varint(payload, position)
+            delta_cpu, position = _get_varint(payload, position)
+            delta_ram, position = _get_varint(payload, position)
+            pid += delta_pid
+            last_cpu, last_ram = previous.get(pid, (0, 0))
+            cpu, ram = last_cpu + delta_cpu, last_ram + delta_ram
+            previous[pid] = (cpu, ram)
+            batch[pid] = (base + offset / TIME_SCALE, cpu / CPU_SCALE, ram / RAM_SCALE)
+        if extra_size:
+            for key, extra in json.loads(payload[position:position + extra_size]).items():
+                batch[int(key)] += (extra,)
+        return seq, batch
+
+    def forget(self, pid):
+        self._previous.pop(pid, None)
+
+
+def _send(sock, kind, payload=b''):
+    sock.sendall(FRAME.pack(len(payload) + 1) + kind + payload)
+
+
+def _send_json(sock, kind, message):
+    _send(sock, kind, json.dumps(message).encode('utf-8'))
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+def _recv_frame(sock):
+    """(loại, payload) của thông điệp kế tiếp."""
+    (size,) = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    data = _recv_exact(sock, size)
+    return data[:1], data[1:]
+
+
+class Collector(HeadlessRecorder):
+    """
+    HeadlessRecorder giữ các mẫu gần nhất trong bộ đệm và phục vụ chúng cho các client.
+
+    Mọi mục trong bộ đệm (batch, process mới, kết thúc, lỗi) có một seq tăng dần; client
+    gửi lại seq cuối cùng khi kết nối lại để chỉ nhận phần còn thiếu.
+    """
+
+    def __init__(self, interval_s, backend_name="auto", shards=0, buffer_s=BUFFER_S, output_path=None):
+        super().__init__(output_path, interval_s, backend_name, shards)
+        self.interval_s = interval_s
+        self.buffer_s = buffer_s
+        self.processes = {}  # pid -> (tên, start_time) của các process đang theo dõi
+        self.bytes_sent = 0
+        self._buffer = deque()  # (seq, wall_clock, loại, dữ liệu)
+        self._seq = 0
+        self._changed = threading.Condition()
+        self._sockets = []
+        self._stopping = False
+        self.instance = os.urandom(8).hex()  # Seq chỉ có nghĩa trong một lần chạy của collector
+
+    def add_process(self, process, tree=False, series_key=None):
+        super().add_process(process, tree, series_key)
+        start_time = wall_clock()
+        with self._changed:
+            self.processes[process.pid] = (self.series[process.pid][1], start_time)
+            self._push('P', [[process.pid, self.series[process.pid][1], start_time]])
+
+    def listen(self, address):
+        """Mở một địa chỉ lắng nghe ('host:port' hoặc 'unix:/đường/dẫn')."""
+        family, bind_address = parse_address(address)
+        server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_UNIX:
+            if os.path.exists(bind_address):
+                os.remove(bind_address)  # Socket cũ còn sót lại từ lần chạy trước
+        else:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(bind_address)
+        server.listen()
+        self._sockets.append(server)
+        threading.Thread(target=self._accept, args=(server,), name=f"Accept-{address}", daemon=True).start()
+        return server.getsockname()
+
+    def stop(self):
+        with self._changed:
+            self._stopping = True
+            self._changed.notify_all()
+        for server in self._sockets:
+            try:
+                server.shutdown(socket.SHUT_RDWR)  # Đánh thức accept() đang chờ
+            except OSError:
+                pass
+            server.close()
+        super().stop()
+
+    # Các callback của engine (thread lấy mẫu)
+    def _on_batch(self, batch):
+        super()._on_batch(batch)
+        with self._changed:
+            self._push('B', batch)
+
+    def _on_terminated(self, pid):
+        super()._on_terminated(pid)
+        with self._changed:
+            # Client nối sau khi mục 'T' đã rời bộ đệm không được thấy process này là đang chạy
+            self.processes.pop(pid, None)
+            self._push('T', pid)
+
+    def _on_error(self, pid, message):
+        super()._on_error(pid, message)
+        with self._changed:
+            self.processes.pop(pid, None)
+            self._push('E', (pid, message))
+
+    def _push(self, kind, data):
+        # Gọi khi đang giữ self._changed
+        self._seq += 1
+        now = wall_clock()
+        self._buffer.append((self._seq, now, kind, data))
+        while self._buffer[0][1] < now - self.buffer_s:
+            self._buffer.popleft()
+        self._changed.notify_all()
+
+    def _entries_after(self, seq):
+        """Các mục có seq lớn hơn seq (gọi khi đang giữ self._changed)."""
+        entries = []
+        for entry in reversed(self._buffer):
+            if entry[0] <= seq:
+                break
+            entries.append(entry)
+        entries.reverse()
+        return entries
+
+    def _accept(self, server):
+        while not self._stopping:
+            try:
+                client, peer = server.accept()
+            except OSError:
+                return  # Socket đã bị đóng khi dừng
+            if self._stopping:
+                client.close()
+                return
+            threading.Thread(target=self._serve, args=(client, peer), name=f"Client-{peer}", daemon=True).start()
+
+    def _serve(self, client, peer):
+        """Thread của một client: chào, gửi danh sách process, backfill rồi gửi các mục mới."""
+        encoder = SampleEncoder()
+        try:
+            client.settimeout(HANDSHAKE_TIMEOUT_S)
+            kind, payload = _recv_frame(client)
+            if kind != b'S':
+                return
+            request = json.loads(payload)
+            resume = request.get('resume') if request.get('instance') == self.instance else None
+            client.settimeout(None)
+            print(f"Client connected: {peer or 'local'} (resume from {resume})", file=sys.stderr)
+
+            _send_json(client, b'H', {'version': PROTOCOL_VERSION, 'instance': self.instance,
+                                      'host': socket.gethostname(),
+                                      'interval_s': self.interval_s, 'buffer_s': self.buffer_s})
+            with self._changed:
+                processes = [[pid, name, start_time] for pid, (name, start_time) in self.processes.items()]
+                oldest = self._buffer[0][0] if self._buffer else self._seq + 1
+                last = resume if resume is not None else oldest - 1
+                entries = self._entries_after(last)
+            _send_json(client, b'P', {'seq': None, 'processes': processes})
+            if resume is not None and resume < oldest - 1:
+                _send_json(client, b'G', {'missed': oldest - 1 - resume})
+
+            while True:
+                for seq, _, kind, data in entries:
+                    self._send_entry(client, encoder, seq, kind, data)
+                    last = seq
+                with self._changed:
+                    if not self._stopping and self._seq == last:
+                        self._changed.wait(HEARTBEAT_S)
+                    if self._stopping:
+                        return
+                    if self._buffer and self._buffer[0][0] > last + 1:
+                        # Client chậm tới mức bộ đệm đã bỏ các mục nó chưa nhận
+                        missed = self._buffer[0][0] - last - 1
+                        last = self._buffer[0][0] - 1
+                    else:
+                        missed = 0
+                    entries = self._entries_after(last)
+                if missed:
+                    _send_json(client, b'G', {'missed': missed})
+                if not entries:
+                    _send(client, b'K')
+        except (OSError, ValueError, ConnectionError):
+            pass
+        finally:
+            client.close()
+            print(f"Client disconnected: {peer or 'local'}", file=sys.stderr)
+
+    def _send_entry(self, client, encoder, seq, kind, data):
+        if kind == 'B':
+            payload = encoder.encode(seq, data)
+            client.sendall(FRAME.pack(len(payload)) + payload)
+            self.bytes_sent += FRAME.size + len(payload)
+        elif kind == 'P':
+            _send_json(client, b'P', {'seq': seq, 'processes': data})
+        elif kind == 'T':
+            encoder.forget(data)
+            _send_json(client, b'T', {'seq': seq, 'pid': data})
+        elif kind == 'E':
+            encoder.forget(data[0])
+            _send_json(client, b'E', {'seq': seq, 'pid': data[0], 'message': data[1]})
+
+
+class CollectorClient:
+    """
+    Kết nối tới một collector, tự kết nối lại (backoff RECONNECT_MIN_S..RECONNECT_MAX_S) và
+    xin backfill từ seq cuối đã nhận. Các callback được gọi trên thread của client:
+    on_batch(batch), on_terminated(pid), on_error(pid, message), on_processes([(pid, tên, start_time)]),
+    on_state(connected, message).
+    """
+
+    def __init__(self, address, on_batch, on_terminated=None, on_error=None, on_processes=None, on_state=None):
+        self.address = address
+        self._family, self._connect_address = parse_address(address)
+        self._on_batch = on_batch
+        self._on_terminated = on_terminated or (lambda pid: None)
+        self._on_error = on_error or (lambda pid, message: None)
+        self._on_processes = on_processes or (lambda processes: None)
+        self._on_state = on_state or (lambda connected, message: None)
+        self.last_seq = None
+        self.instance = None  # Instance của collector mà last_seq thuộc về
+        self.host = None  # Tên máy của collector (từ thông điệp chào)
+        self.connected = False
+        self.bytes_received = 0
+        self.missed = 0  # Số mục bộ đệm của collector đã bỏ trước khi kịp gửi
+        self._socket = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"CollectorClient-{self.address}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Ngắt kết nối và dừng kết nối lại. Không chờ."""
+        self._stop_event.set()
+        sock = self._socket
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run(self):
+        delay = RECONNECT_MIN_S
+        while not self._stop_event.is_set():
+            sock = socket.socket(self._family, socket.SOCK_STREAM)
+            self._socket = sock
+            try:
+                sock.settimeout(HANDSHAKE_TIMEOUT_S)
+                sock.connect(self._connect_address)
+                sock.settimeout(HEARTBEAT_S * 3)  # Không nhận được cả heartbeat: coi như mất kết nối
+                _send_json(sock, b'S', {'instance': self.instance, 'resume': self.last_seq})
+                self._receive(sock)
+            except (OSError, ValueError, ConnectionError) as e:
+                if self._stop_event.is_set():
+                    break
+                if self.connected:
+                    delay = RECONNECT_MIN_S  # Vừa mất một kết nối đang tốt: thử lại nhanh
+                self.connected = False
+                self._on_state(False, f"{e} (retrying in {delay:g} s)")
+            finally:
+                self._socket = None
+                sock.close()
+            if self._stop_event.wait(delay):
+                break
+            delay = min(delay * 2, RECONNECT_MAX_S)
+
+    def _receive(self, sock):
+        decoder = SampleDecoder()
+        while not self._stop_event.is_set():
+            kind, payload = _recv_frame(sock)
+            self.bytes_received += FRAME.size + 1 + len(payload)
+            if kind == b'B':
+                seq, batch = decoder.decode(payload)
+                self.last_seq = seq
+                self._on_batch(batch)
+                continue
+            if kind == b'K':
+                continue
+            message = json.loads(payload)
+            if kind == b'H':
+                if message.get('version') != PROTOCOL_VERSION:
+                    raise ValueError(f"unsupported protocol version {message.get('version')}")
+                if message['instance'] != self.instance:
+                    self.instance = message['instance']
+                    self.last_seq = None
+                self.host = message['host']
+                self.connected = True
+                self._on_state(True, f"connected to {message['host']}")
+                continue
+            if message.get('seq') is not None:
+                self.last_seq = message['seq']
+            if kind == b'P':
+                self._on_processes([tuple(entry) for entry in message['processes']])
+            elif kind == b'T':
+                decoder.forget(message['pid'])
+                self._on_terminated(message['pid'])
+            elif kind == b'E':
+                decoder.forget(message['pid'])
+                self._on_error(message['pid'], message['message'])
+            elif kind == b'G':
+                self.missed += message['missed']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process Monitor collector: serve samples to remote GUIs")
+    parser.add_argument("--listen", action="append", default=[],
+                        help=f"Địa chỉ lắng nghe: host:port hoặc unix:/đường/dẫn (mặc định 127.0.0.1:{DEFAULT_PORT})")
+    parser.add_argument("--pid", type=int, action="append", default=[], help="PID cần theo dõi (có thể lặp lại)")
+    parser.add_argument("--name", action="append", default=[], help="Tên process cần theo dõi, lấy process khớp đầu tiên")
+    parser.add_argument("--rule", action="append", default=[],
+                        help="Luật auto-attach: name:<chuỗi>, cmdline:<regex> hoặc user:<tên>")
+    parser.add_argument("--rules-file", nargs="?", const=default_rules_path(),
+                        help="Dùng luật từ file JSON (mặc định: file luật của GUI)")
+    parser.add_argument("--tree", action="store_true", help="Theo dõi cả cây process cho --pid/--name")
+    parser.add_argument("-i", "--interval", type=float, default=1.0, help="Chu kỳ lấy mẫu (giây)")
+    parser.add_argument("--buffer", type=float, default=BUFFER_S, help="Số giây mẫu giữ lại để backfill")
+    parser.add_argument("-o", "--output", help="Đồng thời ghi recording ra file (.pmts hoặc .csv)")
+    parser.add_argument("--backend", choices=["auto", *BACKENDS], default="auto")
+    parser.add_argument("--shards", type=int, default=0, help="Chia việc lấy mẫu cho N process worker")
+    add_alert_arguments(parser)
+    args = parser.parse_args(argv)
+
+    rules = load_rules(args.rules_file) if args.rules_file else []
+    for spec in args.rule:
+        rules.append(parse_rule(spec, next_rule_id(rules)))
+    if not (args.pid or args.name or rules):
+        parser.error("at least one of --pid, --name, --rule or --rules-file is required")
+
+    collector = Collector(args.interval, args.backend, args.shards, args.buffer, args.output)
+    try:
+        for address in args.listen or [f"127.0.0.1:{DEFAULT_PORT}"]:
+            print(f"Listening on {collector.listen(address)}", file=sys.stderr)
+    except (OSError, ValueError) as e:
+        print(f"Cannot listen: {e}", file=sys.stderr)
+        return 1
+
+    added = {os.getpid()}
+    for pid in args.pid:
+        try:
+            collector.add_process(psutil.Process(pid), tree=args.tree)
+            added.add(pid)
+        except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+            print(f"Cannot monitor PID {pid}: {e}", file=sys.stderr)
+    for name in args.name:
+        process = find_process_by_name(name, added)
+        if process is None:
+            print(f"No running process found matching '{name}'.", file=sys.stderr)
+            continue
+        collector.add_process(process, tree=args.tree)
+        added.add(process.pid)
+    if rules:
+        collector.set_rules(rules)
+    if not apply_alert_arguments(collector, args):
+        return 1
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    collector.start()
+    while not stop_event.wait(1.0):
+        pass
+    collector.stop()
+    print(f"Sent {collector.bytes_sent} bytes of samples.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
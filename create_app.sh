@@ -1 +1,10 @@
-pyinstaller --onefile --name=ProcessMonitor run.py
+# Đóng gói bằng PyInstaller.
+#   sh create_app.sh         một file duy nhất dist/ProcessMonitor: dễ sao chép, nhưng mỗi lần chạy
+#                            phải giải nén toàn bộ vào thư mục tạm nên khởi động mất vài giây
+#   sh create_app.sh --fast  thư mục dist/onedir/ProcessMonitor/ (chạy file ProcessMonitor bên trong):
+#                            không phải giải nén nên khởi động nhanh; cần sao chép cả thư mục
+if [ "$1" = "--fast" ]; then
+    pyinstaller --onedir --noconfirm --distpath dist/onedir --name=ProcessMonitor --exclude-module tkinter run.py
+else
+    pyinstaller --onefile --name=ProcessMonitor run.py
+fi
@@ -0,0 +1,321 @@
+"""
+Xuất toàn bộ lịch sử của phiên theo luồng (streaming), không dựng cả bảng trong bộ nhớ.
+
+Dữ liệu được đọc theo từng chunk CHUNK_ROWS dòng (view không copy từ SampleStore hoặc
+từ recording ánh xạ bằng mmap) và ghi ngay ra file, nên bộ nhớ dùng thêm chỉ cỡ một chunk
+dù phiên có hàng chục triệu mẫu. export_session() là generator trả về tiến độ sau mỗi
+chunk: CLI in ra stderr, GUI gọi dần qua QTimer để không treo giao diện.
+
+Hai định dạng:
+- CSV: cùng các cột với recording CSV (mở lại được bằng Open Recording), cộng thêm các
+  metric phụ nếu có.
+- Columnar (.pmcol): mỗi nhóm dòng (row group) của một series được lưu theo từng cột,
+  mỗi cột nén zlib riêng sau khi xáo byte (byte shuffle) để số thực nén tốt hơn. Cuối file
+  là footer JSON mô tả series, cột và vị trí từng khối, nên đọc được một cột bất kỳ mà
+  không phải giải nén phần còn lại.
+
+Module này không import Qt. Dòng lệnh:
+    python export.py session.pmts -o session.csv
+    python export.py session.pmts -o session.pmcol
+"""
+import argparse
+import csv
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from itertools import repeat
+
+import numpy as np
+
+from recording import CSV_COLUMNS, read_recording
+from tsreader import ArraySeries, is_timeseries_recording, open_timeseries
+
+CHUNK_ROWS = 1 << 16
+COLUMNAR_MAGIC = b"PMCOL001"
+COLUMNAR_TRAILER = struct.Struct('<Q8s')  # độ dài footer, magic kết thúc
+COLUMNAR_END = b"PMCOLEND"
+COLUMNAR_DTYPES = {'timestamp': '<f8', 'pid': '<u4'}  # Các metric còn lại lưu float32
+METRIC_NAMES = {'cpu': 'cpu_percent_irix', 'ram': 'memory_mb'}  # Tên cột khi xuất
+
+
+class StoreSource:
+    """
+    Nguồn xuất từ SampleStore của một tab đang theo dõi.
+
+    Số dòng được chốt khi tạo nguồn. Vì GUI vẫn thêm mẫu trong lúc xuất, kho có thể bỏ
+    bớt mẫu cũ nhất khi đầy; các dòng đó được bỏ qua và đếm vào lost.
+
+    metric_stores: kho của các metric mở rộng ({tên metric: SampleStore(('time', *trường))}),
+    ghép vào từng dòng theo thời gian; dòng không có giá trị của một trường thì để NaN.
+    """
+
+    def __init__(self, store, key, name, pid, time_offset, metric_stores=None):
+        self.store = store
+        self.key = key
+        self.name = name
+        self.pid = pid
+        self.time_offset = time_offset
+        self.metrics = [column for column in store.columns if column != store.time_column]
+        self.metric_stores = list((metric_stores or {}).values())
+        for metric_store in self.metric_stores:
+            self.metrics += [column for column in metric_store.columns if column != metric_store.time_column]
+        self._first = store.dropped
+        self.rows = store.total - store.dropped
+        self.lost = 0
+
+    def chunk(self, start, stop):
+        """(timestamp, pid, {metric: giá trị}) của các dòng [start, stop) còn trong kho."""
+        local_start = self._first + start - self.store.dropped
+        local_stop = self._first + stop - self.store.dropped
+        if local_start < 0:
+            self.lost += min(-local_start, stop - start)
+            local_start = 0
+        local_stop = max(local_stop, local_start)
+        times = self.store.column(self.store.time_column, local_start, local_stop)
+        pids = np.full(len(times), self.pid, dtype=np.uint32)
+        values = {column: self.store.column(column, local_start, local_stop)
+                  for column in self.store.columns if column != self.store.time_column}
+        for metric_store in self.metric_stores:
+            values.update(self._join(metric_store, times))
+        return times + self.time_offset, pids, values
+
+    @staticmethod
+    def _join(metric_store, times):
+        """Các trường của metric_store tại đúng các thời điểm times (NaN nếu không có mẫu)."""
+        metric_times = metric_store.column(metric_store.time_column)
+        positions = np.searchsorted(metric_times, times)
+        found = positions < len(metric_times)
+        found[found] = metric_times[positions[found]] == times[found]
+        matched = positions[found]
+        joined = {}
+        for column in metric_store.columns:
+            if column != metric_store.time_column:
+                values = np.full(len(times), np.nan)
+                values[found] = metric_store.column(column)[matched]
+                joined[column] = values
+        return joined
+
+
+class SeriesSource:
+    """Nguồn xuất từ một series của recording (tsreader.ArraySeries / MappedSeries)."""
+
+    def __init__(self, series):
+        self.series = series
+        self.key = series.key
+        self.name = series.name
+        self.pid = series.pid
+        self.metrics = ['cpu', 'ram']
+        self.rows = len(series)
+        self.lost = 0
+
+    def chunk(self, start, stop):
+        series = self.series
+        return series.time[start:stop], series.pid_column[start:stop], {'cpu': series.cpu[start:stop],
+                                                                        'ram': series.ram[start:stop]}
+
+
+class CsvExportWriter:
+    """Ghi CSV theo từng chunk."""
+
+    def __init__(self, path, extra_metrics):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._extra_metrics = extra_metrics
+        self._writer.writerow(CSV_COLUMNS + tuple(extra_metrics))
+
+    def write_chunk(self, source, timestamps, pids, values):
+        # Làm tròn bằng numpy rồi mới chuyển sang list để csv (viết bằng C) ghi cả chunk một lần
+        columns = [repeat(source.key), pids.tolist(), repeat(source.name),
+                   np.round(timestamps, 3).tolist(),
+                   np.round(values['cpu'].astype(np.float64), 2).tolist(),
+                   np.round(values['ram'].astype(np.float64), 3).tolist()]
+        for metric in self._extra_metrics:
+            if metric not in values:
+                columns.append(repeat(''))
+                continue
+            # Ô trống thay cho NaN (metric không được đọc ở mẫu đó)
+            data = values[metric]
+            rounded = np.round(data, 3).astype(object)
+            rounded[np.isnan(data)] = ''
+            columns.append(rounded.tolist())
+        self._writer.writerows(zip(*columns))
+
+    def end_series(self, source):
+        pass
+
+    def close(self):
+        self._file.close()
+
+
+def _shuffle(data):
+    """Xếp lại byte theo vị trí trong phần tử (mọi byte thứ 0, rồi mọi byte thứ 1, ...)."""
+    return np.ascontiguousarray(data.view(np.uint8).reshape(-1, data.itemsize).T).tobytes()
+
+
+def _unshuffle(raw, dtype, rows):
+    dtype = np.dtype(dtype)
+    return np.frombuffer(raw, dtype=np.uint8).reshape(dtype.itemsize, rows).T.copy().view(dtype).ravel()
+
+
+class ColumnarExportWriter:
+    """Ghi định dạng columnar .pmcol: các khối cột nén zlib, footer JSON ở cuối file."""
+
+    def __init__(self, path, extra_metrics, level=3):
+        self._file = open(path, 'wb')
+        self._file.write(COLUMNAR_MAGIC)
+        self._level = level
+        self._series = []
+        self._current = None
+
+    def write_chunk(self, source, timestamps, pids, values):
+        if self._current is None:
+            columns = ['timestamp', 'pid'] + [METRIC_NAMES.get(metric, metric) for metric in values]
+            self._current = {'key': source.key, 'name': source.name, 'pid': source.pid, 'rows': 0,
+                             'columns': [{'name': name, 'dtype': COLUMNAR_DTYPES.get(name, '<f4')}
+                                         for name in columns],
+                             'row_groups': []}
+        current = self._current
+        group = {'rows': len(timestamps), 'blocks': []}
+        for spec, data in zip(current['columns'], (timestamps, pids, *values.values())):
+            payload = zlib.compress(_shuffle(np.ascontiguousarray(data, dtype=spec['dtype'])), self._level)
+            group['blocks'].append([self._file.tell(), len(payload)])
+            self._file.write(payload)
+        current['row_groups'].append(group)
+        current['rows'] += len(timestamps)
+
+    def end_series(self, source):
+        if self._current is not None:
+            self._series.append(self._current)
+            self._current = None
+
+    def close(self):
+        footer = json.dumps({'format': 'pmcol', 'version': 1, 'shuffle': True,
+                             'series': self._series}).encode('utf-8')
+        self._file.write(footer)
+        self._file.write(COLUMNAR_TRAILER.pack(len(footer), COLUMNAR_END))
+        self._file.close()
+
+
+class ColumnarReader:
+    """Đọc file .pmcol: metadata từ footer, từng cột giải nén theo row group khi cần."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+                raise ValueError(f"'{path}' is not a columnar export")
+            f.seek(-COLUMNAR_TRAILER.size, os.SEEK_END)
+            footer_size, end_magic = COLUMNAR_TRAILER.unpack(f.read(COLUMNAR_TRAILER.size))
+            if end_magic != COLUMNAR_END:
+                raise ValueError(f"'{path}' is incomplete (missing footer)")
+            f.seek(-COLUMNAR_TRAILER.size - footer_size, os.SEEK_END)
+            self.footer = json.loads(f.read(footer_size))
+        self.series = self.footer['series']
+
+    def read_column(self, series_index, column):
+        """Toàn bộ một cột của một series."""
+        series = self.series[series_index]
+        position = [spec['name'] for spec in series['columns']].index(column)
+        dtype = series['columns'][position]['dtype']
+        parts = []
+        with open(self.path, 'rb') as f:
+            for group in series['row_groups']:
+                offset, size = group['blocks'][position]
+                f.seek(offset)
+                parts.append(_unshuffle(zlib.decompress(f.read(size)), dtype, group['rows']))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+
+EXPORT_FORMATS = {'csv': CsvExportWriter, 'columnar': ColumnarExportWriter}
+
+
+def format_for_path(path):
+    """Định dạng theo đuôi file: .csv -> csv, còn lại -> columnar."""
+    return 'csv' if path.lower().endswith('.csv') else 'columnar'
+
+
+def export_session(sources, path, fmt=None, chunk_rows=CHUNK_ROWS):
+    """
+    Generator xuất các nguồn ra path, trả về (số dòng đã xuất, tổng số dòng) sau mỗi chunk.
+
+    Dữ liệu được ghi vào file tạm và chỉ đổi tên thành path khi xong; nếu generator bị
+    đóng giữa chừng (hủy), file tạm bị xóa.
+    """
+    fmt = fmt or format_for_path(path)
+    extra_metrics = []
+    for source in sources:
+        for metric in source.metrics:
+            if metric not in METRIC_NAMES and metric not in extra_metrics:
+                extra_metrics.append(metric)
+    total = sum(source.rows for source in sources)
+
+    tmp_path = path + '.part'
+    writer = EXPORT_FORMATS[fmt](tmp_path, extra_metrics)
+    done = 0
+    try:
+        for source in sources:
+            for start in range(0, source.rows, chunk_rows):
+                stop = min(start + chunk_rows, source.rows)
+                timestamps, pids, values = source.chunk(start, stop)
+                if len(timestamps):
+                    writer.write_chunk(source, timestamps, pids, values)
+                done += stop - start
+                yield done, total
+            writer.end_series(source)
+        writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            writer.close()  # Có thể lỗi tiếp (ví dụ đĩa đầy khi flush), file tạm vẫn phải bị xóa
+        finally:
+            os.remove(tmp_path)
+        raise
+
+
+def open_sources(path):
+    """Các nguồn xuất từ một recording (.pmts hoặc CSV)."""
+    if is_timeseries_recording(path):
+        series_list = open_timeseries(path)
+    else:
+        series_list = [ArraySeries.from_recorded(series) for series in read_recording(path)]
+    return [SeriesSource(series) for series in series_list if len(series)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a Process Monitor recording as CSV or columnar binary")
+    parser.add_argument("input", help="Recording (.pmts folder or CSV)")
+    parser.add_argument("-o", "--output", required=True, help="File đầu ra (.csv hoặc .pmcol)")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), help="Mặc định theo đuôi file đầu ra")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Số dòng mỗi chunk")
+    args = parser.parse_args(argv)
+
+    try:
+        sources = open_sources(args.input)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not read recording '{args.input}': {e}", file=sys.stderr)
+        return 1
+
+    started = time.monotonic()
+    last_report = 0.0
+    done = total = 0
+    try:
+        for done, total in export_session(sources, args.output, args.format, args.chunk_rows):
+            now = time.monotonic()
+            if now - last_report >= 1.0:
+                print(f"\rExported {done}/{total} samples ({done * 100 // max(total, 1)}%)", end='',
+                      file=sys.stderr)
+                last_report = now
+    except Exception as e:
+        # Đĩa đầy, chunk .pmts hỏng... (file tạm đã bị xóa)
+        print(f"\nCould not export to '{args.output}': {e}", file=sys.stderr)
+        return 1
+    print(f"\rExported {done}/{total} samples to {args.output} in {time.monotonic() - started:.1f} s",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
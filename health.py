@@ -0,0 +1,182 @@
+"""
+Tự đo đạc (self-instrumentation) của chính Process Monitor: monitor làm nhiễu máy bao nhiêu.
+
+Các độ trễ được gom vào Histogram với bucket theo thang log (HISTOGRAM_STEPS bucket mỗi lần
+gấp đôi, từ 1 µs tới ~100 s). Ghi một giá trị chỉ là một phép log2 và một phép cộng vào
+list, nên có thể để bật thường trực, kể cả cho từng PID ở mỗi tick:
+- sample_latency: thời gian đọc một PID qua backend (engine, mỗi PID mỗi tick).
+- tick_jitter, tick_cost: lấy mẫu muộn bao nhiêu so với lịch và một lượt lấy mẫu mất bao lâu.
+- signal_delay: từ lúc worker emit batch tới lúc GUI thread xử lý nó (hàng đợi sự kiện Qt).
+- batch_handling, render: thời gian GUI xử lý một batch và vẽ lại một tab.
+
+MonitorHealth còn ghi CPU% và RSS của chính monitor (cộng cả các process con, ví dụ các
+shard) mỗi lần sample_usage() được gọi, và so với ngân sách OWN_CPU_BUDGET/OWN_RSS_BUDGET_MB.
+export() ghi toàn bộ ra JSON hoặc CSV (theo đuôi file).
+
+Module này không import Qt.
+"""
+import csv
+import json
+import math
+import time
+from collections import deque
+
+import psutil
+
+HISTOGRAM_STEPS = 4  # Số bucket cho mỗi lần gấp đôi (sai số tương đối tối đa ~19%)
+HISTOGRAM_MIN_S = 1e-6
+HISTOGRAM_BUCKETS = HISTOGRAM_STEPS * 27  # 1 µs * 2^27 ≈ 134 s
+USAGE_HISTORY = 3600  # Số lần đo CPU/RSS giữ lại (1 giờ với chu kỳ 1 s)
+OWN_CPU_BUDGET = 2.0  # % một core
+OWN_RSS_BUDGET_MB = 300.0
+MB = 1000 * 1000
+
+HISTOGRAM_LABELS = {
+    'sample_latency': "Per-PID sample latency",
+    'tick_jitter': "Tick schedule jitter",
+    'tick_cost': "Sampling cost per tick",
+    'signal_delay': "Signal queue delay",
+    'batch_handling': "Batch handling (GUI)",
+    'render': "Tab render time",
+}
+
+
+class Histogram:
+    """Histogram độ trễ (giây) với bucket theo thang log, cập nhật O(1)."""
+
+    def __init__(self):
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds > HISTOGRAM_MIN_S:
+            index = min(int(math.log2(seconds / HISTOGRAM_MIN_S) * HISTOGRAM_STEPS), HISTOGRAM_BUCKETS - 1)
+        else:
+            index = 0
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def reset(self):
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def merge(self, state):
+        """Cộng dồn trạng thái của một histogram khác (xem state())."""
+        counts, count, total, maximum = state
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.count += count
+        self.total += total
+        self.max = max(self.max, maximum)
+
+    def state(self):
+        """Bản chụp gọn để gửi giữa các process (chỉ gồm kiểu dữ liệu có sẵn)."""
+        return list(self.counts), self.count, self.total, self.max
+
+    @staticmethod
+    def upper_bound(index):
+        """Cận trên (giây) của bucket."""
+        return HISTOGRAM_MIN_S * 2 ** ((index + 1) / HISTOGRAM_STEPS)
+
+    def percentile(self, q):
+        """Phân vị q (0–100) ước lượng bằng cận trên của bucket chứa nó (không vượt quá max)."""
+        if not self.count:
+            return 0.0
+        target = self.count * q / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target and bucket_count:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        """Thống kê tính bằng ms."""
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(50) * 1000,
+            'p90_ms': self.percentile(90) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+    def buckets(self):
+        """Các bucket khác rỗng: [(cận trên ms, số lần)]."""
+        return [(self.upper_bound(index) * 1000, count) for index, count in enumerate(self.counts) if count]
+
+
+class MonitorHealth:
+    """Các histogram phía GUI cùng lịch sử CPU/RSS của chính monitor."""
+
+    def __init__(self):
+        self.histograms = {name: Histogram() for name in ('signal_delay', 'batch_handling', 'render')}
+        self.usage = deque(maxlen=USAGE_HISTORY)  # (wall_clock, cpu %, rss MB)
+        self._process = psutil.Process()
+        self._children = {}  # pid -> psutil.Process, giữ lại để cpu_percent có mốc so sánh
+        self._process.cpu_percent()
+
+    def sample_usage(self):
+        """Đo CPU% (từ lần gọi trước) và RSS của monitor cùng các process con. Gọi định kỳ."""
+        cpu_percent = self._process.cpu_percent()
+        rss = self._process.memory_info().rss
+        try:
+            children = self._process.children()
+        except psutil.Error:
+            children = []
+        current = {}
+        for child in children:
+            child = self._children.get(child.pid, child)
+            try:
+                if child.pid in self._children:
+                    cpu_percent += child.cpu_percent()
+                else:
+                    child.cpu_percent()  # Lần đầu chỉ đặt mốc
+                rss += child.memory_info().rss
+            except psutil.Error:
+                continue
+            current[child.pid] = child
+        self._children = current
+        self.usage.append((time.time(), cpu_percent, rss / MB))
+        return cpu_percent, rss / MB
+
+    def snapshot(self, engine_histograms=None):
+        """Toàn bộ số liệu: histogram của engine (nếu có) và của GUI, CPU/RSS, ngân sách."""
+        histograms = dict(engine_histograms or {}, **self.histograms)
+        usage = list(self.usage)
+        return {
+            'time': time.time(),
+            'budget': {'own_cpu_percent': OWN_CPU_BUDGET, 'own_rss_mb': OWN_RSS_BUDGET_MB},
+            'own_cpu_percent': usage[-1][1] if usage else None,
+            'own_rss_mb': usage[-1][2] if usage else None,
+            'own_cpu_percent_mean': sum(item[1] for item in usage) / len(usage) if usage else None,
+            'own_rss_mb_max': max(item[2] for item in usage) if usage else None,
+            'histograms': {name: dict(histogram.summary(), buckets=histogram.buckets())
+                           for name, histogram in histograms.items()},
+            'usage': usage,
+        }
+
+    def export(self, path, engine_histograms=None):
+        """Ghi snapshot ra JSON, hoặc CSV nếu path có đuôi .csv (mỗi dòng một bucket/lần đo)."""
+        snapshot = self.snapshot(engine_histograms)
+        if not path.lower().endswith('.csv'):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, indent=1)
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(('kind', 'name', 'x', 'value'))
+            for name, histogram in snapshot['histograms'].items():
+                for key in ('count', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms'):
+                    writer.writerow(('summary', name, key, round(histogram[key], 4)))
+                for upper_ms, count in histogram['buckets']:
+                    writer.writerow(('bucket', name, round(upper_ms, 4), count))
+            for timestamp, cpu_percent, rss_mb in snapshot['usage']:
+                writer.writerow(('usage', 'own_cpu_percent', round(timestamp, 3), round(cpu_percent, 2)))
+                writer.writerow(('usage', 'own_rss_mb', round(timestamp, 3), round(rss_mb, 3)))
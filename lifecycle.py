@@ -0,0 +1,203 @@
+"""
+Phát hiện process kết thúc (và fork/exec) theo sự kiện thay vì kiểm tra lại mỗi tick.
+
+- Kết thúc: mỗi PID đang theo dõi có một pidfd (os.pidfd_open, Linux >= 5.3). pidfd trở
+  nên readable ngay khi process kết thúc, kể cả khi nó còn là zombie chưa được thu hồi.
+  Một thread chờ mọi pidfd bằng epoll và gọi on_exit(pid) ngay lúc đó.
+- Fork/exec/exit của toàn hệ thống: netlink proc connector (cần CAP_NET_ADMIN, thường là
+  root). Các sự kiện được gom vào hàng đợi để bảng process cập nhật theo sự kiện thay vì
+  liệt kê lại /proc mỗi tick; exec cho biết process đã đổi tên/cmdline.
+
+Cả hai đều là tùy chọn: nếu pidfd_open không có (kernel cũ, không phải Linux) hoặc không
+mở được proc connector, phía gọi tiếp tục polling như trước.
+
+Module này chỉ dùng thư viện chuẩn.
+"""
+import errno
+import os
+import select
+import socket
+import struct
+import threading
+from collections import deque
+
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+PROC_CN_MCAST_LISTEN = 1
+PROC_EVENT_FORK = 0x00000001
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+NLMSG_DONE = 3
+
+NLMSG_HEADER = struct.Struct('=IHHII')  # len, type, flags, seq, pid
+CN_HEADER = struct.Struct('=IIIIHH')  # idx, val, seq, ack, len, flags
+EVENT_HEADER = struct.Struct('=IIQ')  # what, cpu, timestamp_ns
+EVENT_PIDS = struct.Struct('=IIII')  # 4 trường đầu của union event_data
+EVENT_OFFSET = NLMSG_HEADER.size + CN_HEADER.size
+
+RECV_SIZE = 1 << 16
+MAX_PENDING_EVENTS = 100000  # Quá số này thì coi như mất sự kiện, phía đọc quét lại toàn bộ
+
+
+def pidfd_supported():
+    """Hệ thống có hỗ trợ pidfd_open hay không."""
+    if not hasattr(os, 'pidfd_open'):
+        return False
+    try:
+        fd = os.pidfd_open(os.getpid())
+    except OSError:
+        return False
+    os.close(fd)
+    return True
+
+
+class ProcConnector:
+    """Socket netlink nhận sự kiện fork/exec/exit của mọi process trong hệ thống."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            self.sock.bind((0, CN_IDX_PROC))
+            payload = struct.pack('=I', PROC_CN_MCAST_LISTEN)
+            message = CN_HEADER.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(payload), 0) + payload
+            self.sock.send(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(message), NLMSG_DONE, 0, 0, 0) + message)
+        except OSError:
+            self.sock.close()
+            raise
+        self.sock.setblocking(False)
+        self.events = deque()  # ('fork' | 'exec' | 'exit', pid), append/popleft là thread-safe
+        self.overflowed = False  # Đã mất sự kiện: phía đọc phải quét lại toàn bộ /proc
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def read_events(self):
+        """Đọc mọi datagram đang chờ (gọi khi socket readable)."""
+        while True:
+            try:
+                data = self.sock.recv(RECV_SIZE)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:  # Kernel đã bỏ sự kiện vì bộ đệm socket đầy
+                    self.overflowed = True
+                    continue
+                raise
+            offset = 0
+            while offset + EVENT_OFFSET + EVENT_HEADER.size + EVENT_PIDS.size <= len(data):
+                length = NLMSG_HEADER.unpack_from(data, offset)[0]
+                what = EVENT_HEADER.unpack_from(data, offset + EVENT_OFFSET)[0]
+                first, first_tgid, second, second_tgid = EVENT_PIDS.unpack_from(
+                    data, offset + EVENT_OFFSET + EVENT_HEADER.size)
+                # Chỉ quan tâm tới process (thread group), bỏ qua sự kiện của từng thread
+                if what == PROC_EVENT_FORK and second == second_tgid:
+                    self._push('fork', second_tgid)
+                elif what == PROC_EVENT_EXEC:
+                    self._push('exec', first_tgid)
+                elif what == PROC_EVENT_EXIT and first == first_tgid:
+                    self._push('exit', first_tgid)
+                offset += max(length, NLMSG_HEADER.size)
+
+    def drain(self):
+        """Lấy ra mọi sự kiện đang chờ theo thứ tự."""
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    def _push(self, kind, pid):
+        if len(self.events) >= MAX_PENDING_EVENTS:
+            self.overflowed = True
+        else:
+            self.events.append((kind, pid))
+
+    def close(self):
+        self.sock.close()
+
+
+class LifecycleWatcher:
+    """
+    Thread chờ trên các pidfd (và socket proc connector nếu bật) bằng epoll.
+
+    on_exit(pid) được gọi trên thread của watcher; PID đó tự động thôi được theo dõi.
+    """
+
+    def __init__(self, on_exit):
+        self._on_exit = on_exit
+        self._lock = threading.Lock()
+        self._fds = {}  # pid -> pidfd
+        self._pids = {}  # pidfd -> pid
+        self._epoll = select.epoll()
+        self._wake_read, self._wake_write = os.pipe()
+        self._epoll.register(self._wake_read, select.EPOLLIN)
+        self._stopped = False
+        self.connector = None
+        self._thread = threading.Thread(target=self._run, name="LifecycleWatcher", daemon=True)
+        self._thread.start()
+
+    def watch(self, pid):
+        """Theo dõi PID bằng pidfd. Trả về False nếu không được (phía gọi tiếp tục polling PID này)."""
+        try:
+            fd = os.pidfd_open(pid)
+        except OSError:
+            return False
+        with self._lock:
+            self._unwatch(pid)
+            self._fds[pid] = fd
+            self._pids[fd] = pid
+            self._epoll.register(fd, select.EPOLLIN)
+        return True
+
+    def unwatch(self, pid):
+        with self._lock:
+            self._unwatch(pid)
+
+    def enable_connector(self):
+        """Bật nhận sự kiện fork/exec/exit qua netlink. Trả về False nếu không có quyền hoặc không hỗ trợ."""
+        if self.connector is None:
+            try:
+                connector = ProcConnector()
+            except (OSError, AttributeError):  # AttributeError: nền tảng không có AF_NETLINK
+                return False
+            self.connector = connector
+            self._epoll.register(connector.fileno(), select.EPOLLIN)
+        return True
+
+    def stop(self):
+        self._stopped = True
+        os.write(self._wake_write, b'x')
+
+    def _unwatch(self, pid):
+        fd = self._fds.pop(pid, None)
+        if fd is not None:
+            del self._pids[fd]
+            self._epoll.unregister(fd)
+            os.close(fd)
+
+    def _run(self):
+        while not self._stopped:
+            exited = []
+            for fd, _ in self._epoll.poll():
+                if fd == self._wake_read:
+                    continue
+                if self.connector is not None and fd == self.connector.fileno():
+                    self.connector.read_events()
+                    continue
+                with self._lock:
+                    pid = self._pids.get(fd)
+                    if pid is not None:
+                        self._unwatch(pid)
+                        exited.append(pid)
+            if not self._stopped:
+                for pid in exited:
+                    self._on_exit(pid)
+
+        with self._lock:
+            for pid in list(self._fds):
+                self._unwatch(pid)
+        if self.connector is not None:
+            self.connector.close()
+        self._epoll.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
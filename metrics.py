@@ -0,0 +1,203 @@
+"""
+Các metric mở rộng (ngoài CPU/RAM), chỉ được đọc khi người dùng bật.
+
+Mỗi metric khai báo các trường nó trả về, đơn vị, chi phí và cách đọc qua psutil:
+- CHEAP: đọc mỗi tick, tất cả trong cùng một process.oneshot() để các file /proc dùng
+  chung (ví dụ /proc/<pid>/status cho số thread và context switch) chỉ bị đọc một lần.
+- EXPENSIVE: đọc theo chu kỳ riêng, thích nghi theo chi phí đo được: sau mỗi lượt đọc
+  cho mọi PID, chu kỳ được chọn sao cho metric đó chiếm không quá EXPENSIVE_BUDGET thời
+  gian thực, trong khoảng [min_interval_s, max_interval_s] của metric.
+
+Giá trị đi kèm mẫu của engine ở phần tử thứ tư: {'metrics': {trường: giá trị}}; chỉ có
+các trường được đọc ở tick đó. Các metric dạng bộ đếm (I/O, context switch, CPU theo
+thread) được đổi thành tốc độ trên giây, nên lần đọc đầu tiên chưa có giá trị.
+
+Module này không import Qt.
+"""
+import time
+
+import psutil
+
+CHEAP = 'cheap'
+EXPENSIVE = 'expensive'
+EXPENSIVE_BUDGET = 0.01  # Tỷ lệ thời gian thực tối đa cho mỗi metric đắt (1%)
+MB = 1000 * 1000
+
+
+class Metric:
+    """Khai báo một metric: các trường (tên, nhãn), đơn vị, chi phí và hàm đọc."""
+
+    def __init__(self, name, label, fields, unit, cost, read, min_interval_s=0.0, max_interval_s=0.0):
+        self.name = name
+        self.label = label
+        self.fields = fields
+        self.unit = unit
+        self.cost = cost
+        self.read = read  # read(process, state, now) -> {trường: giá trị}
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+
+    def describe(self):
+        """Mô tả chi phí/chu kỳ để hiển thị khi chọn metric."""
+        if self.cost == CHEAP:
+            return "cheap, read every tick"
+        return f"expensive, adaptive cadence {self.min_interval_s:g}–{self.max_interval_s:g} s"
+
+
+def _rates(state, now, **counters):
+    """Đổi các bộ đếm tăng dần thành tốc độ trên giây so với lần đọc trước."""
+    previous = state.get('time')
+    result = {}
+    if previous is not None and now > previous:
+        elapsed = now - previous
+        result = {field: max(value - state[field], 0) / elapsed for field, value in counters.items()}
+    state.update(counters)
+    state['time'] = now
+    return result
+
+
+def _read_io(process, state, now):
+    io = process.io_counters()
+    return _rates(state, now, read_mb_s=io.read_bytes / MB, write_mb_s=io.write_bytes / MB)
+
+
+def _read_ctx_switches(process, state, now):
+    switches = process.num_ctx_switches()
+    return _rates(state, now, voluntary_per_s=switches.voluntary, involuntary_per_s=switches.involuntary)
+
+
+def _read_fds(process, state, now):
+    # Windows không có file descriptor, dùng số handle thay thế
+    return {'fds': process.num_fds() if psutil.POSIX else process.num_handles()}
+
+
+def _read_threads(process, state, now):
+    return {'threads': process.num_threads()}
+
+
+def _read_thread_cpu(process, state, now):
+    # Duyệt /proc/<pid>/task: chi phí tăng theo số thread
+    totals = {thread.id: thread.user_time + thread.system_time for thread in process.threads()}
+    previous, previous_time = state.get('totals'), state.get('time')
+    state['totals'] = totals
+    state['time'] = now
+    if previous is None or now <= previous_time:
+        return {}
+    elapsed = now - previous_time
+    # % của một core, nên 100% nghĩa là thread bận nhất đã bão hòa một core
+    busiest = max(((total - previous.get(tid, 0.0)) / elapsed * 100 for tid, total in totals.items()), default=0.0)
+    return {'top_thread_cpu': busiest}
+
+
+def _read_pss_uss(process, state, now):
+    # Trên Linux đọc /proc/<pid>/smaps_rollup (hoặc smaps với kernel cũ)
+    info = process.memory_full_info()
+    result = {'uss_mb': info.uss / MB}
+    if hasattr(info, 'pss'):
+        result['pss_mb'] = info.pss / MB
+    return result
+
+
+METRICS = {metric.name: metric for metric in (
+    Metric('io', "Disk I/O", (('read_mb_s', "Read"), ('write_mb_s', "Write")), 'MB/s', CHEAP, _read_io),
+    Metric('ctx_switches', "Context switches", (('voluntary_per_s', "Voluntary"),
+                                                ('involuntary_per_s', "Involuntary")), '/s', CHEAP, _read_ctx_switches),
+    Metric('fds', "Open file descriptors", (('fds', "FDs"),), '', CHEAP, _read_fds),
+    Metric('threads', "Threads", (('threads', "Threads"),), '', CHEAP, _read_threads),
+    Metric('thread_cpu', "Busiest thread CPU", (('top_thread_cpu', "Busiest thread"),), '%', EXPENSIVE,
+           _read_thread_cpu, min_interval_s=1.0, max_interval_s=30.0),
+    Metric('pss_uss', "PSS / USS memory", (('pss_mb', "PSS"), ('uss_mb', "USS")), 'MB', EXPENSIVE,
+           _read_pss_uss, min_interval_s=2.0, max_interval_s=60.0),
+)}
+FIELD_METRICS = {field: metric.name for metric in METRICS.values() for field, _ in metric.fields}
+
+
+class MetricCollector:
+    """
+    Đọc các metric đã bật cho các PID. Chỉ dùng trên thread lấy mẫu.
+
+    Khi không bật metric nào, collect() không được gọi nên không tốn gì thêm.
+    """
+
+    def __init__(self, names=()):
+        self._processes = {}  # pid -> psutil.Process
+        self._state = {}  # (pid, tên metric) -> trạng thái của lần đọc trước
+        self._unavailable = set()  # (pid, tên metric) không đọc được (không có quyền, không hỗ trợ)
+        self._next_due = {}  # tên metric đắt -> thời điểm (monotonic) đọc lượt kế tiếp
+        self.intervals = {}  # tên metric đắt -> chu kỳ hiện tại (giây)
+        self.enabled = []
+        self.set_enabled(names)
+
+    def set_enabled(self, names):
+        self.enabled = [METRICS[name] for name in names]
+        enabled = set(names)
+        for key in [key for key in self._state if key[1] not in enabled]:
+            del self._state[key]
+        self._unavailable = {key for key in self._unavailable if key[1] in enabled}
+        self._next_due = {name: due for name, due in self._next_due.items() if name in enabled}
+        self.intervals = {name: interval for name, interval in self.intervals.items() if name in enabled}
+
+    def open(self, pid, process=None):
+        if process is not None:
+            self._processes[pid] = process
+
+    def close(self, pid):
+        self._processes.pop(pid, None)
+        for metric in METRICS:
+            self._state.pop((pid, metric), None)
+            self._unavailable.discard((pid, metric))
+
+    def collect(self, pids):
+        """Đọc các metric tới hạn cho các PID, trả về {pid: {trường: giá trị}}."""
+        now = time.monotonic()
+        cheap = [metric for metric in self.enabled if metric.cost == CHEAP]
+        due = [metric for metric in self.enabled
+               if metric.cost == EXPENSIVE and now >= self._next_due.get(metric.name, 0.0)]
+        if not cheap and not due:
+            return {}
+
+        spent = dict.fromkeys((metric.name for metric in due), 0.0)
+        results = {}
+        for pid in pids:
+            process = self._process(pid)
+            if process is None:
+                continue
+            values = {}
+            if cheap:
+                with process.oneshot():
+                    for metric in cheap:
+                        self._read(metric, pid, process, now, values)
+            for metric in due:
+                started = time.perf_counter()
+                self._read(metric, pid, process, now, values)
+                spent[metric.name] += time.perf_counter() - started
+            if values:
+                results[pid] = values
+
+        # Chu kỳ thích nghi: lượt đọc càng tốn thời gian thì lượt sau càng thưa
+        for metric in due:
+            interval = min(max(spent[metric.name] / EXPENSIVE_BUDGET, metric.min_interval_s), metric.max_interval_s)
+            self.intervals[metric.name] = interval
+            self._next_due[metric.name] = now + interval
+        return results
+
+    def _process(self, pid):
+        process = self._processes.get(pid)
+        if process is None:
+            try:
+                process = self._processes[pid] = psutil.Process(pid)
+            except psutil.Error:
+                return None
+        return process
+
+    def _read(self, metric, pid, process, now, values):
+        key = (pid, metric.name)
+        if key in self._unavailable:
+            return
+        try:
+            values.update(metric.read(process, self._state.setdefault(key, {}), now))
+        except (psutil.AccessDenied, psutil.ZombieProcess, NotImplementedError, AttributeError):
+            # Metric này không đọc được cho PID này (không có quyền hoặc nền tảng không hỗ trợ)
+            self._unavailable.add(key)
+        except psutil.NoSuchProcess:
+            pass  # Backend chính sẽ báo process kết thúc
@@ -0,0 +1,309 @@
+"""
+Bảng tổng quan cho hàng trăm process: mỗi process một dòng trong QTableView.
+
+Khác với ProcessTabWidget (hai pg.PlotWidget cho mỗi PID), mỗi dòng ở đây chỉ giữ vài
+số chạy (hiện tại/trung bình/tối đa) và SPARKLINE_SAMPLES mẫu gần nhất. View của Qt chỉ
+vẽ các dòng đang thấy trên màn hình, sparkline được delegate vẽ trực tiếp bằng QPainter.
+
+Sắp xếp được làm lại sau mỗi batch trên thứ tự hiện có: Timsort gần như O(n) khi chỉ vài
+dòng đổi chỗ, và view chỉ nhận layoutChanged khi thứ tự thực sự thay đổi.
+"""
+from collections import deque
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, QPointF, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QPainter, QPen, QPolygonF
+from PyQt6.QtWidgets import (
+    QAbstractItemView, QHBoxLayout, QHeaderView, QLabel, QMenu, QStyle, QStyledItemDelegate,
+    QTableView, QVBoxLayout, QWidget
+)
+
+SPARKLINE_SAMPLES = 120  # Số mẫu gần nhất giữ lại cho sparkline (và nạp sẵn khi mở tab chi tiết)
+SPARKLINE_ROLE = Qt.ItemDataRole.UserRole
+ROW_HEIGHT = 22
+
+COLUMNS = ("PID", "Name", "CPU %", "Avg CPU %", "Max CPU %", "RAM MB", "Avg RAM MB", "Max RAM MB",
+           "CPU (recent)")
+SPARKLINE_COLUMN = len(COLUMNS) - 1
+FIRST_VALUE_COLUMN = 2  # Các cột từ đây trở đi thay đổi theo mỗi mẫu
+
+
+class OverviewRow:
+    """Trạng thái nhẹ của một process trong bảng tổng quan."""
+    __slots__ = ('pid', 'name', 'start_time', 'status', 'message', 'history', 'count',
+                 'cpu', 'ram', 'cpu_sum', 'ram_sum', 'cpu_max', 'ram_max')
+
+    def __init__(self, pid, name, start_time):
+        self.pid = pid
+        self.name = name
+        self.start_time = start_time
+        self.status = 'running'  # 'running', 'terminated' hoặc 'error'
+        self.message = None
+        self.history = deque(maxlen=SPARKLINE_SAMPLES)  # [(absolute_timestamp, cpu_percent, memory_mb), ...]
+        self.count = 0
+        self.cpu = self.ram = None
+        self.cpu_sum = self.ram_sum = 0.0
+        self.cpu_max = self.ram_max = 0.0
+
+    def add(self, sample):
+        timestamp, cpu_percent, memory_mb = sample[:3]
+        self.history.append((timestamp, cpu_percent, memory_mb))
+        self.count += 1
+        self.cpu = cpu_percent
+        self.ram = memory_mb
+        self.cpu_sum += cpu_percent
+        self.ram_sum += memory_mb
+        if cpu_percent > self.cpu_max:
+            self.cpu_max = cpu_percent
+        if memory_mb > self.ram_max:
+            self.ram_max = memory_mb
+
+    def values(self):
+        """Giá trị số của các cột từ FIRST_VALUE_COLUMN (None khi chưa có mẫu)."""
+        if not self.count:
+            return (None,) * 6
+        return (self.cpu, self.cpu_sum / self.count, self.cpu_max,
+                self.ram, self.ram_sum / self.count, self.ram_max)
+
+
+def _sort_key(column):
+    if column == 0:
+        return lambda row: row.pid
+    if column == 1:
+        return lambda row: row.name.lower()
+    if column == SPARKLINE_COLUMN:
+        column = FIRST_VALUE_COLUMN  # Sparkline sắp theo CPU hiện tại
+    position = column - FIRST_VALUE_COLUMN
+    # Dòng chưa có mẫu luôn đứng sau khi sắp giảm dần
+    return lambda row: row.values()[position] if row.count else -1.0
+
+
+class OverviewModel(QAbstractTableModel):
+    """Model của bảng tổng quan: danh sách OverviewRow theo thứ tự đang hiển thị."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._by_pid = {}  # pid -> OverviewRow
+        self._sort_column = None
+        self._sort_order = Qt.SortOrder.DescendingOrder
+
+    # --- Giao diện QAbstractTableModel ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return str(row.pid)
+            if column == 1:
+                return row.name if row.status == 'running' else f"{row.name} ({row.status})"
+            if column == SPARKLINE_COLUMN:
+                return None
+            value = row.values()[column - FIRST_VALUE_COLUMN]
+            return "--" if value is None else f"{value:.2f}"
+        if role == SPARKLINE_ROLE:
+            return row.history
+        if role == Qt.ItemDataRole.TextAlignmentRole and column != 1:
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.ForegroundRole and row.status != 'running':
+            return QColor('orange') if row.status == 'error' else QColor('gray')
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if row.message:
+                return row.message
+            return f"{row.name} (PID {row.pid}), {row.count} samples. Double-click to open the detailed tab."
+        return None
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self._resort()
+
+    # --- Cập nhật từ MainWindow ---
+    def row_for(self, pid):
+        return self._by_pid.get(pid)
+
+    def pid_at(self, row):
+        return self._rows[row].pid
+
+    def add_processes(self, entries):
+        """Thêm nhiều dòng một lần: entries là [(pid, tên, start_time), ...]."""
+        entries = [entry for entry in entries if entry[0] not in self._by_pid]
+        if not entries:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        for pid, name, start_time in entries:
+            row = OverviewRow(pid, name, start_time)
+            self._rows.append(row)
+            self._by_pid[pid] = row
+        self.endInsertRows()
+
+    def remove_processes(self, pids):
+        for pid in pids:
+            row = self._by_pid.pop(pid, None)
+            if row is None:
+                continue
+            position = self._rows.index(row)
+            self.beginRemoveRows(QModelIndex(), position, position)
+            del self._rows[position]
+            self.endRemoveRows()
+
+    def update_samples(self, batch):
+        """Nhận batch {pid: [mẫu, ...]} từ worker; chỉ báo thay đổi các cột giá trị rồi sắp lại."""
+        changed = False
+        for pid, samples in batch.items():
+            row = self._by_pid.get(pid)
+            if row is None or row.status != 'running':
+                continue
+            for sample in samples:
+                row.add(sample)
+            changed = True
+        if not changed:
+            return
+        # Một tín hiệu cho cả khối: view chỉ vẽ lại các dòng đang thấy
+        self.dataChanged.emit(self.index(0, FIRST_VALUE_COLUMN),
+                              self.index(len(self._rows) - 1, SPARKLINE_COLUMN))
+        self._resort()
+
+    def set_status(self, pid, status, message=None):
+        row = self._by_pid.get(pid)
+        if row is None:
+            return
+        row.status = status
+        row.message = message
+        position = self._rows.index(row)
+        self.dataChanged.emit(self.index(position, 0), self.index(position, SPARKLINE_COLUMN))
+
+    def reattach(self, old_pid, new_pid):
+        """Dòng của process khởi động lại (luật auto-attach) tiếp tục với PID mới."""
+        row = self._by_pid.pop(old_pid, None)
+        if row is None:
+            return
+        row.pid = new_pid
+        self._by_pid[new_pid] = row
+        self.set_status(new_pid, 'running')
+
+    def _resort(self):
+        if self._sort_column is None or not self._rows:
+            return
+        # Sắp trên thứ tự hiện tại: Timsort tận dụng các đoạn đã có thứ tự sẵn
+        ordered = sorted(self._rows, key=_sort_key(self._sort_column),
+                         reverse=self._sort_order == Qt.SortOrder.DescendingOrder)
+        if ordered == self._rows:
+            return
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        tracked = [self._rows[index.row()] for index in persistent]
+        self._rows = ordered
+        positions = {id(row): position for position, row in enumerate(ordered)}
+        self.changePersistentIndexList(persistent, [self.index(positions[id(row)], index.column())
+                                                    for row, index in zip(tracked, persistent)])
+        self.layoutChanged.emit()
+
+
+class SparklineDelegate(QStyledItemDelegate):
+    """Vẽ CPU của SPARKLINE_SAMPLES mẫu gần nhất thành một đường nhỏ, mẫu mới nhất ở mép phải."""
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)  # Nền và vùng chọn
+        history = index.data(SPARKLINE_ROLE)
+        if not history or len(history) < 2:
+            return
+        values = [sample[1] for sample in history]
+        rect = option.rect.adjusted(3, 3, -3, -3)
+        peak = max(max(values), 1.0)
+        step = rect.width() / (SPARKLINE_SAMPLES - 1)
+        left = rect.right() - step * (len(values) - 1)
+        bottom = rect.bottom()
+        scale = rect.height() / peak
+        line = QPolygonF([QPointF(left + i * step, bottom - value * scale) for i, value in enumerate(values)])
+
+        if option.state & QStyle.StateFlag.State_Selected:
+            color = option.palette.highlightedText().color()
+        else:
+            color = index.data(Qt.ItemDataRole.ForegroundRole) or QColor('blue')
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(QPen(color))
+        painter.drawPolyline(line)
+        painter.restore()
+
+
+class OverviewWidget(QWidget):
+    """Tab tổng quan: bảng mọi process đang theo dõi, nhấp đúp để mở tab chi tiết."""
+    open_requested = pyqtSignal(int)  # pid
+    stop_requested = pyqtSignal(list)  # [pid, ...]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = OverviewModel(self)
+
+        layout = QVBoxLayout(self)
+        info_layout = QHBoxLayout()
+        self.count_label = QLabel()
+        info_layout.addWidget(self.count_label)
+        info_layout.addStretch()
+        info_layout.addWidget(QLabel("Double-click a row to open its detailed tab. Right-click for more actions."))
+        layout.addLayout(info_layout)
+
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setItemDelegateForColumn(SPARKLINE_COLUMN, SparklineDelegate(self.view))
+        self.view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.view.setWordWrap(False)
+        self.view.setAlternatingRowColors(True)
+        # Chiều cao dòng cố định: view không phải đo từng dòng khi cuộn hay khi dữ liệu đổi
+        vertical_header = self.view.verticalHeader()
+        vertical_header.setVisible(False)
+        vertical_header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        vertical_header.setDefaultSectionSize(ROW_HEIGHT)
+        header = self.view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setStretchLastSection(True)
+        self.view.setColumnWidth(0, 70)
+        self.view.setColumnWidth(1, 180)
+        for column in range(FIRST_VALUE_COLUMN, SPARKLINE_COLUMN):
+            self.view.setColumnWidth(column, 85)
+        self.view.setSortingEnabled(True)
+        self.view.sortByColumn(FIRST_VALUE_COLUMN, Qt.SortOrder.DescendingOrder)
+        self.view.doubleClicked.connect(lambda index: self.open_requested.emit(self.model.pid_at(index.row())))
+        self.view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self._show_context_menu)
+        layout.addWidget(self.view)
+
+        for signal in (self.model.rowsInserted, self.model.rowsRemoved):
+            signal.connect(self._update_count)
+        self._update_count()
+
+    def selected_pids(self):
+        return [self.model.pid_at(index.row()) for index in self.view.selectionModel().selectedRows()]
+
+    def _update_count(self):
+        self.count_label.setText(f"Processes: <b>{self.model.rowCount()}</b>")
+
+    def _show_context_menu(self, position):
+        pids = self.selected_pids()
+        if not pids:
+            return
+        menu = QMenu(self)
+        open_action = menu.addAction("Open Details")
+        open_action.setEnabled(len(pids) == 1)
+        stop_action = menu.addAction(f"Stop Monitoring ({len(pids)})" if len(pids) > 1 else "Stop Monitoring")
+        chosen = menu.exec(self.view.viewport().mapToGlobal(position))
+        if chosen is open_action:
+            self.open_requested.emit(pids[0])
+        elif chosen is stop_action:
+            self.stop_requested.emit(pids)
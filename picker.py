@@ -0,0 +1,281 @@
+"""
+Hộp thoại Add Process: chọn một hoặc nhiều process từ bảng lọc theo từng phím gõ.
+
+Việc tìm kiếm dùng ProcessIndex (processindex.py), được làm mới dần trên thread riêng và giữ lại
+giữa các lần mở hộp thoại. Model chỉ giữ danh sách PID đang khớp; tên, user, cmdline và CPU/RSS
+được đọc từ index khi view vẽ dòng, và view chỉ vẽ các dòng đang thấy, nên bảng vẫn nhẹ với
+hàng chục nghìn process.
+
+Khi chỉ CPU/RSS thay đổi, các dòng được sắp lại bằng layoutChanged (giữ vùng chọn và vị trí cuộn);
+khi tập PID khớp thay đổi (gõ thêm, process mới/kết thúc), model được reset và các PID đang chọn
+được chọn lại.
+"""
+import time
+
+from PyQt6.QtCore import QAbstractTableModel, QItemSelection, QItemSelectionModel, QModelIndex, Qt, QTimer
+from PyQt6.QtWidgets import (
+    QAbstractItemView, QCheckBox, QDialog, QDialogButtonBox, QHBoxLayout, QHeaderView, QLabel, QLineEdit,
+    QMessageBox, QTableView, QVBoxLayout
+)
+
+ROW_HEIGHT = 22
+FILTER_DELAY_MS = 120  # Chờ người dùng ngừng gõ một chút rồi mới tìm
+POLL_MS = 500  # Chu kỳ kiểm tra index có dữ liệu mới (tập PID hoặc CPU/RSS)
+
+COLUMNS = ("PID", "Name", "User", "CPU %", "RSS MB", "Command")
+CPU_COLUMN = 3
+RSS_COLUMN = 4
+COMMAND_COLUMN = 5
+
+FILTER_HELP = ("Filter by name, command line or user. All words must match, e.g. "
+               "python user:alice cmd:--port ^ngi pid:1234 ppid:1 parent:sshd")
+
+
+class ProcessPickerModel(QAbstractTableModel):
+    """Model của bảng chọn process: danh sách PID đang khớp, theo thứ tự đang hiển thị."""
+
+    def __init__(self, process_index, parent=None):
+        super().__init__(parent)
+        self.process_index = process_index
+        self._pids = []
+        self._sort_column = CPU_COLUMN
+        self._sort_order = Qt.SortOrder.DescendingOrder
+
+    # --- Giao diện QAbstractTableModel ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._pids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        pid = self._pids[index.row()]
+        column = index.column()
+        table = self.process_index.table
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return str(pid)
+            if column == 1:
+                return table.names.get(pid, "")
+            if column == 2:
+                return table.usernames.get(pid, "")
+            if column == CPU_COLUMN:
+                value = self.process_index.cpu.get(pid)
+                return "--" if value is None else f"{value:.1f}"
+            if column == RSS_COLUMN:
+                value = self.process_index.rss.get(pid)
+                return "--" if value is None else f"{value:.1f}"
+            return table.cmdlines.get(pid, "")
+        if role == Qt.ItemDataRole.TextAlignmentRole and column in (0, CPU_COLUMN, RSS_COLUMN):
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.ToolTipRole and column == COMMAND_COLUMN:
+            return table.cmdlines.get(pid) or None
+        return None
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self.resort()
+
+    # --- Cập nhật từ ProcessPickerDialog ---
+    def pid_at(self, row):
+        return self._pids[row]
+
+    def row_of(self, pid):
+        try:
+            return self._pids.index(pid)
+        except ValueError:
+            return -1
+
+    def set_pids(self, pids):
+        """Thay tập PID đang hiển thị. Trả về True nếu model bị reset (tập PID đã đổi)."""
+        if len(pids) == len(self._pids) and set(pids) == set(self._pids):
+            self.resort()
+            return False
+        self.beginResetModel()
+        self._pids = self._ordered(pids)
+        self.endResetModel()
+        return True
+
+    def resort(self):
+        """Sắp lại theo CPU/RSS mới nhất, giữ vùng chọn; các cột số luôn được vẽ lại."""
+        if not self._pids:
+            return
+        ordered = self._ordered(self._pids)
+        if ordered != self._pids:
+            self.layoutAboutToBeChanged.emit()
+            persistent = self.persistentIndexList()
+            tracked = [self._pids[index.row()] for index in persistent]
+            self._pids = ordered
+            positions = {pid: position for position, pid in enumerate(ordered)}
+            self.changePersistentIndexList(persistent, [self.index(positions[pid], index.column())
+                                                        for pid, index in zip(tracked, persistent)])
+            self.layoutChanged.emit()
+        self.dataChanged.emit(self.index(0, CPU_COLUMN), self.index(len(self._pids) - 1, RSS_COLUMN))
+
+    def _ordered(self, pids):
+        # Sắp theo PID trước để thứ tự các dòng bằng nhau ổn định giữa các lần cập nhật
+        ordered = sorted(pids)
+        column = self._sort_column
+        if column == 0:
+            key = None
+        elif column == CPU_COLUMN:
+            values = self.process_index.cpu
+            key = lambda pid: values.get(pid, -1.0)
+        elif column == RSS_COLUMN:
+            values = self.process_index.rss
+            key = lambda pid: values.get(pid, -1.0)
+        else:
+            table = self.process_index.table
+            values = {1: table.names, 2: table.usernames}.get(column, table.cmdlines)
+            key = lambda pid: values.get(pid, "").lower()
+        reverse = self._sort_order == Qt.SortOrder.DescendingOrder
+        if key is not None:
+            ordered.sort(key=key, reverse=reverse)
+        elif reverse:
+            ordered.reverse()
+        return ordered
+
+
+class ProcessPickerDialog(QDialog):
+    """Chọn các process để mở tab theo dõi; gõ để lọc, Ctrl/Shift để chọn nhiều dòng."""
+
+    def __init__(self, process_index, exclude=(), tree=False, parent=None):
+        super().__init__(parent)
+        self.process_index = process_index
+        self.exclude = set(exclude)  # Các PID đang được theo dõi và chính chương trình này
+        self._generation = self._usage_generation = None
+        self.setWindowTitle("Add Process Tree" if tree else "Add Process")
+        self.resize(900, 560)
+
+        layout = QVBoxLayout(self)
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText(FILTER_HELP)
+        self.filter_edit.setToolTip(
+            "<b>Filter syntax</b><br>"
+            "Words are matched (case-insensitive) against name, command line and user; all words must match.<br>"
+            "<i>name:</i>, <i>cmd:</i>, <i>user:</i> restrict a word to one field.<br>"
+            "<i>^abc</i> matches words starting with 'abc' (e.g. <i>cmd:^--port</i>).<br>"
+            "<i>pid:1234</i> a single process, <i>ppid:1234</i> its children, "
+            "<i>parent:sshd</i> children of processes named like 'sshd'.")
+        self.filter_edit.setClearButtonEnabled(True)
+        layout.addWidget(self.filter_edit)
+
+        info_layout = QHBoxLayout()
+        self.count_label = QLabel()
+        info_layout.addWidget(self.count_label)
+        info_layout.addStretch()
+        info_layout.addWidget(QLabel("Ctrl/Shift-click to select several processes. Double-click to add one."))
+        layout.addLayout(info_layout)
+
+        self.model = ProcessPickerModel(process_index, self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.view.setWordWrap(False)
+        self.view.setAlternatingRowColors(True)
+        # Chiều cao dòng cố định: view không phải đo từng dòng khi cuộn hay khi dữ liệu đổi
+        vertical_header = self.view.verticalHeader()
+        vertical_header.setVisible(False)
+        vertical_header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        vertical_header.setDefaultSectionSize(ROW_HEIGHT)
+        header = self.view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setStretchLastSection(True)
+        for column, width in enumerate((70, 160, 90, 70, 80)):
+            self.view.setColumnWidth(column, width)
+        self.view.setSortingEnabled(True)
+        self.view.sortByColumn(CPU_COLUMN, Qt.SortOrder.DescendingOrder)
+        self.view.doubleClicked.connect(self._add_double_clicked)
+        layout.addWidget(self.view)
+
+        self.tree_checkbox = QCheckBox("Monitor the whole process tree (include child processes)")
+        self.tree_checkbox.setChecked(tree)
+        layout.addWidget(self.tree_checkbox)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.button(QDialogButtonBox.StandardButton.Ok).setText("Add Selected")
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DELAY_MS)
+        self._filter_timer.timeout.connect(self.apply_filter)
+        self.filter_edit.textChanged.connect(self._filter_timer.start)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.timeout.connect(self._poll)
+        self._poll_timer.start(POLL_MS)
+
+        self.filter_edit.setFocus()
+        self.apply_filter()
+
+    def selected_pids(self):
+        """PID của các dòng đang chọn (theo thứ tự hiển thị)."""
+        return [self.model.pid_at(row) for row in sorted(index.row() for index in self.view.selectionModel().selectedRows())]
+
+    def apply_filter(self):
+        """Tìm lại theo nội dung ô lọc và cập nhật bảng, giữ các PID đang chọn."""
+        started = time.perf_counter()
+        self._generation = self.process_index.generation
+        self._usage_generation = self.process_index.usage_generation
+        selected = self.selected_pids()
+        pids = [pid for pid in self.process_index.search(self.filter_edit.text()) if pid not in self.exclude]
+        if self.model.set_pids(pids):
+            self._select(selected)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        total = len(self.process_index)
+        if not self._generation:
+            self.count_label.setText("Loading process list...")
+        else:
+            self.count_label.setText(f"Matching: <b>{len(pids)}</b> of {total} processes ({elapsed_ms:.0f} ms)")
+
+    def _select(self, pids):
+        selection = QItemSelection()
+        last_column = self.model.columnCount() - 1
+        for pid in pids:
+            row = self.model.row_of(pid)
+            if row >= 0:
+                selection.select(self.model.index(row, 0), self.model.index(row, last_column))
+        if not selection.isEmpty():
+            self.view.selectionModel().select(selection, QItemSelectionModel.SelectionFlag.ClearAndSelect)
+            self.view.scrollTo(selection.indexes()[0])
+
+    def _poll(self):
+        if self.process_index.generation != self._generation:
+            self.apply_filter()
+        elif self.process_index.usage_generation != self._usage_generation:
+            self._usage_generation = self.process_index.usage_generation
+            self.model.resort()
+
+    def _add_double_clicked(self, index):
+        self.view.selectionModel().select(index, QItemSelectionModel.SelectionFlag.ClearAndSelect |
+                                          QItemSelectionModel.SelectionFlag.Rows)
+        self.accept()
+
+    def accept(self):
+        if self._filter_timer.isActive():
+            self.apply_filter()  # Enter ngay sau khi gõ: lọc theo nội dung mới nhất
+        if not self.selected_pids():
+            if self.model.rowCount() != 1:
+                QMessageBox.warning(self, "No Process Selected", "Select at least one process to add.")
+                return
+            self._select([self.model.pid_at(0)])  # Enter khi chỉ còn một process khớp
+        self._filter_timer.stop()
+        self._poll_timer.stop()
+        super().accept()
+
+    def reject(self):
+        self._filter_timer.stop()
+        self._poll_timer.stop()
+        super().reject()
@@ -0,0 +1,330 @@
+"""
+Chỉ mục tìm kiếm process cho hộp thoại Add Process (picker.py), không phụ thuộc Qt.
+
+ProcessIndex giữ một ProcessTable được làm mới dần trên thread riêng (chỉ PID mới mới bị đọc
+thông tin) cùng hai loại chỉ mục trên tên, cmdline và user:
+- Chỉ mục tiền tố: cho từng trường, dict token -> {pid} kèm danh sách các token khác nhau đã sắp
+  xếp, tra bằng bisect. Token là các từ tách theo khoảng trắng, '/', '=', ':' và ','. Nhiều
+  process dùng chung token (tên, đường dẫn, tham số) nên danh sách ngắn hơn nhiều so với số PID,
+  và thêm/bớt PID thường chỉ sửa một set.
+- Chỉ mục chuỗi con: mỗi trường được ghép (chữ thường) thành một chuỗi duy nhất, ngăn bởi '\\n',
+  kèm vị trí bắt đầu của từng PID. Một lần str.find chạy bằng C trên vài MB thay cho vòng lặp
+  Python qua từng process; vị trí tìm thấy đổi ra PID bằng bisect. Chuỗi ghép chỉ được dựng lại
+  khi bảng đổi (generation), lúc có người tìm.
+CPU/RSS hiện tại được đọc thẳng từ /proc/<pid>/stat trên Linux (psutil ở nơi khác), và chu kỳ
+làm mới tự giãn ra theo chi phí đo được để không tốn CPU trên máy có hàng chục nghìn process.
+
+Cú pháp tìm kiếm: các từ cách nhau bởi khoảng trắng đều phải khớp (AND), không phân biệt hoa
+thường. Từ không có tiền tố tìm trong tên, cmdline và user. Các tiền tố:
+name:, cmd:, user:, pid:N, ppid:N (con của PID N), parent:chuỗi (con của process có tên khớp).
+Từ bắt đầu bằng '^' khớp đầu một token (ví dụ '^py', 'cmd:^--port') thay vì chuỗi con.
+"""
+import bisect
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+
+import psutil
+
+from proctable import ProcessTable
+
+FIELDS = ('name', 'cmd', 'user')
+QUALIFIERS = FIELDS + ('pid', 'ppid', 'parent')
+REFRESH_S = 2.0  # Chu kỳ làm mới tối thiểu
+REFRESH_COST_FACTOR = 10  # Chu kỳ >= 10 lần thời gian một lần làm mới (tốn tối đa ~10% một core)
+READ_CHUNK = 500  # Số PID mới đọc thông tin mỗi lần trước khi đưa vào chỉ mục (để tìm được sớm)
+BULK_THRESHOLD = 32  # Từ số token mới này trở lên thì sắp lại cả danh sách thay vì chèn từng token
+CANDIDATE_RATIO = 4  # Kết quả các từ trước < 1/4 bảng: tìm chuỗi con trực tiếp trong các PID đó
+MAX_CMD_TOKENS = 32  # Cmdline rất dài (classpath...) chỉ đưa các token đầu vào chỉ mục tiền tố
+MB = 1000 * 1000
+
+_TOKEN_SPLIT = re.compile(r"[\s/=:,]+")
+_USE_PROCFS = sys.platform.startswith('linux') and os.path.exists('/proc/self/stat')
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if _USE_PROCFS else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if _USE_PROCFS else 4096
+
+
+def _read_usage(pid):
+    """(thời gian CPU tính bằng giây, RSS MB, mốc bắt đầu của process) hoặc None nếu không đọc được."""
+    if _USE_PROCFS:
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        # Cùng cách tách với ProcfsBackend: utime=14, stime=15, starttime=22, rss=24 (đơn vị trang)
+        fields = data[data.rfind(b')') + 2:].split()
+        if len(fields) < 22:
+            return None
+        return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS, int(fields[21]) * _PAGE_SIZE / MB, int(fields[19])
+    try:
+        process = psutil.Process(pid)
+        with process.oneshot():
+            times = process.cpu_times()
+            return times.user + times.system, process.memory_info().rss / MB, process.create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        return None
+
+
+def _tokens(field, text):
+    tokens = (token for token in _TOKEN_SPLIT.split(text) if token)
+    if field == 'cmd':
+        return set(itertools.islice(tokens, MAX_CMD_TOKENS))
+    return set(tokens) | {text}  # Cả tên/user cũng là một token (tên có thể chứa khoảng trắng)
+
+
+class ProcessIndex:
+    """Bảng process của toàn hệ thống kèm chỉ mục tiền tố/chuỗi con và CPU/RSS hiện tại."""
+
+    def __init__(self):
+        self.table = ProcessTable()
+        self.cpu = {}  # pid -> CPU % (chia cho số core, như các tab)
+        self.rss = {}  # pid -> RSS MB
+        self.generation = 0  # Tăng mỗi khi tập PID (hoặc thông tin của chúng) thay đổi
+        self.usage_generation = 0  # Tăng mỗi lần cpu/rss được đọc lại
+        self.refresh_cost = 0.0  # Thời gian (giây) của lần làm mới gần nhất
+        self._texts = {field: {} for field in FIELDS}  # field -> {pid: chuỗi chữ thường}
+        self._postings = {field: {} for field in FIELDS}  # field -> {token: {pid}}
+        self._tokens = {field: [] for field in FIELDS}  # field -> [token khác nhau] đã sắp xếp
+        self._corpora = {}  # field -> (generation, chuỗi ghép, [vị trí bắt đầu], [pid])
+        self._usage = {}  # pid -> (thời gian CPU, thời điểm đọc, mốc bắt đầu)
+        self._num_cores = psutil.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self.table)
+
+    # --- Làm mới ---
+    def start(self):
+        """Bắt đầu làm mới trên thread nền (bảng đã có từ lần trước vẫn dùng được ngay)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="process-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Dừng thread làm mới; bảng và chỉ mục được giữ lại cho lần mở sau."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing process index: {e}")
+            self._stop_event.wait(max(REFRESH_S, self.refresh_cost * REFRESH_COST_FACTOR))
+
+    def refresh(self):
+        """Đồng bộ tập PID với hệ thống, rồi đọc lại CPU/RSS."""
+        started = time.perf_counter()
+        current = set(psutil.pids())
+        with self._lock:
+            known = set(self.table.ppids)
+        gone = known - current
+        if gone:
+            with self._lock:
+                self._forget(gone)
+                self.generation += 1
+
+        new = sorted(current - known)
+        for start in range(0, len(new), READ_CHUNK):
+            if self._stop_event.is_set():
+                return  # Phần còn lại được đọc ở lần làm mới sau
+            # Đọc thông tin ngoài khóa, để việc tìm kiếm không phải chờ
+            infos = []
+            for pid in new[start:start + READ_CHUNK]:
+                info = ProcessTable.read_info(pid)
+                if info is not None:
+                    infos.append((pid, info))
+            with self._lock:
+                self._insert(infos)
+                self.generation += 1
+
+        self.refresh_usage()
+        self.refresh_cost = time.perf_counter() - started
+
+    def refresh_usage(self):
+        """Đọc CPU (IRIX mode từ chênh lệch với lần trước, chia cho số core) và RSS của mọi PID."""
+        with self._lock:
+            pids = list(self.table.ppids)
+        previous = self._usage
+        usage, cpu, rss, reused = {}, {}, {}, []
+        for pid in pids:
+            if self._stop_event.is_set():
+                return
+            sample = _read_usage(pid)
+            if sample is None:
+                continue
+            cpu_time, memory_mb, start = sample
+            now = time.monotonic()
+            before = previous.get(pid)
+            if before is not None:
+                if before[2] != start:
+                    reused.append(pid)  # PID đã bị tái sử dụng: đọc lại thông tin ở lần làm mới sau
+                    continue
+                elapsed = now - before[1]
+                if elapsed > 0:
+                    cpu[pid] = max(cpu_time - before[0], 0.0) / elapsed * 100 / self._num_cores
+            usage[pid] = (cpu_time, now, start)
+            rss[pid] = memory_mb
+        # Thay cả dict một lần: luồng giao diện luôn thấy một bản nhất quán mà không cần khóa
+        self._usage, self.cpu, self.rss = usage, cpu, rss
+        if reused:
+            with self._lock:
+                self._forget(set(reused) & self.table.ppids.keys())
+                self.generation += 1
+        self.usage_generation += 1
+
+    def _insert(self, infos):
+        for pid, (ppid, name, cmdline, username) in infos:
+            self.table.insert(pid, (ppid, name, cmdline, username))
+        for position, field in enumerate(FIELDS, 1):
+            texts = self._texts[field]
+            postings = self._postings[field]
+            added = []
+            for pid, info in infos:
+                text = (info[position] or "").lower().replace('\n', ' ')
+                texts[pid] = text
+                for token in _tokens(field, text):
+                    pids = postings.get(token)
+                    if pids is None:
+                        postings[token] = pids = set()
+                        added.append(token)
+                    pids.add(pid)
+            tokens = self._tokens[field]
+            if len(added) >= BULK_THRESHOLD:
+                # Timsort gộp hai đoạn đã có thứ tự trong thời gian tuyến tính
+                added.sort()
+                tokens.extend(added)
+                tokens.sort()
+            else:
+                for token in added:
+                    bisect.insort(tokens, token)
+
+    def _forget(self, pids):
+        for pid in pids:
+            self.table.remove(pid)
+        for field in FIELDS:
+            texts = self._texts[field]
+            postings = self._postings[field]
+            emptied = set()
+            for pid in pids:
+                text = texts.pop(pid, None)
+                if text is None:
+                    continue
+                for token in _tokens(field, text):
+                    token_pids = postings.get(token)
+                    if token_pids is not None:
+                        token_pids.discard(pid)
+                        if not token_pids:
+                            del postings[token]
+                            emptied.add(token)
+            if not emptied:
+                continue
+            tokens = self._tokens[field]
+            if len(emptied) >= BULK_THRESHOLD:
+                tokens[:] = [token for token in tokens if token not in emptied]
+            else:
+                for token in emptied:
+                    del tokens[bisect.bisect_left(tokens, token)]
+
+    # --- Tìm kiếm ---
+    def search(self, query):
+        """Danh sách PID khớp với query (cú pháp ở đầu module); query rỗng trả về mọi PID."""
+        with self._lock:
+            result = None
+            for term in query.lower().split():
+                matched = self._match_term(term, result)
+                if matched is None:
+                    continue
+                result = matched if result is None else result & matched
+                if not result:
+                    return []
+            if result is None:
+                return list(self.table.ppids)
+            return [pid for pid in result if pid in self.table]
+
+    def _match_term(self, term, candidates=None):
+        """
+        Tập PID khớp với một từ, hoặc None nếu từ chưa có điều kiện (ví dụ 'name:' đang gõ dở).
+        candidates: kết quả của các từ trước; khi đủ nhỏ thì chỉ kiểm tra các PID này.
+        """
+        qualifier, separator, value = term.partition(':')
+        if not separator or qualifier not in QUALIFIERS:
+            qualifier, value = None, term
+        if not value or value == '^':
+            return None
+        if qualifier in ('pid', 'ppid'):
+            try:
+                pid = int(value)
+            except ValueError:
+                return set()
+            if qualifier == 'pid':
+                return {pid} if pid in self.table else set()
+            return set(self.table.children.get(pid, ()))
+        if qualifier == 'parent':
+            children = set()
+            for parent in self._match_text(('name',), value):
+                children.update(self.table.children.get(parent, ()))
+            return children
+        return self._match_text(FIELDS if qualifier is None else (qualifier,), value, candidates)
+
+    def _match_text(self, fields, value, candidates=None):
+        prefix = value.startswith('^')
+        if prefix:
+            value = value[1:]
+            # Tiền tố chứa ký tự tách token (ví dụ '^--port=80') không nằm gọn trong một token
+            prefix = not _TOKEN_SPLIT.search(value)
+        if not prefix and candidates is not None and len(candidates) * CANDIDATE_RATIO < len(self.table):
+            return {pid for pid in candidates if any(value in self._texts[field].get(pid, "") for field in fields)}
+        result = set()
+        for field in fields:
+            if prefix:
+                result |= self._match_prefix(field, value)
+            else:
+                result |= self._match_substring(field, value)
+        return result
+
+    def _match_prefix(self, field, prefix):
+        tokens = self._tokens[field]
+        postings = self._postings[field]
+        result = set()
+        for position in range(bisect.bisect_left(tokens, prefix), len(tokens)):
+            token = tokens[position]
+            if not token.startswith(prefix):
+                break
+            result |= postings[token]
+        return result
+
+    def _match_substring(self, field, value):
+        _, text, starts, pids = self._corpus(field)
+        result = set()
+        position = text.find(value)
+        while position != -1:
+            row = bisect.bisect_right(starts, position) - 1
+            result.add(pids[row])
+            if row + 1 >= len(starts):
+                break
+            position = text.find(value, starts[row + 1])  # Mỗi PID chỉ cần khớp một lần
+        return result
+
+    def _corpus(self, field):
+        corpus = self._corpora.get(field)
+        if corpus is None or corpus[0] != self.generation:
+            texts = self._texts[field]
+            pids = list(texts)
+            values = [texts[pid] for pid in pids]
+            starts = [0]
+            starts.extend(itertools.accumulate(len(value) + 1 for value in values[:-1]))
+            corpus = (self.generation, "\n".join(values), starts if values else [], pids)
+            self._corpora[field] = corpus
+        return corpus
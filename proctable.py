@@ -0,0 +1,159 @@
+"""
+Bảng process của toàn hệ thống, được cập nhật dần.
+
+Mỗi lần refresh chỉ liệt kê danh sách PID (psutil.pids(), tương đương listdir /proc)
+rồi so sánh với lần trước: chỉ PID mới mới bị đọc thông tin, PID đã mất bị xóa khỏi
+các chỉ mục. Nhờ vậy không cần quét lại toàn bộ bằng psutil.process_iter mỗi tick.
+Khi có proc connector (lifecycle.py), bảng được cập nhật thẳng từ các sự kiện fork/exec/exit
+bằng apply_events() mà không cần liệt kê /proc.
+"""
+from collections import defaultdict
+
+import psutil
+
+
+class ProcessTable:
+    """Bảng PID -> thông tin cơ bản (ppid, tên, cmdline, user), kèm chỉ mục cha -> con."""
+
+    def __init__(self):
+        self.ppids = {}  # pid -> ppid
+        self.names = {}  # pid -> tên process
+        self.cmdlines = {}  # pid -> cmdline dạng chuỗi
+        self.usernames = {}  # pid -> tên user
+        self.children = defaultdict(set)  # ppid -> {pid con}
+
+    def __contains__(self, pid):
+        return pid in self.ppids
+
+    def __len__(self):
+        return len(self.ppids)
+
+    def refresh(self):
+        """Đồng bộ với hệ thống. Trả về (danh sách PID mới, danh sách PID đã kết thúc)."""
+        current = set(psutil.pids())
+        known = self.ppids.keys()
+        gone = [pid for pid in known if pid not in current]
+        new = [pid for pid in current if pid not in known]
+
+        for pid in gone:
+            self._remove(pid)
+
+        added = [pid for pid in sorted(new) if self._add(pid)]
+        return added, gone
+
+    def apply_events(self, events):
+        """
+        Cập nhật theo các sự kiện [('fork' | 'exec' | 'exit', pid), ...] của proc connector.
+        Trả về các PID mới hoặc vừa exec (tên/cmdline đã đổi), cần so khớp lại với luật.
+        """
+        changed = {}
+        for kind, pid in events:
+            if kind == 'exit':
+                if pid in self.ppids:
+                    self._remove(pid)
+            elif kind == 'fork':
+                if pid not in self.ppids and self._add(pid):
+                    changed[pid] = None
+            else:
+                if pid in self.ppids:
+                    self._remove(pid)
+                if self._add(pid):
+                    changed[pid] = None
+        return list(changed)
+
+    def _add(self, pid):
+        """Đọc thông tin một PID vào bảng. Trả về False nếu process đã mất hoặc không đọc được."""
+        info = self.read_info(pid)
+        if info is None:
+            return False
+        self.insert(pid, info)
+        return True
+
+    @staticmethod
+    def read_info(pid):
+        """(ppid, tên, cmdline, user) của PID, hoặc None. Không động tới bảng (gọi được ngoài khóa)."""
+        try:
+            process = psutil.Process(pid)
+            with process.oneshot():
+                ppid = process.ppid()
+                name = process.name()
+                username = process.username()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+        try:
+            cmdline = " ".join(process.cmdline())
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            cmdline = ""
+        return ppid, name, cmdline, username
+
+    def insert(self, pid, info):
+        """Thêm PID với thông tin đã đọc bằng read_info()."""
+        ppid, name, cmdline, username = info
+        self.ppids[pid] = ppid
+        self.names[pid] = name
+        self.cmdlines[pid] = cmdline
+        self.usernames[pid] = username
+        self.children[ppid].add(pid)
+
+    def matching(self, rule, pids=None):
+        """Các PID (trong pids, mặc định là cả bảng) khớp với một AttachRule."""
+        pids = self.ppids.keys() if pids is None else pids
+        return [pid for pid in pids
+                if pid in self.ppids and rule.matches(self.names[pid], self.cmdlines[pid], self.usernames[pid])]
+
+    def descendants(self, pid):
+        """Tất cả PID con cháu của pid (theo dữ liệu hiện có trong bảng)."""
+        result = []
+        stack = list(self.children.get(pid, ()))
+        while stack:
+            child = stack.pop()
+            result.append(child)
+            stack.extend(self.children.get(child, ()))
+        return result
+
+    def remove(self, pid):
+        """Bỏ một PID khỏi bảng (process đã kết thúc)."""
+        self._remove(pid)
+
+    def _remove(self, pid):
+        ppid = self.ppids.pop(pid)
+        self.names.pop(pid, None)
+        self.cmdlines.pop(pid, None)
+        self.usernames.pop(pid, None)
+        siblings = self.children.get(ppid)
+        if siblings is not None:
+            siblings.discard(pid)
+            if not siblings:
+                del self.children[ppid]
+
+
+class ProcessTree:
+    """Tập PID gồm một process gốc và toàn bộ con cháu của nó, được theo dõi dần."""
+
+    def __init__(self, root_pid, table):
+        self.root = root_pid
+        self.table = table
+        self.members = {root_pid}
+
+    def attach(self):
+        """Lấy các con cháu hiện có của process gốc. Trả về danh sách PID được thêm."""
+        added = [pid for pid in self.table.descendants(self.root) if pid not in self.members]
+        self.members.update(added)
+        return added
+
+    def update(self, new_pids):
+        """Thêm các PID mới có cha nằm trong cây (kể cả cháu được tạo trong cùng tick)."""
+        added = []
+        ppids = self.table.ppids
+        for pid in new_pids:
+            if pid not in self.members and ppids.get(pid) in self.members:
+                self.members.add(pid)
+                added.append(pid)
+                for child in self.table.descendants(pid):
+                    if child not in self.members:
+                        self.members.add(child)
+                        added.append(child)
+        return added
+
+    def discard(self, pid):
+        self.members.discard(pid)
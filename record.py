@@ -0,0 +1,295 @@
+"""
+Chế độ ghi không giao diện (headless) cho máy chủ.
+
+Dùng cùng SamplingEngine với GUI nhưng không import PyQt6/pyqtgraph. Các mẫu được ghi ra
+recording; GUI mở lại qua Actions -> Open Recording... để phân tích. Mặc định recording là
+thư mục nhị phân .pmts (xem tsformat.py); nếu tên đầu ra có đuôi .csv thì ghi CSV.
+
+Ví dụ:
+    python record.py --pid 1234 --name nginx --rule cmdline:'gunicorn .*app' -i 1 -o session.pmts
+
+Mục tiêu chi phí (đo bằng --stats, in ra stderr khi kết thúc):
+- Khởi động (từ lúc tiến trình bắt đầu tới khi engine chạy): < 200 ms.
+- RSS khi rảnh: < 30 MB.
+- CPU của chính recorder: < 1% một core khi theo dõi 100 PID với chu kỳ 1 s (backend procfs).
+"""
+import argparse
+import os
+import resource
+import signal
+import sys
+import threading
+import time
+
+import psutil
+
+from alerts import AlertEngine, AlertLog, default_alerts_path, load_alert_rules
+from backends import BACKENDS, create_backend
+from recording import CsvRecorder
+from rules import AttachRule, default_rules_path, load_rules, next_rule_id
+from sampler import SamplingEngine
+from shards import ShardedSamplingEngine
+from tsformat import TimeSeriesWriter
+
+
+def open_recorder(path):
+    """File .csv -> CsvRecorder, còn lại -> TimeSeriesWriter (thư mục .pmts)."""
+    if path.lower().endswith('.csv'):
+        return CsvRecorder(path)
+    return TimeSeriesWriter(path)
+
+
+class HeadlessRecorder:
+    """Nối SamplingEngine với file recording, kể cả việc gắn lại PID theo luật."""
+
+    def __init__(self, output_path, interval_s, backend_name="auto", shards=0):
+        # output_path=None: không ghi file (collector.py chỉ giữ mẫu trong bộ đệm để gửi qua mạng)
+        self.recorder = open_recorder(output_path) if output_path else None
+        self.series = {}  # pid -> (series_key, name)
+        self.active = set()  # PID đang được lấy mẫu
+        self.rule_pids = {}  # rule_id -> PID đang được theo dõi cho luật đó
+        self.rule_pending = {}  # rule_id -> PID khớp luật khi process cũ của luật chưa báo kết thúc
+        self.rules = []
+        self.alerts = None  # AlertEngine khi bật cảnh báo (set_alert_rules)
+        self.alert_log = None
+        self._lock = threading.Lock()
+        if shards:
+            self.engine = ShardedSamplingEngine(interval_s, on_batch=self._on_batch,
+                                                on_terminated=self._on_terminated,
+                                                on_error=self._on_error,
+                                                backend_name=create_backend(backend_name).name,
+                                                on_rule_match=self._on_rule_match,
+                                                shards=shards)
+        else:
+            self.engine = SamplingEngine(interval_s, on_batch=self._on_batch,
+                                         on_terminated=self._on_terminated,
+                                         on_error=self._on_error,
+                                         backend=create_backend(backend_name),
+                                         on_rule_match=self._on_rule_match)
+
+    def add_process(self, process, tree=False, series_key=None):
+        name = process.name()
+        self.series[process.pid] = (series_key or f"pid:{process.pid}", name)
+        self.active.add(process.pid)
+        if tree:
+            self.engine.add_tree(process.pid, process)
+        else:
+            self.engine.add(process.pid, process)
+        print(f"Recording {name} (PID {process.pid}){' [tree]' if tree else ''}", file=sys.stderr)
+
+    def set_rules(self, rules):
+        self.rules = rules
+        self.engine.set_rules(rules)
+
+    def set_alert_rules(self, rules, log_path=None):
+        """Bật luật cảnh báo: cảnh báo được in ra stderr và ghi nối vào log_path nếu có. Gọi trước start()."""
+        self.alerts = AlertEngine(rules)
+        self.alert_log = AlertLog(log_path) if log_path else None
+
+    def start(self):
+        self.engine.start()
+
+    def stop(self):
+        self.engine.stop()
+        with self._lock:
+            if self.recorder is not None:
+                self.recorder.close()
+
+    # Các callback dưới đây chạy trên thread lấy mẫu
+    def _on_batch(self, batch):
+        with self._lock:
+            if self.recorder is not None:
+                if self.recorder.closed:
+                    return
+                for pid, sample in batch.items():
+                    series_key, name = self.series.get(pid, (f"pid:{pid}", "?"))
+                    self.recorder.write(series_key, pid, name, sample)
+        if self.alerts is not None:
+            self._check_alerts(batch)
+
+    def _check_alerts(self, batch):
+        alerts = []
+        for pid, sample in batch.items():
+            alerts += self.alerts.feed(pid, self.series.get(pid, (None, "?"))[1], (sample,))
+        for alert in alerts:
+            print(alert.message(), file=sys.stderr)
+        if self.alert_log is not None:
+            try:
+                self.alert_log.write(alerts)
+            except OSError as e:
+                print(f"Cannot write alert log: {e}", file=sys.stderr)
+
+    def _on_terminated(self, pid):
+        print(f"Process PID {pid} terminated.", file=sys.stderr)
+        self.active.discard(pid)
+        if self.alerts is not None:
+            self.alerts.remove(pid)
+        self._release_rule(pid)
+
+    def _on_error(self, pid, message):
+        print(f"Error monitoring process PID {pid}: {message}", file=sys.stderr)
+        self._release_rule(pid)
+
+    def _release_rule(self, pid):
+        for rule_id, rule_pid in list(self.rule_pids.items()):
+            if rule_pid == pid:
+                del self.rule_pids[rule_id]
+                if rule_id in self.rule_pending:
+                    # Process mới của luật đã khớp trước khi process cũ kết thúc
+                    self._on_rule_match(rule_id, self.rule_pending.pop(rule_id))
+
+    def _on_rule_match(self, rule_id, pid):
+        if pid in self.active:
+            return  # PID đã được ghi
+        if rule_id in self.rule_pids:
+            # Luật này còn đang theo dõi process cũ: giữ PID lại, ghi khi process cũ kết thúc
+            self.rule_pending[rule_id] = pid
+            return
+        rule = next((rule for rule in self.rules if rule.rule_id == rule_id), None)
+        if rule is None or pid == os.getpid():
+            return
+        try:
+            process = psutil.Process(pid)
+            self.rule_pids[rule_id] = pid
+            self.add_process(process, tree=rule.tree, series_key=f"rule:{rule_id}")
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            self.rule_pids.pop(rule_id, None)
+
+
+def parse_rule(spec, rule_id):
+    """Chuyển 'name:<chuỗi>', 'cmdline:<regex>' hoặc 'user:<tên>' thành AttachRule."""
+    kind, _, value = spec.partition(':')
+    if kind == 'name':
+        return AttachRule(rule_id, name_contains=value)
+    if kind == 'cmdline':
+        return AttachRule(rule_id, cmdline_regex=value)
+    if kind == 'user':
+        return AttachRule(rule_id, username=value)
+    raise ValueError(f"Invalid rule '{spec}', expected name:..., cmdline:... or user:...")
+
+
+def find_process_by_name(target_name, exclude):
+    """Tìm process đầu tiên có tên chứa target_name (không phân biệt hoa thường)."""
+    target_name_lower = target_name.lower()
+    for proc in psutil.process_iter(['pid', 'name']):
+        try:
+            if target_name_lower in proc.info['name'].lower() and proc.pid not in exclude:
+                return proc
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess, AttributeError):
+            continue
+    return None
+
+
+def add_alert_arguments(parser):
+    """Các tùy chọn cảnh báo dùng chung cho record.py và collector.py."""
+    parser.add_argument("--alerts", nargs="?", const=default_alerts_path(),
+                        help="Kiểm tra luật cảnh báo từ file JSON (mặc định: file luật cảnh báo của GUI)")
+    parser.add_argument("--alert-log", help="Ghi nối các cảnh báo vào file này (ngoài stderr)")
+
+
+def apply_alert_arguments(recorder, args):
+    """Bật cảnh báo theo --alerts/--alert-log. Trả về False nếu không đọc được file luật."""
+    if not args.alerts:
+        return True
+    try:
+        recorder.set_alert_rules(load_alert_rules(args.alerts), args.alert_log)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Cannot load alert rules: {e}", file=sys.stderr)
+        return False
+    return True
+
+
+def startup_seconds():
+    """Thời gian từ lúc tiến trình bắt đầu tới hiện tại."""
+    if sys.platform.startswith('linux'):
+        # starttime (jiffies kể từ lúc boot) chính xác hơn create_time() của psutil (làm tròn theo giây)
+        with open('/proc/self/stat', 'rb') as f:
+            data = f.read()
+        start_ticks = int(data[data.rfind(b')') + 2:].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf('SC_CLK_TCK')
+    return time.time() - psutil.Process().create_time()
+
+
+def self_usage():
+    """(CPU giây đã dùng, RSS hiện tại MB, RSS tối đa MB) của chính recorder."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    rss_mb = psutil.Process().memory_info().rss / (1000 * 1000)
+    return usage.ru_utime + usage.ru_stime, rss_mb, usage.ru_maxrss / 1000  # ru_maxrss tính bằng KB trên Linux
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Process Monitor recorder")
+    parser.add_argument("--pid", type=int, action="append", default=[], help="PID cần ghi (có thể lặp lại)")
+    parser.add_argument("--name", action="append", default=[], help="Tên process cần ghi, lấy process khớp đầu tiên")
+    parser.add_argument("--rule", action="append", default=[],
+                        help="Luật auto-attach: name:<chuỗi>, cmdline:<regex> hoặc user:<tên>")
+    parser.add_argument("--rules-file", nargs="?", const=default_rules_path(),
+                        help="Dùng luật từ file JSON (mặc định: file luật của GUI)")
+    parser.add_argument("--tree", action="store_true", help="Ghi cả cây process cho --pid/--name")
+    parser.add_argument("-i", "--interval", type=float, default=1.0, help="Chu kỳ lấy mẫu (giây)")
+    parser.add_argument("-o", "--output", required=True, help="Recording đầu ra: thư mục .pmts (nhị phân) hoặc file .csv")
+    parser.add_argument("-d", "--duration", type=float, help="Dừng sau số giây này (mặc định: chạy tới khi bị dừng)")
+    parser.add_argument("--backend", choices=["auto", *BACKENDS], default="auto")
+    parser.add_argument("--shards", type=int, default=0, help="Chia việc lấy mẫu cho N process worker")
+    parser.add_argument("--stats", action="store_true", help="In định kỳ chi phí của chính recorder ra stderr")
+    add_alert_arguments(parser)
+    args = parser.parse_args(argv)
+
+    rules = load_rules(args.rules_file) if args.rules_file else []
+    for spec in args.rule:
+        rules.append(parse_rule(spec, next_rule_id(rules)))
+    if not (args.pid or args.name or rules):
+        parser.error("at least one of --pid, --name, --rule or --rules-file is required")
+
+    recorder = HeadlessRecorder(args.output, args.interval, args.backend, args.shards)
+    added = {os.getpid()}
+    for pid in args.pid:
+        try:
+            recorder.add_process(psutil.Process(pid), tree=args.tree)
+            added.add(pid)
+        except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+            print(f"Cannot monitor PID {pid}: {e}", file=sys.stderr)
+    for name in args.name:
+        process = find_process_by_name(name, added)
+        if process is None:
+            print(f"No running process found matching '{name}'.", file=sys.stderr)
+            continue
+        recorder.add_process(process, tree=args.tree)
+        added.add(process.pid)
+    if rules:
+        recorder.set_rules(rules)
+    if not apply_alert_arguments(recorder, args):
+        return 1
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+    recorder.start()
+    startup_ms = startup_seconds() * 1000
+    wall_start = time.time()
+    # Chi phí CPU được tính từ lúc engine chạy, không tính phần import lúc khởi động
+    cpu_start = self_usage()[0]
+    print(f"Started in {startup_ms:.0f} ms, writing to {args.output}", file=sys.stderr)
+
+    deadline = wall_start + args.duration if args.duration else None
+    while not stop_event.is_set():
+        timeout = 10.0 if deadline is None else min(10.0, deadline - time.time())
+        if timeout <= 0 or stop_event.wait(timeout):
+            break
+        if args.stats:
+            cpu_s, rss_mb, _ = self_usage()
+            print(f"samples={recorder.recorder.samples_written} cpu={(cpu_s - cpu_start) / (time.time() - wall_start) * 100:.2f}% "
+                  f"rss={rss_mb:.1f}MB", file=sys.stderr)
+
+    recorder.stop()
+    cpu_s, rss_mb, max_rss_mb = self_usage()
+    elapsed = time.time() - wall_start
+    print(f"Recorded {recorder.recorder.samples_written} samples in {elapsed:.1f} s. "
+          f"Startup {startup_ms:.0f} ms, own CPU {(cpu_s - cpu_start) / max(elapsed, 1e-9) * 100:.2f}%, "
+          f"RSS {rss_mb:.1f} MB (max {max_rss_mb:.1f} MB)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Đọc/ghi file ghi lại (recording) các mẫu CPU/RAM.
+
+File recording là CSV với các cột: series, pid, name, timestamp, cpu_percent_irix, memory_mb.
+"series" là khóa của một chuỗi dữ liệu: cùng một series có thể gồm nhiều PID liên tiếp
+khi process khởi động lại và được gắn lại theo luật auto-attach.
+
+Module này không import Qt để dùng được trong chế độ ghi không giao diện (record.py).
+"""
+import csv
+
+CSV_COLUMNS = ('series', 'pid', 'name', 'timestamp', 'cpu_percent_irix', 'memory_mb')
+
+
+class CsvRecorder:
+    """Ghi mẫu ra file CSV, flush định kỳ để không mất nhiều dữ liệu khi bị dừng đột ngột."""
+
+    def __init__(self, path, flush_every=100):
+        self.path = path
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(CSV_COLUMNS)
+        self._flush_every = flush_every
+        self._unflushed = 0
+        self.samples_written = 0
+        self.closed = False
+
+    def write(self, series, pid, name, sample):
+        """Ghi một mẫu (timestamp, cpu_percent_irix, memory_mb)."""
+        timestamp, cpu_percent, memory_mb = sample[:3]
+        self._writer.writerow((series, pid, name, f"{timestamp:.3f}", f"{cpu_percent:.2f}", f"{memory_mb:.3f}"))
+        self.samples_written += 1
+        self._unflushed += 1
+        if self._unflushed >= self._flush_every:
+            self._file.flush()
+            self._unflushed = 0
+
+    def close(self):
+        self.closed = True
+        self._file.close()
+
+
+class RecordedSeries:
+    """Một chuỗi dữ liệu đọc từ recording."""
+
+    def __init__(self, key, name):
+        self.key = key
+        self.name = name
+        self.samples = []  # [(timestamp, cpu_percent_irix, memory_mb), ...]
+        self.pid_changes = []  # [(timestamp, pid), ...] thời điểm chuỗi chuyển sang PID mới
+
+    @property
+    def pid(self):
+        return self.pid_changes[-1][1] if self.pid_changes else None
+
+
+def read_recording(path):
+    """Đọc recording CSV, trả về danh sách RecordedSeries theo thứ tự xuất hiện."""
+    series = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            key = row['series']
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = RecordedSeries(key, row['name'])
+            pid = int(row['pid'])
+            timestamp = float(row['timestamp'])
+            if entry.pid != pid:
+                entry.pid_changes.append((timestamp, pid))
+            entry.samples.append((timestamp, float(row['cpu_percent_irix']), float(row['memory_mb'])))
+    return list(series.values())
@@ -0,0 +1,107 @@
+"""
+Lịch sử nhiều độ phân giải (level-of-detail) cho các khoảng hiển thị dài.
+
+Bên cạnh dữ liệu thô, mỗi tầng gom mẫu vào các bucket cố định (1 s, 10 s, 1 phút, 10 phút)
+và lưu min/mean/max của từng metric. Các tầng được cập nhật dần theo từng mẫu: bucket
+đang mở được ghi đè tại chỗ, bucket mới được thêm vào cuối. Khi vẽ, chọn tầng thô nhất
+mà vẫn cho khoảng một điểm trên mỗi pixel, nên chi phí vẽ chỉ phụ thuộc vào độ rộng đồ thị.
+"""
+import math
+
+import numpy as np
+
+from timeseries import SampleStore
+
+ROLLUP_TIERS = (1, 10, 60, 600)  # Độ rộng bucket (giây)
+
+
+class RollupTier:
+    """Một tầng rollup với bucket có độ rộng cố định."""
+
+    def __init__(self, width, metrics):
+        self.width = width
+        self.metrics = metrics
+        columns = ['time']
+        for metric in metrics:
+            columns += [f'{metric}_min', f'{metric}_mean', f'{metric}_max']
+        self.store = SampleStore(columns)
+
+        # Trạng thái của bucket đang mở
+        self._bucket = None
+        self._count = 0
+        self._time_sum = 0.0
+        self._sums = [0.0] * len(metrics)
+        self._mins = [0.0] * len(metrics)
+        self._maxs = [0.0] * len(metrics)
+
+    def add(self, t, values):
+        bucket = math.floor(t / self.width)
+        if bucket != self._bucket:
+            # Bắt đầu bucket mới; bucket cũ đã nằm sẵn trong store
+            self._bucket = bucket
+            self._count = 0
+            self._time_sum = 0.0
+            self._sums = [0.0] * len(values)
+            self._mins = list(values)
+            self._maxs = list(values)
+            is_new = True
+        else:
+            is_new = False
+
+        self._count += 1
+        self._time_sum += t
+        row = [self._time_sum / self._count]  # Thời gian của bucket là trung bình thời gian các mẫu
+        for i, value in enumerate(values):
+            self._sums[i] += value
+            if value < self._mins[i]:
+                self._mins[i] = value
+            if value > self._maxs[i]:
+                self._maxs[i] = value
+            row += (self._mins[i], self._sums[i] / self._count, self._maxs[i])
+
+        if is_new:
+            self.store.append(*row)
+        else:
+            self.store.set_last(*row)
+
+
+class RollupHistory:
+    """Tập các tầng rollup cho một process."""
+
+    def __init__(self, metrics=('cpu', 'ram'), tiers=ROLLUP_TIERS):
+        self.metrics = tuple(metrics)
+        self.tiers = [RollupTier(width, self.metrics) for width in tiers]
+
+    def add(self, t, *values):
+        """Thêm một mẫu thô (thời gian, giá trị theo thứ tự metrics) vào mọi tầng."""
+        for tier in self.tiers:
+            tier.add(t, values)
+
+    def select_tier(self, duration, width_px, sample_interval):
+        """
+        Chọn tầng thô nhất có bucket <= duration / width_px (khoảng một điểm mỗi pixel).
+        Trả về None nếu nên dùng dữ liệu thô (khoảng hiển thị ngắn hoặc mẫu đã thưa sẵn).
+        """
+        seconds_per_px = duration / max(width_px, 1)
+        chosen = None
+        for tier in self.tiers:
+            if tier.width <= seconds_per_px and tier.width > sample_interval:
+                chosen = tier
+        return chosen
+
+
+def bucket_envelope(times, values, bucket_count, mins=None, maxs=None):
+    """
+    Gom một đoạn dữ liệu tĩnh (ví dụ recording ánh xạ bằng mmap) thành bucket_count bucket
+    đều theo thời gian, tính bằng numpy một lượt. Trả về (t, min, mean, max) của các bucket có mẫu.
+    Nếu các điểm đầu vào đã là tổng hợp cùng kích thước (values là trung bình), truyền thêm mins/maxs.
+    """
+    edges = np.linspace(times[0], times[-1], bucket_count + 1)
+    starts = np.unique(np.searchsorted(times, edges[:-1], side='left'))
+    starts = starts[starts < len(times)]
+    counts = np.diff(np.append(starts, len(times)))
+    values = values.astype(np.float64, copy=False)
+    return (times[starts],
+            np.minimum.reduceat(values if mins is None else mins, starts),
+            np.add.reduceat(values, starts) / counts,
+            np.maximum.reduceat(values if maxs is None else maxs, starts))
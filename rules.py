@@ -0,0 +1,91 @@
+"""
+Luật tự động gắn (auto-attach) process vào tab theo dõi.
+
+Một luật gồm các điều kiện tùy chọn: chuỗi con trong tên process, biểu thức chính quy
+trên cmdline và tên user. Process khớp khi thỏa mọi điều kiện được đặt. Các luật được
+lưu ra file JSON để vẫn còn hiệu lực sau khi khởi động lại ứng dụng.
+"""
+import json
+import os
+import re
+
+RULES_FILENAME = "rules.json"
+
+
+def default_rules_path():
+    """Đường dẫn file luật mặc định: $XDG_CONFIG_HOME/ProcessMonitor/rules.json."""
+    config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(config_home, 'ProcessMonitor', RULES_FILENAME)
+
+
+class AttachRule:
+    """Một luật auto-attach. Các điều kiện để trống được bỏ qua."""
+
+    def __init__(self, rule_id, name_contains="", cmdline_regex="", username="", tree=False):
+        self.rule_id = rule_id
+        self.name_contains = name_contains
+        self.cmdline_regex = cmdline_regex
+        self.username = username
+        self.tree = tree
+        self._name_lower = name_contains.lower()
+        # Ném re.error nếu biểu thức không hợp lệ
+        self._cmdline_pattern = re.compile(cmdline_regex) if cmdline_regex else None
+
+    def matches(self, name, cmdline, username):
+        """Kiểm tra process (tên, cmdline dạng chuỗi, user) có khớp luật không."""
+        if self._name_lower and self._name_lower not in name.lower():
+            return False
+        if self.username and self.username != username:
+            return False
+        if self._cmdline_pattern is not None and not self._cmdline_pattern.search(cmdline):
+            return False
+        return True
+
+    def describe(self):
+        parts = []
+        if self.name_contains:
+            parts.append(f"name ~ '{self.name_contains}'")
+        if self.cmdline_regex:
+            parts.append(f"cmdline =~ /{self.cmdline_regex}/")
+        if self.username:
+            parts.append(f"user = {self.username}")
+        text = ", ".join(parts) or "(any process)"
+        return f"{text} [tree]" if self.tree else text
+
+    def to_dict(self):
+        return {
+            'id': self.rule_id,
+            'name_contains': self.name_contains,
+            'cmdline_regex': self.cmdline_regex,
+            'username': self.username,
+            'tree': self.tree,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['id'], data.get('name_contains', ""), data.get('cmdline_regex', ""),
+                   data.get('username', ""), data.get('tree', False))
+
+
+def load_rules(path=None):
+    """Đọc danh sách luật từ file JSON. File chưa tồn tại thì trả về danh sách rỗng."""
+    path = path or default_rules_path()
+    try:
+        with open(path, encoding='utf-8') as f:
+            return [AttachRule.from_dict(item) for item in json.load(f)]
+    except FileNotFoundError:
+        return []
+
+
+def save_rules(rules, path=None):
+    """Ghi danh sách luật ra file JSON (ghi file tạm rồi đổi tên để không hỏng file khi lỗi)."""
+    path = path or default_rules_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump([rule.to_dict() for rule in rules], f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def next_rule_id(rules):
+    return max((rule.rule_id for rule in rules), default=0) + 1
@@ -1,127 +1,269 @@
 import sys
+import argparse
+import math
+import os
+import re
+import threading
 import psutil
-import time # Sử dụng time.time() để lấy timestamp dạng float đơn giản
-from datetime import datetime # Vẫn cần để lấy timestamp ban đầu từ worker
+import time
 from collections import deque # Sử dụng deque để giới hạn dữ liệu đồ thị
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QTabWidget, QMenuBar, QInputDialog, QMessageBox, QSpinBox, QDialog,
-    QDialogButtonBox, QFormLayout, QPushButton
+    QTabWidget, QTabBar, QMenuBar, QInputDialog, QMessageBox, QSpinBox, QDialog,
+    QDialogButtonBox, QFormLayout, QPushButton, QGridLayout, QGroupBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QLineEdit, QCheckBox, QListWidget,
+    QFileDialog, QProgressDialog, QComboBox, QDoubleSpinBox, QSystemTrayIcon, QStyle
 )
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QObject
 from PyQt6.QtGui import QAction, QCloseEvent
 
-# pyqtgraph cần được cài đặt: pip install pyqtgraph psutil PyQt6
-import pyqtgraph as pg
-import random
-
-
-# --- Cấu hình cho pyqtgraph ---
-pg.setConfigOption('background', 'w') # Nền trắng
-pg.setConfigOption('foreground', 'k') # Chữ đen
-# -----------------------------
+from backends import BACKENDS, create_backend, wall_clock
+from sampler import SamplingEngine
+from shards import ShardedSamplingEngine
+from rules import AttachRule, load_rules, save_rules, next_rule_id
+from tsformat import MANIFEST_NAME
+from overview import OverviewWidget
+from picker import ProcessPickerDialog
+from processindex import ProcessIndex
+from collector import CollectorClient
+from metrics import FIELD_METRICS, METRICS
+from health import HISTOGRAM_LABELS, OWN_CPU_BUDGET, OWN_RSS_BUDGET_MB, MonitorHealth
+from alerts import ALERT_METRICS, AlertEngine, AlertLog, AlertRule, load_alert_rules, save_alert_rules
+
+# pyqtgraph (cần được cài đặt: pip install pyqtgraph psutil PyQt6) và các cấu trúc dữ liệu dùng
+# NumPy chiếm phần lớn thời gian khởi động, nên chỉ được nạp khi tạo đồ thị đầu tiên
+# (load_plotting); cửa sổ chính hiện ra ngay mà không cần chúng.
+pg = None
+SampleStore = StreamingStats = WindowedStats = RollupHistory = None
+
+
+def load_plotting():
+    """Nạp pyqtgraph, NumPy và các module dùng chúng (một lần, khi tạo tab có đồ thị đầu tiên)."""
+    global pg, SampleStore, StreamingStats, WindowedStats, RollupHistory
+    if pg is not None:
+        return
+    import pyqtgraph
+    from timeseries import SampleStore
+    from stats import StreamingStats, WindowedStats
+    from rollup import RollupHistory
+    # --- Cấu hình cho pyqtgraph ---
+    pyqtgraph.setConfigOption('background', 'w') # Nền trắng
+    pyqtgraph.setConfigOption('foreground', 'k') # Chữ đen
+    pyqtgraph.setConfigOptions(antialias=True) # Bật antialiasing cho đồ thị mượt hơn
+    pg = pyqtgraph
 
 # --- Hằng số ---
 INITIAL_UPDATE_INTERVAL_MS = 3000  # 3 giây
+MIN_UPDATE_INTERVAL_MS = 10 # Chu kỳ ngắn nhất của chế độ tần số cao
 PLOT_LINE_WIDTH = 2 # *** Độ dày của đường đồ thị ***
+MAX_RENDER_FPS = 20 # Số lần vẽ lại tối đa mỗi giây cho tab đang hiển thị
+EXPORT_STEP_MS = 30 # Thời gian tối đa cho mỗi lượt xuất dữ liệu trước khi trả quyền cho event loop
+EXPORT_CHUNK_ROWS = 8192 # Chunk nhỏ hơn CLI để một chunk CSV không chiếm event loop quá lâu
+ENVELOPE_ALPHA = 50 # Độ trong suốt của vùng min/max khi vẽ từ tầng rollup
+METRIC_COLORS = ('m', 'c', 'g', 'y') # Màu các đường trong đồ thị metric mở rộng
+METRIC_PLOT_HEIGHT = 160 # Chiều cao tối thiểu của mỗi đồ thị metric mở rộng
+HEALTH_COLUMNS = (('name', 'Measurement'), ('count', 'Count'), ('mean_ms', 'Mean ms'), ('p50_ms', 'P50 ms'),
+                  ('p90_ms', 'P90 ms'), ('p99_ms', 'P99 ms'), ('max_ms', 'Max ms'))
+ALERT_TITLE_PREFIX = "\u26a0 " # Tiền tố tiêu đề tab khi process đang có cảnh báo
+STATS_COLUMNS = (('avg', 'Avg'), ('min', 'Min'), ('max', 'Max'), ('p50', 'P50'),
+                 ('p95', 'P95'), ('p99', 'P99'), ('stddev', 'StdDev')) # Các cột trong bảng thống kê
 # ---------------
 
 class ProcessMonitorWorker(QObject):
     """
-    Worker chạy trong thread riêng (mặc dù ở đây dùng QTimer nên ko cần thread riêng)
-    để lấy dữ liệu process mà không chặn GUI.
-    Gửi tín hiệu khi có dữ liệu mới hoặc lỗi.
+    Cầu nối giữa SamplingEngine (chạy trên thread riêng) và GUI.
+    Một worker duy nhất lấy mẫu cho mọi PID. Ở chế độ tần số cao (chu kỳ ngắn hơn một khung hình)
+    các tick được gom lại và gửi tối đa MAX_RENDER_FPS tín hiệu mỗi giây.
+    Với shards > 0, việc lấy mẫu được chia cho các process worker (xem shards.py).
     """
     # Vẫn gửi timestamp tuyệt đối, việc tính toán thời gian trôi qua sẽ do Tab thực hiện
-    data_updated = pyqtSignal(int, float, float, float) # pid, absolute_timestamp, cpu_percent, memory_mb
+    samples_ready = pyqtSignal(object, float) # {pid: [(absolute_timestamp, cpu_percent, memory_mb), ...]}, lúc emit (monotonic)
     process_terminated = pyqtSignal(int) # pid
     process_error = pyqtSignal(int, str) # pid, error_message
+    rule_matched = pyqtSignal(int, int) # rule_id, pid
 
-    def __init__(self, pid, process_obj, initial_interval_ms):
+    def __init__(self, initial_interval_ms, backend=None, shards=0):
         super().__init__()
-        self.pid = pid
-        self.process = process_obj
-        self._running = True
         self._interval_ms = initial_interval_ms
-
-        # Gọi cpu_percent() một lần khởi tạo
-        try:
-            self.process.cpu_percent(interval=None)
-            time.sleep(0.1) # Đợi một chút
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            self.process_error.emit(self.pid, "Process không tồn tại hoặc không có quyền truy cập khi khởi tạo.")
-            self._running = False
-            # Không cần khởi tạo timer nếu có lỗi ngay
-            self.timer = None
-            return
-
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.fetch_data)
-        self.timer.start(self._interval_ms)
+        self._pending = {}  # pid -> [mẫu] chưa gửi (chỉ dùng trên thread lấy mẫu)
+        self._last_emit = 0.0
+        self.engine = self._create_engine(initial_interval_ms / 1000, backend, shards)
+        self.engine.start()
+
+    def _create_engine(self, interval_s, backend, shards):
+        # Các callback được gọi từ thread lấy mẫu, emit tín hiệu sẽ được Qt chuyển về GUI thread
+        if shards:
+            return ShardedSamplingEngine(interval_s,
+                                         on_batch=self._emit_batch,
+                                         on_terminated=self._emit_terminated,
+                                         on_error=self._emit_error,
+                                         backend_name=backend.name,
+                                         on_rule_match=self.rule_matched.emit,
+                                         shards=shards)
+        return SamplingEngine(interval_s,
+                              on_batch=self._emit_batch,
+                              on_terminated=self._emit_terminated,
+                              on_error=self._emit_error,
+                              backend=backend,
+                              on_rule_match=self.rule_matched.emit)
+
+    def _emit_batch(self, batch):
+        for pid, sample in batch.items():
+            self._pending.setdefault(pid, []).append(sample)
+        now = time.monotonic()
+        if now - self._last_emit >= 1 / MAX_RENDER_FPS:
+            self._last_emit = now
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            pending, self._pending = self._pending, {}
+            self.samples_ready.emit(pending, time.monotonic())
+
+    def _emit_terminated(self, pid):
+        self._flush()  # Các mẫu cuối cùng tới tab trước thông báo kết thúc
+        self.process_terminated.emit(pid)
+
+    def _emit_error(self, pid, message):
+        self._flush()
+        self.process_error.emit(pid, message)
+
+    def add_process(self, pid, process_obj):
+        """Bắt đầu lấy mẫu cho một process (không chặn GUI)."""
+        self.engine.add(pid, process_obj)
+
+    def add_process_tree(self, pid, process_obj):
+        """Bắt đầu lấy mẫu cho một process cùng toàn bộ con cháu của nó (không chặn GUI)."""
+        self.engine.add_tree(pid, process_obj)
+
+    def set_rules(self, rules):
+        """Cập nhật danh sách luật auto-attach cho engine."""
+        self.engine.set_rules(rules)
+
+    def set_metrics(self, names):
+        """Chọn các metric mở rộng cần đọc (xem metrics.METRICS)."""
+        self.engine.set_metrics(names)
+
+    def remove_process(self, pid):
+        """Dừng lấy mẫu cho một process (không chặn GUI)."""
+        self.engine.remove(pid)
 
     def set_interval(self, interval_ms):
         """Thay đổi tần suất cập nhật."""
         self._interval_ms = interval_ms
-        # Chỉ đặt lại interval nếu timer tồn tại và đang chạy
-        if self.timer and self.timer.isActive():
-            self.timer.setInterval(self._interval_ms)
+        self.engine.set_interval(interval_ms / 1000)
 
     def stop(self):
         """Dừng việc lấy dữ liệu."""
-        self._running = False
-        if self.timer: # Kiểm tra timer tồn tại trước khi dừng
-            self.timer.stop()
+        self.engine.stop()
 
-    def fetch_data(self):
-        """Lấy dữ liệu CPU và RAM."""
-        if not self._running or not self.timer:  # Kiểm tra cả self._running và self.timer
-            return
 
-        try:
-            # Kiểm tra trước khi lấy dữ liệu để tránh lỗi nếu process chết đúng lúc
-            if not self.process.is_running():
-                self.process_terminated.emit(self.pid)
-                self.stop()
-                return
-
-            # Lấy % CPU và chuyển sang IRIX mode
-            cpu_percent = self.process.cpu_percent(interval=None)
-            num_cores = psutil.cpu_count(logical=True)
-            cpu_percent_irix = cpu_percent / num_cores  # Normalize to IRIX mode
-
-            memory_info = self.process.memory_info()
-            memory_mb = (memory_info.rss - memory_info.shared) / (1000 * 1000)  # Chuyển byte sang MB
-            absolute_timestamp = datetime.now().timestamp()  # Lấy timestamp tuyệt đối
-
-            # Emit dữ liệu CPU đã được chuẩn hóa
-            self.data_updated.emit(self.pid, absolute_timestamp, cpu_percent_irix, memory_mb)
-
-        except psutil.NoSuchProcess:
-            self.process_terminated.emit(self.pid)
-            self.stop()
-        except psutil.AccessDenied:
-            self.process_error.emit(self.pid, f"Không có quyền truy cập process PID {self.pid}.")
-            self.stop()
-        except Exception as e:
-            self.process_error.emit(self.pid, f"Lỗi không xác định khi lấy dữ liệu: {e}")
+class RemoteHostWorker(ProcessMonitorWorker):
+    """
+    Worker nhận mẫu từ một collector (collector.py) thay vì tự lấy mẫu. Việc gom batch và các tín
+    hiệu giống ProcessMonitorWorker; collector quyết định process nào được theo dõi và chu kỳ lấy
+    mẫu, nên chỉ các tín hiệu được dùng, không dùng add_process/set_interval.
+    """
+    processes_received = pyqtSignal(object) # [(pid, tên, start_time), ...]
+    connection_changed = pyqtSignal(bool, str) # đã kết nối, thông báo
+
+    def __init__(self, address):
+        self.address = address
+        super().__init__(0)
+
+    def _create_engine(self, interval_s, backend, shards):
+        # CollectorClient tự kết nối lại và xin backfill; callback chạy trên thread của client
+        return CollectorClient(self.address,
+                               on_batch=self._emit_batch,
+                               on_terminated=self._emit_terminated,
+                               on_error=self._emit_error,
+                               on_processes=self._emit_processes,
+                               on_state=self.connection_changed.emit)
+
+    def _emit_processes(self, processes):
+        self._flush()
+        self.processes_received.emit(processes)
+
+
+class RenderScheduler(QObject):
+    """
+    Gom các yêu cầu vẽ lại: tab nhận dữ liệu chỉ bị đánh dấu "dirty", sau đó chỉ tab
+    đang hiển thị được vẽ, tối đa MAX_RENDER_FPS lần mỗi giây. Tab bị ẩn được vẽ bù
+    một lần khi người dùng chuyển sang.
+    """
+    def __init__(self, tab_widget, max_fps=MAX_RENDER_FPS, render_time=None):
+        super().__init__(tab_widget)
+        self.tab_widget = tab_widget
+        self.render_time = render_time  # health.Histogram thời gian vẽ mỗi tab (tùy chọn)
+        self._dirty = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(int(1000 / max_fps))
+        self._timer.timeout.connect(self.flush)
+        self.tab_widget.currentChanged.connect(self._on_current_changed)
+
+    def mark_dirty(self, tab):
+        """Đánh dấu tab cần vẽ lại; nhiều batch trong cùng một khung hình chỉ vẽ một lần."""
+        self._dirty.add(tab)
+        if self.tab_widget.currentWidget() is tab and not self._timer.isActive():
+            self._timer.start()
+
+    def discard(self, tab):
+        self._dirty.discard(tab)
+
+    def flush(self):
+        """Vẽ tab đang hiển thị nếu nó đang dirty."""
+        tab = self.tab_widget.currentWidget()
+        if tab in self._dirty and tab.isVisible():
+            self._dirty.discard(tab)
+            self._render(tab)
+
+    def _on_current_changed(self, index):
+        # Vẽ bù tab vừa được chọn trong một lượt
+        tab = self.tab_widget.widget(index)
+        if tab in self._dirty:
+            self._dirty.discard(tab)
+            self._render(tab)
+
+    def _render(self, tab):
+        started = time.perf_counter()
+        tab.render()
+        if self.render_time is not None:
+            self.render_time.record(time.perf_counter() - started)
 
 
 class ProcessTabWidget(QWidget):
-    """Widget hiển thị thông tin và đồ thị cho một process."""
-    def __init__(self, pid, process_name, parent=None):
+    """Widget hiển thị thông tin và đồ thị cho một process (hoặc một cây process khi tree=True)."""
+    def __init__(self, pid, process_name, tree=False, start_time=None, parent=None):
         super().__init__(parent)
+        load_plotting()
         self.pid = pid
         self.process_name = process_name
+        self.tree = tree
+        self.tree_details = None  # {'children': [...], 'members': n} của mẫu mới nhất (chế độ cây)
+        self.rule_id = None  # Luật auto-attach gắn với tab này (nếu có)
+        self.host = None  # Địa chỉ collector nếu process ở máy khác
         self.terminated = False
-        self.start_time = time.time()  # Ghi lại thời điểm bắt đầu monitor cho tab này
+        # Ghi lại thời điểm bắt đầu monitor cho tab này (tab recording dùng 0: trục thời gian tuyệt đối)
+        self.start_time = wall_clock() if start_time is None else start_time
 
-        # Dữ liệu cho đồ thị (lưu toàn bộ lịch sử)
-        self.time_data = []
-        self.cpu_data = []
-        self.ram_data = []
+        # Dữ liệu cho đồ thị (lưu lịch sử dạng cột, thời gian tính bằng giây kể từ start_time)
+        self.history = SampleStore(('time', 'cpu', 'ram'))
         self.display_duration = 1800  # Mặc định hiển thị 60 giây gần nhất
 
+        # Thống kê cập nhật O(1) mỗi mẫu: toàn phiên và trong cửa sổ hiển thị
+        self.session_stats = {'cpu': StreamingStats(), 'ram': StreamingStats()}
+        self.window_stats = {'cpu': WindowedStats(self.history, 'cpu'),
+                             'ram': WindowedStats(self.history, 'ram')}
+
+        # Các tầng rollup (min/mean/max theo bucket) cho khoảng hiển thị dài
+        self.rollups = RollupHistory(('cpu', 'ram'))
+
+        # Metric mở rộng: mỗi metric một kho và một đồ thị, chỉ tạo khi có dữ liệu đầu tiên
+        self.metric_history = {}  # tên metric -> SampleStore(('time', *các trường))
+        self.metric_plots = {}  # tên metric -> (PlotWidget, {trường: curve})
+
         # --- Giao diện ---
         layout = QVBoxLayout(self)
 
@@ -137,6 +279,10 @@ class ProcessTabWidget(QWidget):
         info_layout.addWidget(self.ram_label)
         info_layout.addWidget(self.monitor_duration_label)
 
+        if self.tree:
+            self.members_label = QLabel("Processes: --")
+            info_layout.addWidget(self.members_label)
+
         info_layout.addStretch()
         info_layout.addWidget(self.status_label)
         layout.addLayout(info_layout)
@@ -160,6 +306,38 @@ class ProcessTabWidget(QWidget):
         duration_layout.addStretch()
         layout.addLayout(duration_layout)
 
+        # Bảng thống kê: CPU/RAM cho toàn phiên và cho cửa sổ hiển thị
+        stats_group = QGroupBox("Statistics")
+        stats_layout = QGridLayout(stats_group)
+        stats_layout.setVerticalSpacing(2)
+        for column, (_, title) in enumerate(STATS_COLUMNS, start=1):
+            stats_layout.addWidget(QLabel(f"<b>{title}</b>"), 0, column)
+        self.stats_labels = {}
+        rows = (('cpu', 'session', "CPU % (session)"), ('cpu', 'window', "CPU % (window)"),
+                ('ram', 'session', "RAM MB (session)"), ('ram', 'window', "RAM MB (window)"))
+        for row, (metric, scope, title) in enumerate(rows, start=1):
+            stats_layout.addWidget(QLabel(title), row, 0)
+            labels = []
+            for column in range(1, len(STATS_COLUMNS) + 1):
+                label = QLabel("--")
+                stats_layout.addWidget(label, row, column)
+                labels.append(label)
+            self.stats_labels[(metric, scope)] = labels
+        layout.addWidget(stats_group)
+
+        # Chế độ cây: bảng top-N process con tốn CPU nhất
+        if self.tree:
+            children_group = QGroupBox("Top processes in tree")
+            children_layout = QVBoxLayout(children_group)
+            self.children_table = QTableWidget(0, 4)
+            self.children_table.setHorizontalHeaderLabels(["PID", "Name", "CPU (IRIX) %", "RAM MB"])
+            self.children_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+            self.children_table.verticalHeader().setVisible(False)
+            self.children_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+            self.children_table.setMaximumHeight(180)
+            children_layout.addWidget(self.children_table)
+            layout.addWidget(children_group)
+
         # Đồ thị CPU
         self.cpu_plot_widget = pg.PlotWidget(title=f"CPU Usage (%) - {process_name}")
         self.cpu_plot_widget.setLabel('left', 'CPU', units='%')
@@ -170,6 +348,7 @@ class ProcessTabWidget(QWidget):
         # Enable downsampling and clipping for CPU plot
         self.cpu_curve.setDownsampling(auto=True, method='mean')
         self.cpu_curve.setClipToView(True)
+        self.cpu_envelope = self._add_envelope(self.cpu_plot_widget, (0, 0, 255))
 
         layout.addWidget(self.cpu_plot_widget)
 
@@ -183,38 +362,96 @@ class ProcessTabWidget(QWidget):
         # Enable downsampling and clipping for RAM plot
         self.ram_curve.setDownsampling(auto=True, method='mean')
         self.ram_curve.setClipToView(True)
+        self.ram_envelope = self._add_envelope(self.ram_plot_widget, (255, 0, 0))
 
         layout.addWidget(self.ram_plot_widget)
+
+        # Đồ thị các metric mở rộng, xếp hai cột
+        self.metrics_layout = QGridLayout()
+        layout.addLayout(self.metrics_layout)
         # ---------------
 
+    @staticmethod
+    def _add_envelope(plot_widget, color):
+        """Tạo vùng tô giữa đường min và max để không mất các đỉnh khi vẽ từ tầng rollup."""
+        pen = pg.mkPen((*color, ENVELOPE_ALPHA))
+        min_curve = pg.PlotDataItem(pen=pen)
+        max_curve = pg.PlotDataItem(pen=pen)
+        fill = pg.FillBetweenItem(min_curve, max_curve, brush=(*color, ENVELOPE_ALPHA))
+        for item in (min_curve, max_curve, fill):
+            plot_widget.addItem(item)
+        return min_curve, max_curve
+
     def apply_display_duration(self):
         """Cập nhật thời gian hiển thị trên đồ thị khi nhấn nút Apply."""
-        self.display_duration = self.duration_spinbox.value()
-        self.update_plot()  # Cập nhật đồ thị ngay khi thay đổi thời gian hiển thị
+        self.update_display_duration(self.duration_spinbox.value())
 
     def update_display_duration(self, value):
         """Cập nhật thời gian hiển thị trên đồ thị."""
         self.display_duration = value
+        # Cửa sổ thay đổi độ dài nên thống kê cửa sổ phải tính lại một lần
+        if len(self.history):
+            window_start = self.history.last('time') - self.display_duration
+            for stats in self.window_stats.values():
+                stats.reset(window_start)
+            self.update_stats_labels()
         self.update_plot()  # Cập nhật đồ thị ngay khi thay đổi thời gian hiển thị
 
-    def update_data(self, absolute_timestamp, cpu_percent, memory_mb):
-        """Cập nhật giao diện và dữ liệu đồ thị."""
-        if self.terminated:
+    def update_stats_labels(self):
+        """Hiển thị các chỉ số thống kê lên bảng."""
+        for (metric, scope), labels in self.stats_labels.items():
+            source = self.session_stats if scope == 'session' else self.window_stats
+            summary = source[metric].summary()
+            if summary is None:
+                continue
+            for label, (name, _) in zip(labels, STATS_COLUMNS):
+                label.setText(f"{summary[name]:.2f}")
+
+    def update_data(self, samples):
+        """
+        Cập nhật dữ liệu từ một batch [(absolute_timestamp, cpu_percent, memory_mb), ...].
+        Chỉ lưu dữ liệu và thống kê; việc vẽ do RenderScheduler gọi render() sau đó.
+        """
+        if self.terminated or not samples:
             return
 
+        # Lưu dữ liệu lịch sử
+        for sample in samples:
+            absolute_timestamp, cpu_percent, memory_mb = sample[:3]
+            elapsed = absolute_timestamp - self.start_time
+            if len(sample) > 3:
+                details = sample[3]
+                if 'children' in details:
+                    self.tree_details = details
+                if 'metrics' in details:
+                    self.add_metric_values(elapsed, details['metrics'])
+            self.history.append(elapsed, cpu_percent, memory_mb)
+            self.rollups.add(elapsed, cpu_percent, memory_mb)
+            self.session_stats['cpu'].add(cpu_percent)
+            self.session_stats['ram'].add(memory_mb)
+
+        window_start = elapsed - self.display_duration
+        for stats in self.window_stats.values():
+            stats.update(window_start)
+
+    def render(self):
+        """Cập nhật nhãn và đồ thị theo dữ liệu hiện có (một lần cho nhiều batch)."""
+        if not len(self.history):
+            return
+        elapsed = self.history.last('time')
+        cpu_percent = self.history.last('cpu')
+        memory_mb = self.history.last('ram')
+
         # Update the labels to reflect IRIX mode
         self.cpu_label.setText(f"CPU (IRIX Mode): <b>{cpu_percent:.2f} %</b>")
         self.ram_label.setText(f"RAM: <b>{memory_mb:.2f} MB</b>")
 
-        # Lưu toàn bộ dữ liệu lịch sử
-        elapsed = absolute_timestamp - self.start_time
-        self.time_data.append(elapsed)
-        self.cpu_data.append(cpu_percent)
-        self.ram_data.append(memory_mb)
-
-        # Calculate and update the average CPU usage
-        avg_cpu = sum(self.cpu_data) / len(self.cpu_data)
+        # Calculate and update the average CPU usage (trung bình được cập nhật dần, không duyệt lại lịch sử)
+        avg_cpu = self.session_stats['cpu'].mean
         self.avg_cpu_label.setText(f"Avg CPU: <b>{avg_cpu:.2f} %</b>")
+        self.update_stats_labels()
+        if self.tree and self.tree_details:
+            self.update_children_table()
 
         # Update monitor duration label
         hours = int(elapsed // 3600)
@@ -224,25 +461,85 @@ class ProcessTabWidget(QWidget):
 
         # Cập nhật đồ thị
         self.update_plot()
+        if self.metric_history:
+            self.update_metric_plots()
+
+    def add_metric_values(self, elapsed, values):
+        """Lưu giá trị các metric mở rộng của một mẫu; trường không được đọc ở tick này là NaN."""
+        grouped = {}
+        for field, value in values.items():
+            grouped.setdefault(FIELD_METRICS[field], {})[field] = value
+        for name, fields in grouped.items():
+            store = self.metric_history.get(name)
+            if store is None:
+                store = self.metric_history[name] = SampleStore(('time', *(field for field, _ in METRICS[name].fields)))
+            store.append(elapsed, *(fields.get(field, math.nan) for field in store.columns[1:]))
+
+    def update_metric_plots(self):
+        """Vẽ các metric mở rộng trong cùng khoảng thời gian hiển thị với CPU/RAM."""
+        start_time = self.history.last('time') - self.display_duration
+        for name, store in self.metric_history.items():
+            plot = self.metric_plots.get(name)
+            if plot is None:
+                plot = self.metric_plots[name] = self._add_metric_plot(METRICS[name])
+            window = store.window(start_time)
+            for field, curve in plot[1].items():
+                curve.setData(window['time'], window[field], connect='finite')
+
+    def _add_metric_plot(self, metric):
+        plot_widget = pg.PlotWidget(title=f"{metric.label} - {self.process_name}")
+        plot_widget.setLabel('left', metric.label, units=metric.unit or None)
+        plot_widget.setLabel('bottom', 'Time Elapsed', units='s')
+        plot_widget.showGrid(x=True, y=True)
+        plot_widget.setMinimumHeight(METRIC_PLOT_HEIGHT)
+        if len(metric.fields) > 1:
+            plot_widget.addLegend()
+        curves = {}
+        for (field, label), color in zip(metric.fields, METRIC_COLORS):
+            curves[field] = plot_widget.plot(pen={'color': color, 'width': PLOT_LINE_WIDTH}, name=label)
+        position = len(self.metric_plots)
+        self.metrics_layout.addWidget(plot_widget, position // 2, position % 2)
+        return plot_widget, curves
+
+    def update_children_table(self):
+        """Hiển thị top-N process trong cây theo mẫu mới nhất."""
+        children = self.tree_details['children']
+        self.members_label.setText(f"Processes: <b>{self.tree_details['members']}</b>")
+        self.children_table.setRowCount(len(children))
+        for row, (pid, name, cpu_percent, memory_mb) in enumerate(children):
+            for column, text in enumerate((str(pid), name, f"{cpu_percent:.2f}", f"{memory_mb:.2f}")):
+                self.children_table.setItem(row, column, QTableWidgetItem(text))
 
     def update_plot(self):
         """Cập nhật đồ thị với dữ liệu trong khoảng thời gian hiển thị."""
-        if not self.time_data:
+        if not len(self.history):
             return
 
         # Lấy thời gian hiện tại và tính khoảng thời gian hiển thị
-        current_time = self.time_data[-1]
+        current_time = self.history.last('time')
         start_time = current_time - self.display_duration
 
-        # Lọc dữ liệu trong khoảng thời gian hiển thị
-        filtered_time = [t for t in self.time_data if t >= start_time]
-        start_index = len(self.time_data) - len(filtered_time)
-        filtered_cpu = self.cpu_data[start_index:]
-        filtered_ram = self.ram_data[start_index:]
+        # Chọn tầng rollup sao cho số điểm xấp xỉ số pixel theo chiều ngang
+        width_px = self.cpu_plot_widget.getPlotItem().getViewBox().width()
+        sample_count = len(self.history)
+        sample_interval = (current_time - self.history.column('time')[0]) / (sample_count - 1) if sample_count > 1 else 0
+        tier = self.rollups.select_tier(self.display_duration, width_px, sample_interval)
+
+        # Vị trí bắt đầu được tìm nhị phân, dữ liệu truyền cho pyqtgraph là view không copy
+        if tier is None:
+            window = self.history.window(start_time)
+            self.cpu_curve.setData(window['time'], window['cpu'])
+            self.ram_curve.setData(window['time'], window['ram'])
+            for envelope_curve in (*self.cpu_envelope, *self.ram_envelope):
+                envelope_curve.setData([], [])
+            return
 
-        # Cập nhật đồ thị với dữ liệu đã lọc
-        self.cpu_curve.setData(filtered_time, filtered_cpu)
-        self.ram_curve.setData(filtered_time, filtered_ram)
+        window = tier.store.window(start_time)
+        for metric, curve, (min_curve, max_curve) in (('cpu', self.cpu_curve, self.cpu_envelope),
+                                                      ('ram', self.ram_curve, self.ram_envelope)):
+            curve.setData(window['time'], window[f'{metric}_mean'])
+            min_curve.setData(window['time'], window[f'{metric}_min'])
+            max_curve.setData(window['time'], window[f'{metric}_max'])
 
     def mark_terminated(self):
         """Đánh dấu process đã kết thúc và cập nhật giao diện."""
@@ -260,44 +557,544 @@ class ProcessTabWidget(QWidget):
         self.status_label.setStyleSheet("color: orange;")
         QMessageBox.warning(self, f"Process Error (PID: {self.pid})", error_message)
 
+    def reattach(self, new_pid):
+        """Tiếp tục theo dõi trên cùng tab/chuỗi dữ liệu với PID mới (process khởi động lại)."""
+        old_pid = self.pid
+        self.pid = new_pid
+        self.terminated = False
+        self.tree_details = None
+        self.status_label.setText(f"Monitoring PID: {self.pid} (restarted, was {old_pid})")
+        self.status_label.setStyleSheet("")
+
+        self.add_restart_marker(wall_clock(), new_pid)
+
+    def add_alert_marker(self, alert):
+        """Đánh dấu lúc một luật cảnh báo bắt đầu hoặc hết cảnh báo trên đồ thị của metric đó."""
+        plot_widget = self.cpu_plot_widget if alert.rule.metric == 'cpu' else self.ram_plot_widget
+        if alert.firing:
+            pen = pg.mkPen('r', width=2)
+            label = f"\u26a0 {alert.rule.describe()}"
+        else:
+            pen = pg.mkPen((150, 150, 150), style=Qt.PenStyle.DotLine)
+            label = "resolved"
+        marker = pg.InfiniteLine(pos=alert.time - self.start_time, angle=90, movable=False, pen=pen,
+                                 label=label, labelOpts={'position': 0.8, 'color': pen.color()})
+        plot_widget.addItem(marker)
+
+    def add_restart_marker(self, absolute_timestamp, new_pid):
+        """Đánh dấu thời điểm process khởi động lại trên cả hai đồ thị."""
+        elapsed = absolute_timestamp - self.start_time
+        for plot_widget in (self.cpu_plot_widget, self.ram_plot_widget):
+            marker = pg.InfiniteLine(pos=elapsed, angle=90, movable=False,
+                                     pen=pg.mkPen('g', style=Qt.PenStyle.DashLine),
+                                     label=f"restart → {new_pid}",
+                                     labelOpts={'position': 0.9, 'color': 'g'})
+            plot_widget.addItem(marker)
+
+
+class RecordingTabWidget(ProcessTabWidget):
+    """
+    Tab phân tích offline một series của recording (CSV hoặc .pmts ánh xạ bằng mmap).
+
+    Dữ liệu không được nạp vào SampleStore: thống kê và đồ thị được tính thẳng trên các cột
+    numpy của series (với .pmts là view trên mmap), nên mở recording nhiều GB vẫn nhanh.
+    Trục thời gian dùng thời điểm tuyệt đối. Với .pmts, P50/P95/P99 phải đọc dữ liệu thô nên
+    được tính trên thread riêng và hiện khi xong ("--" trong lúc chờ).
+    """
+    quantiles_ready = pyqtSignal(str, int, object)  # 'session' | 'window', lượt yêu cầu, {metric: {p50, ...}}
+
+    def __init__(self, series, path, parent=None):
+        super().__init__(series.pid, series.name, start_time=0, parent=parent)
+        self.series = series
+        self._quantile_requests = {'session': 0, 'window': 0}
+        self.quantiles_ready.connect(self._apply_quantiles)
+        self.terminated = True  # Không nhận thêm dữ liệu trực tiếp
+        self.status_label.setText(f"Recording: {os.path.basename(os.path.normpath(path))}")
+        self.status_label.setStyleSheet("color: gray;")
+        for plot_widget in (self.cpu_plot_widget, self.ram_plot_widget):
+            plot_widget.setAxisItems({'bottom': pg.DateAxisItem()})
+            plot_widget.setLabel('bottom', 'Time')
+
+        # Mặc định hiển thị toàn bộ recording
+        self.span = float(series.time[-1] - series.time[0])
+        self.display_duration = min(max(math.ceil(self.span), self.duration_spinbox.minimum()),
+                                    self.duration_spinbox.maximum())
+        self.duration_spinbox.setValue(self.display_duration)
+
+        self.session_summary = self._summaries(0, len(series), 'session')
+        self.window_summary = {}
+        for timestamp, pid in series.pid_changes()[1:]:
+            self.add_restart_marker(timestamp, pid)
+        self.render()
+
+    def _summaries(self, start, stop, scope):
+        """Thống kê CPU/RAM của [start, stop); với series lazy_quantiles, quantile được tính sau."""
+        lazy = self.series.lazy_quantiles
+        summaries = {metric: self.series.summary(metric, start, stop, quantiles=not lazy) for metric in ('cpu', 'ram')}
+        if lazy:
+            self._quantile_requests[scope] += 1
+            request = self._quantile_requests[scope]
+            threading.Thread(target=self._compute_quantiles, args=(scope, request, start, stop),
+                             name="recording-quantiles", daemon=True).start()
+        return summaries
+
+    def _compute_quantiles(self, scope, request, start, stop):
+        # Chạy trên thread riêng: đọc dữ liệu thô (có thể còn trên đĩa) không làm treo giao diện
+        try:
+            result = {metric: self.series.quantiles(metric, start, stop) for metric in ('cpu', 'ram')}
+            self.quantiles_ready.emit(scope, request, result)
+        except RuntimeError:
+            pass  # Tab đã bị đóng
+
+    def _apply_quantiles(self, scope, request, result):
+        if request != self._quantile_requests[scope]:
+            return  # Cửa sổ hiển thị đã đổi sau khi yêu cầu này được gửi
+        summaries = self.session_summary if scope == 'session' else self.window_summary
+        for metric, quantiles in result.items():
+            if summaries.get(metric) is not None:
+                summaries[metric].update(quantiles)
+        self.update_stats_labels()
+
+    def update_stats_labels(self):
+        for (metric, scope), labels in self.stats_labels.items():
+            summary = (self.session_summary if scope == 'session' else self.window_summary).get(metric)
+            if summary is None:
+                continue
+            for label, (name, _) in zip(labels, STATS_COLUMNS):
+                label.setText("--" if summary[name] is None else f"{summary[name]:.2f}")
+
+    def render(self):
+        self.cpu_label.setText(f"CPU (IRIX Mode): <b>{self.series.cpu[-1]:.2f} %</b>")
+        self.ram_label.setText(f"RAM: <b>{self.series.ram[-1]:.2f} MB</b>")
+        self.avg_cpu_label.setText(f"Avg CPU: <b>{self.session_summary['cpu']['avg']:.2f} %</b>")
+        hours = int(self.span // 3600)
+        minutes = int((self.span % 3600) // 60)
+        seconds = int(self.span % 60)
+        self.monitor_duration_label.setText(f"Monitor Duration: <b>{hours:02d}:{minutes:02d}:{seconds:02d}</b>")
+        self.update_plot()
+
+    def update_plot(self):
+        """Vẽ khoảng display_duration cuối recording; khoảng dài được gom thành ~1 bucket mỗi pixel."""
+        series = self.series
+        start = series.index_at(series.time[-1] - self.display_duration)
+        stop = len(series)
+        self.window_summary = self._summaries(start, stop, 'window')
+        self.update_stats_labels()
+
+        width_px = max(int(self.cpu_plot_widget.getPlotItem().getViewBox().width()), 100)
+        for metric, curve, (min_curve, max_curve) in (('cpu', self.cpu_curve, self.cpu_envelope),
+                                                      ('ram', self.ram_curve, self.ram_envelope)):
+            if stop - start <= 2 * width_px:
+                # Ít điểm: vẽ thẳng view của dữ liệu (với .pmts là view trên mmap, không copy)
+                curve.setData(series.time[start:], getattr(series, metric)[start:])
+                min_curve.setData([], [])
+                max_curve.setData([], [])
+                continue
+            bucket_times, bucket_min, bucket_mean, bucket_max = series.envelope(metric, start, stop, width_px)
+            curve.setData(bucket_times, bucket_mean)
+            min_curve.setData(bucket_times, bucket_min)
+            max_curve.setData(bucket_times, bucket_max)
+
+
+class MonitorHealthWidget(QWidget):
+    """Tab "Monitor Health": chi phí của chính monitor (CPU/RSS so với ngân sách) và các histogram độ trễ."""
+    def __init__(self, health, engine, parent=None):
+        super().__init__(parent)
+        load_plotting()
+        self.health = health
+        self.engine = engine
+        self.histograms = {}  # Lần làm mới gần nhất: tên -> Histogram
+
+        layout = QVBoxLayout(self)
+        info_layout = QHBoxLayout()
+        self.cpu_label = QLabel("Own CPU: -- %")
+        self.ram_label = QLabel("Own RSS: -- MB")
+        self.budget_label = QLabel()
+        info_layout.addWidget(self.cpu_label)
+        info_layout.addWidget(self.ram_label)
+        info_layout.addStretch()
+        info_layout.addWidget(self.budget_label)
+        export_button = QPushButton("Export...")
+        export_button.clicked.connect(self.export_dialog)
+        info_layout.addWidget(export_button)
+        layout.addLayout(info_layout)
+
+        # Bảng thống kê của từng histogram; chọn một dòng để xem phân bố của nó
+        self.table = QTableWidget(0, len(HEALTH_COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for _, title in HEALTH_COLUMNS])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.table.setMaximumHeight(210)
+        self.table.itemSelectionChanged.connect(self.update_distribution)
+        layout.addWidget(self.table)
+
+        self.distribution_plot = pg.PlotWidget(title="Distribution")
+        self.distribution_plot.setLabel('left', 'Count')
+        self.distribution_plot.setLabel('bottom', 'Latency (log10 ms)')
+        self.distribution_plot.showGrid(x=True, y=True)
+        self.distribution_bars = pg.BarGraphItem(x=[], height=[], width=0.06, brush='b')
+        self.distribution_plot.addItem(self.distribution_bars)
+        layout.addWidget(self.distribution_plot)
+
+        self.usage_plot = pg.PlotWidget(title="Monitor CPU (%) and RSS (MB)")
+        self.usage_plot.setLabel('bottom', 'Time', units='s')
+        self.usage_plot.showGrid(x=True, y=True)
+        self.usage_plot.addLegend()
+        self.cpu_curve = self.usage_plot.plot(pen={'color': 'b', 'width': PLOT_LINE_WIDTH}, name="CPU %")
+        self.ram_curve = self.usage_plot.plot(pen={'color': 'r', 'width': PLOT_LINE_WIDTH}, name="RSS MB")
+        layout.addWidget(self.usage_plot)
+
+    def _current_histograms(self):
+        return dict(self.engine.timing.histograms, **self.health.histograms)
+
+    def refresh(self):
+        """Cập nhật bảng, phân bố và đồ thị CPU/RSS (gọi mỗi giây khi tab đang hiển thị)."""
+        usage = self.health.usage
+        if usage:
+            _, cpu_percent, rss_mb = usage[-1]
+            mean_cpu = sum(item[1] for item in usage) / len(usage)
+            self.cpu_label.setText(f"Own CPU: <b>{cpu_percent:.2f} %</b> (avg {mean_cpu:.2f} %)")
+            self.ram_label.setText(f"Own RSS: <b>{rss_mb:.1f} MB</b>")
+            within = mean_cpu <= OWN_CPU_BUDGET and rss_mb <= OWN_RSS_BUDGET_MB
+            self.budget_label.setText(f"Budget: {OWN_CPU_BUDGET:g} % CPU, {OWN_RSS_BUDGET_MB:g} MB RSS — "
+                                      + ("within budget" if within else "OVER BUDGET"))
+            self.budget_label.setStyleSheet("color: green;" if within else "color: red;")
+            start = usage[0][0]
+            self.cpu_curve.setData([item[0] - start for item in usage], [item[1] for item in usage])
+            self.ram_curve.setData([item[0] - start for item in usage], [item[2] for item in usage])
+
+        self.histograms = self._current_histograms()
+        selected = self.selected_histogram()
+        self.table.blockSignals(True)
+        self.table.setRowCount(len(self.histograms))
+        for row, (name, histogram) in enumerate(self.histograms.items()):
+            summary = histogram.summary()
+            values = [HISTOGRAM_LABELS.get(name, name), str(summary['count'])]
+            values += [f"{summary[key]:.3f}" for key, _ in HEALTH_COLUMNS[2:]]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.ItemDataRole.UserRole, name)
+                self.table.setItem(row, column, item)
+            if name == selected:
+                self.table.selectRow(row)
+        self.table.blockSignals(False)
+        self.update_distribution()
+
+    def selected_histogram(self):
+        items = self.table.selectedItems()
+        return items[0].data(Qt.ItemDataRole.UserRole) if items else None
+
+    def update_distribution(self):
+        histogram = self.histograms.get(self.selected_histogram())
+        if histogram is None:
+            self.distribution_bars.setOpts(x=[], height=[])
+            return
+        buckets = histogram.buckets()
+        self.distribution_bars.setOpts(x=[math.log10(upper_ms) for upper_ms, _ in buckets],
+                                       height=[count for _, count in buckets])
+
+    def export_dialog(self):
+        """Xuất số liệu hiện tại ra JSON hoặc CSV."""
+        path, _ = QFileDialog.getSaveFileName(self, "Export Monitor Health", "monitor_health.json",
+                                              "JSON (*.json);;CSV (*.csv)")
+        if not path:
+            return
+        try:
+            self.health.export(path, self.engine.timing.histograms)
+        except OSError as e:
+            QMessageBox.warning(self, "Export Monitor Health", f"Could not write '{path}': {e}")
+
 
 class IntervalDialog(QDialog):
-    """Hộp thoại để người dùng nhập khoảng thời gian cập nhật."""
-    def __init__(self, current_interval_sec, parent=None):
+    """Hộp thoại để người dùng nhập khoảng thời gian cập nhật (tính bằng mili giây)."""
+    def __init__(self, current_interval_ms, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Set Update Interval")
 
         layout = QFormLayout(self)
 
         self.interval_spinbox = QSpinBox()
-        self.interval_spinbox.setMinimum(1) # Tối thiểu 1 giây
-        self.interval_spinbox.setMaximum(300) # Tối đa 5 phút
-        self.interval_spinbox.setValue(current_interval_sec)
-        self.interval_spinbox.setSuffix(" s")
+        self.interval_spinbox.setMinimum(MIN_UPDATE_INTERVAL_MS) # Tối thiểu 10 ms (chế độ tần số cao)
+        self.interval_spinbox.setMaximum(300 * 1000) # Tối đa 5 phút
+        self.interval_spinbox.setSingleStep(10 if current_interval_ms < 1000 else 1000)
+        self.interval_spinbox.setValue(current_interval_ms)
+        self.interval_spinbox.setSuffix(" ms")
 
         layout.addRow("Update Interval:", self.interval_spinbox)
+        hint = QLabel("10 ms – 300 s. Below 1 s, samples are taken on a dedicated high-frequency "
+                      "schedule and plots refresh at most 20 times per second.")
+        hint.setWordWrap(True)
+        hint.setStyleSheet("color: gray;")
+        layout.addRow(hint)
+        # Lịch sử thô có giới hạn số mẫu (DEFAULT_MAX_SAMPLES): chu kỳ càng ngắn thì giữ được càng ít thời gian
+        self.retention_label = QLabel()
+        self.retention_label.setWordWrap(True)
+        layout.addRow(self.retention_label)
+        self.interval_spinbox.valueChanged.connect(self._update_retention)
+        self._update_retention(current_interval_ms)
 
         button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         button_box.accepted.connect(self.accept)
         button_box.rejected.connect(self.reject)
         layout.addWidget(button_box)
 
-    def get_interval_sec(self):
-        """Trả về giá trị interval người dùng đã chọn (tính bằng giây)."""
+    def _update_retention(self, interval_ms):
+        from timeseries import retention_s  # timeseries kéo theo NumPy: chỉ nạp khi mở hộp thoại
+        hours = retention_s(interval_ms / 1000) / 3600
+        span = f"{hours:.1f} hours" if hours < 48 else f"{hours / 24:.0f} days"
+        self.retention_label.setText(
+            f"Full-resolution history per process at this interval: about <b>{span}</b>. Older samples are "
+            "then kept only as 1 s – 10 min averages for long plot ranges, and exports count them as lost.")
+
+    def get_interval_ms(self):
+        """Trả về giá trị interval người dùng đã chọn (tính bằng mili giây)."""
         return self.interval_spinbox.value()
 
+class MetricsDialog(QDialog):
+    """Hộp thoại chọn các metric mở rộng, mỗi metric kèm chi phí và chu kỳ đọc."""
+    def __init__(self, enabled, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Extended Metrics")
+        layout = QVBoxLayout(self)
+        hint = QLabel("Extra metrics are read only when enabled, for processes monitored individually\n"
+                      "(not process trees). Each enabled metric gets its own plot in the process tab.")
+        hint.setStyleSheet("color: gray;")
+        layout.addWidget(hint)
+
+        self.checkboxes = {}
+        for metric in METRICS.values():
+            checkbox = QCheckBox(f"{metric.label} ({metric.describe()})")
+            checkbox.setChecked(metric.name in enabled)
+            layout.addWidget(checkbox)
+            self.checkboxes[metric.name] = checkbox
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def get_metrics(self):
+        return [name for name, checkbox in self.checkboxes.items() if checkbox.isChecked()]
+
+
+class RuleDialog(QDialog):
+    """Hộp thoại tạo luật auto-attach."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Add Auto-Attach Rule")
+
+        layout = QFormLayout(self)
+        self.name_edit = QLineEdit()
+        self.name_edit.setPlaceholderText("e.g. nginx")
+        self.cmdline_edit = QLineEdit()
+        self.cmdline_edit.setPlaceholderText(r"e.g. gunicorn .*app:main")
+        self.user_edit = QLineEdit()
+        self.tree_checkbox = QCheckBox("Monitor the whole process tree")
+
+        layout.addRow("Name contains:", self.name_edit)
+        layout.addRow("Cmdline regex:", self.cmdline_edit)
+        layout.addRow("User:", self.user_edit)
+        layout.addRow(self.tree_checkbox)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(self.validate_and_accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def validate_and_accept(self):
+        """Kiểm tra dữ liệu nhập trước khi đóng hộp thoại."""
+        if not (self.name_edit.text().strip() or self.cmdline_edit.text().strip() or self.user_edit.text().strip()):
+            QMessageBox.warning(self, "Input Error", "At least one condition is required.")
+            return
+        try:
+            re.compile(self.cmdline_edit.text().strip())
+        except re.error as e:
+            QMessageBox.warning(self, "Input Error", f"Invalid cmdline regex: {e}")
+            return
+        self.accept()
+
+    def get_rule(self, rule_id):
+        """Trả về AttachRule từ dữ liệu người dùng đã nhập."""
+        return AttachRule(rule_id, self.name_edit.text().strip(), self.cmdline_edit.text().strip(),
+                          self.user_edit.text().strip(), self.tree_checkbox.isChecked())
+
+
+class ManageRulesDialog(QDialog):
+    """Hộp thoại xem và xóa các luật auto-attach."""
+    def __init__(self, rules, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Auto-Attach Rules")
+        self.rules = list(rules)
+
+        layout = QVBoxLayout(self)
+        self.rule_list = QListWidget()
+        for rule in self.rules:
+            self.rule_list.addItem(rule.describe())
+        layout.addWidget(self.rule_list)
+
+        remove_button = QPushButton("Remove Selected")
+        remove_button.clicked.connect(self.remove_selected)
+        layout.addWidget(remove_button)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def remove_selected(self):
+        row = self.rule_list.currentRow()
+        if row >= 0:
+            self.rule_list.takeItem(row)
+            del self.rules[row]
+
+
+class AlertRuleDialog(QDialog):
+    """Hộp thoại tạo luật cảnh báo (xem alerts.py)."""
+    KINDS = (('above', "Value above threshold"), ('slope', "Trend (slope per hour) above threshold"),
+             ('baseline', "Value above its own percentile baseline"))
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Add Alert Rule")
+
+        layout = QFormLayout(self)
+        self.kind_combo = QComboBox()
+        for kind, label in self.KINDS:
+            self.kind_combo.addItem(label, kind)
+        self.metric_combo = QComboBox()
+        for metric, (label, unit) in ALERT_METRICS.items():
+            self.metric_combo.addItem(f"{label} ({unit})", metric)
+        self.threshold_spinbox = QDoubleSpinBox()
+        self.threshold_spinbox.setRange(0, 1e6)
+        self.threshold_spinbox.setValue(80)
+        self.duration_spinbox = QSpinBox()
+        self.duration_spinbox.setRange(0, 86400)
+        self.duration_spinbox.setValue(300)
+        self.duration_spinbox.setSuffix(" s")
+        self.window_spinbox = QSpinBox()
+        self.window_spinbox.setRange(60, 7 * 86400)
+        self.window_spinbox.setValue(3600)
+        self.window_spinbox.setSuffix(" s")
+        self.name_edit = QLineEdit()
+        self.name_edit.setPlaceholderText("empty: every monitored process")
+
+        layout.addRow("Condition:", self.kind_combo)
+        layout.addRow("Metric:", self.metric_combo)
+        layout.addRow("Threshold:", self.threshold_spinbox)
+        layout.addRow("For at least:", self.duration_spinbox)
+        layout.addRow("Trend window:", self.window_spinbox)
+        layout.addRow("Name contains:", self.name_edit)
+        self.threshold_hint = QLabel()
+        self.threshold_hint.setStyleSheet("color: gray;")
+        layout.addRow(self.threshold_hint)
+        self.kind_combo.currentIndexChanged.connect(self.update_hint)
+        self.metric_combo.currentIndexChanged.connect(self.update_hint)
+        self.update_hint()
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def update_hint(self):
+        """Giải thích đơn vị của ngưỡng theo loại luật đang chọn."""
+        kind = self.kind_combo.currentData()
+        unit = ALERT_METRICS[self.metric_combo.currentData()][1]
+        self.window_spinbox.setEnabled(kind == 'slope')
+        if kind == 'above':
+            self.threshold_hint.setText(f"Threshold in {unit}.")
+        elif kind == 'slope':
+            self.threshold_hint.setText(f"Threshold in {unit} per hour, fitted over the trend window.")
+        else:
+            self.threshold_hint.setText("Threshold is a percentile (e.g. 99) of the process's own history.")
+
+    def get_rule(self, rule_id):
+        """Trả về AlertRule từ dữ liệu người dùng đã nhập."""
+        return AlertRule(rule_id, self.kind_combo.currentData(), self.metric_combo.currentData(),
+                         self.threshold_spinbox.value(), float(self.duration_spinbox.value()),
+                         float(self.window_spinbox.value()), self.name_edit.text().strip())
+
+
+class AlertRulesDialog(ManageRulesDialog):
+    """Hộp thoại xem, thêm và xóa luật cảnh báo."""
+    def __init__(self, rules, parent=None):
+        super().__init__(rules, parent)
+        self.setWindowTitle("Alert Rules")
+        add_button = QPushButton("Add...")
+        add_button.clicked.connect(self.add_rule)
+        self.layout().insertWidget(1, add_button)
+
+    def add_rule(self):
+        dialog = AlertRuleDialog(self)
+        if dialog.exec():
+            rule = dialog.get_rule(next_rule_id(self.rules))
+            self.rules.append(rule)
+            self.rule_list.addItem(rule.describe())
+
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, backend_name="auto", shards=0):
         super().__init__()
         self.setWindowTitle("Process Monitor @v1.0-khuongnv2")
         self.setGeometry(100, 100, 900, 700)
 
         self.monitored_processes = {}
         self.update_interval_ms = INITIAL_UPDATE_INTERVAL_MS
+        self.enabled_metrics = []  # Các metric mở rộng đang bật (xem metrics.py)
+        self.health = MonitorHealth()  # Chi phí của chính monitor, hiện ở tab Monitor Health
+        self.health_tab = None  # Chỉ tạo khi người dùng mở tab
+        self.process_index = None  # Bảng process cho hộp thoại Add Process, giữ lại giữa các lần mở
+
+        # Một worker lấy mẫu duy nhất cho mọi process
+        backend = create_backend(backend_name)
+        print(f"Sampling backend: {backend.name}" + (f", {shards} shards" if shards else ""))
+        try:
+            self.monitor_worker = ProcessMonitorWorker(self.update_interval_ms, backend, shards)
+        except ValueError as e:
+            print(f"Warning: {e} Sampling in a single process.")
+            self.monitor_worker = ProcessMonitorWorker(self.update_interval_ms, backend)
+        self.monitor_worker.samples_ready.connect(self.handle_samples)
+        self.monitor_worker.process_terminated.connect(self.handle_process_terminated)
+        self.monitor_worker.process_error.connect(self.handle_process_error)
+        self.monitor_worker.rule_matched.connect(self.handle_rule_match)
+
+        # Luật auto-attach được lưu ra file nên vẫn còn sau khi khởi động lại
+        self.rule_tabs = {}  # rule_id -> ProcessTabWidget đang đi theo luật đó
+        self.rule_pending = {}  # rule_id -> PID khớp luật khi tab của luật còn đang theo dõi process cũ
+        try:
+            self.rules = load_rules()
+        except (OSError, ValueError, KeyError, re.error) as e:
+            print(f"Warning: could not load auto-attach rules: {e}")
+            self.rules = []
+        self.monitor_worker.set_rules(self.rules)
+
+        # Luật cảnh báo chạy trên mọi mẫu nhận được (của process cục bộ lẫn của collector)
+        try:
+            self.alert_rules = load_alert_rules()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: could not load alert rules: {e}")
+            self.alert_rules = []
+        self.alerts = AlertEngine(self.alert_rules)
+        self.alert_log = AlertLog()
+        self.tray_icon = None  # Tạo khi cần hiện thông báo desktop lần đầu
+
+        self._export_job = None  # (generator, QProgressDialog, QTimer, sources, path, ghi chú) khi đang xuất
+
+        # Các collector đang kết nối: địa chỉ -> {'worker', 'overview', 'tabs': {pid: tab}, 'hidden': set(PID)}
+        self.remote_hosts = {}
 
         self.tab_widget = QTabWidget()
         self.tab_widget.setTabsClosable(True)
         self.tab_widget.tabCloseRequested.connect(self.close_tab)
+        self.render_scheduler = RenderScheduler(self.tab_widget, render_time=self.health.histograms['render'])
+
+        # Bảng tổng quan mọi process đang theo dõi; chỉ thành tab khi người dùng mở nó
+        self.overview = OverviewWidget()
+        self.overview.open_requested.connect(self.open_overview_details)
+        self.overview.stop_requested.connect(self.stop_monitoring)
 
         # Placeholder widget for when no processes are monitored
         self.placeholder_widget = QWidget()
@@ -310,12 +1107,22 @@ class MainWindow(QMainWindow):
         placeholder_layout.addWidget(placeholder_label)
 
         self.setCentralWidget(self.tab_widget)
+
+        # Thanh trạng thái: chu kỳ lấy mẫu và jitter thực tế của engine
+        self.timing_label = QLabel()
+        self.statusBar().addPermanentWidget(self.timing_label)
+        self.timing_timer = QTimer(self)
+        self.timing_timer.timeout.connect(self.update_timing_status)
+        self.timing_timer.timeout.connect(self.update_health)
+        self.timing_timer.start(1000)
+        self.update_timing_status()
         self.tab_widget.addTab(self.placeholder_widget, "Welcome")
         self.tab_widget.tabBar().setVisible(False)  # Hide the tab bar when only the placeholder is shown
 
         # Menu bar
         menu_bar = self.menuBar()
         action_menu = menu_bar.addMenu("&Actions")
+        rules_menu = menu_bar.addMenu("&Rules")
         settings_menu = menu_bar.addMenu("&Settings")
         help_menu = menu_bar.addMenu("&Help")  # Add Help menu
 
@@ -324,17 +1131,63 @@ class MainWindow(QMainWindow):
         add_action.triggered.connect(self.add_process_dialog)
         action_menu.addAction(add_action)
 
+        add_tree_action = QAction("Add Process &Tree...", self)
+        add_tree_action.triggered.connect(lambda: self.add_process_dialog(tree=True))
+        action_menu.addAction(add_tree_action)
+
+        add_overview_action = QAction("Add Processes to O&verview...", self)
+        add_overview_action.triggered.connect(self.add_overview_dialog)
+        action_menu.addAction(add_overview_action)
+
+        show_overview_action = QAction("Show &Overview", self)
+        show_overview_action.triggered.connect(self.show_overview)
+        action_menu.addAction(show_overview_action)
+
+        show_health_action = QAction("Show Monitor &Health", self)
+        show_health_action.triggered.connect(self.show_health)
+        action_menu.addAction(show_health_action)
+
+        connect_collector_action = QAction("&Connect to Collector...", self)
+        connect_collector_action.triggered.connect(self.connect_collector_dialog)
+        action_menu.addAction(connect_collector_action)
+
+        open_recording_action = QAction("&Open Recording...", self)
+        open_recording_action.triggered.connect(self.open_recording_dialog)
+        action_menu.addAction(open_recording_action)
+
+        export_action = QAction("E&xport Session...", self)
+        export_action.triggered.connect(self.export_session_dialog)
+        action_menu.addAction(export_action)
+
         action_menu.addSeparator()
 
         exit_action = QAction("&Exit", self)
         exit_action.triggered.connect(self.close)
         action_menu.addAction(exit_action)
 
+        # Rules menu
+        add_rule_action = QAction("&Add Auto-Attach Rule...", self)
+        add_rule_action.triggered.connect(self.add_rule_dialog)
+        rules_menu.addAction(add_rule_action)
+
+        manage_rules_action = QAction("&Manage Rules...", self)
+        manage_rules_action.triggered.connect(self.manage_rules_dialog)
+        rules_menu.addAction(manage_rules_action)
+
+        rules_menu.addSeparator()
+        alert_rules_action = QAction("A&lert Rules...", self)
+        alert_rules_action.triggered.connect(self.alert_rules_dialog)
+        rules_menu.addAction(alert_rules_action)
+
         # Settings menu
         interval_action = QAction("Set &Update Interval...", self)
         interval_action.triggered.connect(self.set_update_interval_dialog)
         settings_menu.addAction(interval_action)
 
+        metrics_action = QAction("Extended &Metrics...", self)
+        metrics_action.triggered.connect(self.set_metrics_dialog)
+        settings_menu.addAction(metrics_action)
+
         # Help menu
         guide_action = QAction("&User Guide", self)
         guide_action.triggered.connect(self.show_user_guide)
@@ -350,9 +1203,18 @@ class MainWindow(QMainWindow):
             "<p>This application allows you to monitor the CPU and RAM usage of specific processes in real-time.</p>"
             "<h3>How to Use:</h3>"
             "<ul>"
-            "  <li><b>Add a Process:</b> Go to <i>Actions -> Add Process...</i> and enter the name of the process you want to monitor.</li>"
-            "  <li><b>Set Update Interval:</b> Go to <i>Settings -> Set Update Interval...</i> to adjust the frequency of updates (in seconds).</li>"
-            "  <li><b>Close a Tab:</b> Click the close button on a tab to stop monitoring a process.</li>"
+            "  <li><b>Add a Process:</b> Go to <i>Actions -> Add Process...</i> and type to filter the process list by name, command line or user (hover the filter box for the full syntax, e.g. <i>python user:alice cmd:--port ppid:1</i>). Click a column header to sort, e.g. by CPU or RSS. Select one or several processes (Ctrl/Shift-click) and press <i>Add Selected</i> to open a tab for each.</li>"
+            "  <li><b>Add a Process Tree:</b> Go to <i>Actions -> Add Process Tree...</i> (or tick <i>Monitor the whole process tree</i> in the Add Process dialog) to monitor a process together with all of its child processes. The plots show the total of the whole tree and the tab lists the busiest processes in it.</li>"
+            "  <li><b>Overview:</b> Use <i>Actions -> Add Processes to Overview...</i> to watch many processes at once (for example every process whose name contains some text, or all processes). The <i>Overview</i> tab lists every monitored process in one table with current, average and maximum CPU and RAM and a small CPU sparkline, and stays responsive with hundreds of processes. Click a column header to sort, double-click a row to open its detailed tab, and right-click to stop monitoring the selected processes. <i>Actions -> Show Overview</i> opens the table for processes added in other ways.</li>"
+            "  <li><b>Auto-Attach Rules:</b> Use <i>Rules -> Add Auto-Attach Rule...</i> to match processes by name, cmdline regex or user. Matching processes get a tab automatically, and when the process restarts the same tab continues with a restart marker on the plots. Rules are saved and applied again at the next start.</li>"
+            "  <li><b>Open a Recording:</b> Recordings made on servers with <i>record.py</i> (no GUI needed) can be opened with <i>Actions -> Open Recording...</i> for offline analysis. Binary <i>.pmts</i> recordings are folders: select the <i>manifest.json</i> inside; they are memory-mapped, so even multi-GB recordings open instantly.</li>"
+            "  <li><b>Set Update Interval:</b> Go to <i>Settings -> Set Update Interval...</i> to adjust the sampling interval, from 10 ms to 300 s. Intervals below one second enable high-frequency mode for catching short CPU bursts and allocation spikes; the status bar shows the measured scheduling jitter. Note that CPU time is counted by the kernel in clock ticks (usually 10 ms), so CPU % at very short intervals is coarse. Each process keeps about one million full-resolution samples (at least about 11 days at 1 s, but only about 2.5 hours at 10 ms; the dialog shows the figure for the chosen interval). Older samples remain only as averages for long plot ranges and are reported as lost by <i>Export Session</i>.</li>"
+            "  <li><b>Extended Metrics:</b> <i>Settings -> Extended Metrics...</i> turns on extra metrics for individually monitored processes: disk I/O, context switches, open file descriptors, thread count, busiest-thread CPU and PSS/USS memory. Each enabled metric gets its own plot in the process tab. Cheap metrics are read every interval; expensive ones (busiest-thread CPU, PSS/USS) are read less often, and the slower they are to read the less often they are read. Nothing is read for metrics that are turned off.</li>"
+            "  <li><b>Many Processes:</b> To monitor thousands of processes, start the monitor with <i>--shards N</i> (for example <i>python run.py --shards 4</i>). Sampling is then split across N worker processes so it can use several CPU cores. Processes are spread over the workers as they come and go, and the status bar shows each worker's load and lag; if a worker's load approaches 100%, use more shards. Not available in the packaged app.</li>"
+            "  <li><b>Monitor Health:</b> <i>Actions -> Show Monitor Health</i> shows how much the monitor itself costs: its own CPU and memory (including sampling workers) against a budget, and latency histograms for reading each process, tick scheduling jitter, the delay before the window receives new samples, and plot drawing time. Select a row to see its distribution. <i>Export...</i> saves everything as JSON or CSV. These measurements are always on and cost very little.</li>"
+            "  <li><b>Alerts:</b> <i>Rules -> Alert Rules...</i> sets conditions checked on every sample of every monitored process: a value above a threshold for some time (e.g. CPU above 80% for 5 minutes), a trend (e.g. RAM growing faster than 50 MB per hour over the last hour, a typical memory leak), or a value above a percentile of the process's own history (e.g. RAM above its p99 baseline). When a rule fires, the process tab title gets a \u26a0 mark, the plot gets a red line labelled with the rule, a desktop notification is shown when available, and the alert is appended to <i>alerts.log</i> next to the rules file. Rules apply to processes from the overview and from collectors too.</li>"
+            "  <li><b>Remote Hosts:</b> Run <i>collector.py</i> on each machine to watch (for example <i>python collector.py --listen 0.0.0.0:7878 --name nginx</i>; it accepts the same process options as <i>record.py</i>), then use <i>Actions -> Connect to Collector...</i> or start the monitor with <i>--connect host:7878</i> (repeat for several machines). Each collector gets its own overview tab; double-click a row for details. If the connection drops, the monitor reconnects and fetches the samples it missed from the collector's buffer (the last 10 minutes by default). Closing the collector's tab disconnects it.</li>"
+            "  <li><b>Close a Tab:</b> Click the close button on a tab to stop monitoring a process. Processes added through the overview keep being monitored there; stop them from the overview instead.</li>"
             "  <li><b>Exit:</b> Go to <i>Actions -> Exit</i> to close the application.</li>"
             "</ul>"
             "<h3>Features:</h3>"
@@ -362,8 +1224,9 @@ class MainWindow(QMainWindow):
             "  <li>Dynamic addition and removal of monitored processes.</li>"
             "  <li><b>Export Data:</b> You can export the plot data to an image or CSV file:</li>"
             "  <ul>"
+            "    <li><b>Export Session:</b> Use <i>Actions -> Export Session...</i> to save the full history of every tab as CSV or as compressed columnar binary (<i>.pmcol</i>). The export runs in the background with a progress bar, even for sessions with millions of samples. Enabled extended metrics are included as extra columns. Processes watched only in the Overview keep just a short sparkline, so they are not exported (the completion message lists them); open their detailed tab to record full history. The same export is available from the command line: <i>python export.py session.pmts -o session.csv</i>.</li>"
             "    <li><b>Export to Image:</b> Right-click on the plot and select <i>Export</i> to save the plot as an image file (e.g., PNG).</li>"
-            "    <li><b>Export to CSV:</b> Use the <i>Export to CSV</i> option in the context menu to save the data as a CSV file.</li>"
+            "    <li><b>Export to CSV:</b> The <i>Export to CSV</i> option in the plot context menu saves only the data currently shown in that plot.</li>"
             "  </ul>"
             "</ul>"
             "<h3>Notes:</h3>"
@@ -376,48 +1239,42 @@ class MainWindow(QMainWindow):
 
         QMessageBox.information(self, "User Guide", guide_text)
 
-    def find_process_by_name(self, target_name):
-        """Tìm process dựa trên tên (không phân biệt hoa thường)."""
-        target_name_lower = target_name.lower()
-        for proc in psutil.process_iter(['pid', 'name']):
+    def add_process_dialog(self, tree=False):
+        """
+        Hộp thoại chọn process (lọc theo tên/cmdline/user, chọn được nhiều process), mỗi process
+        được chọn mở một tab. tree=True: mặc định theo dõi cả cây process.
+        """
+        if self.process_index is None:
+            self.process_index = ProcessIndex()
+        self.process_index.start()  # Làm mới dần trong lúc hộp thoại mở
+        exclude = set(self.monitored_processes) | {os.getpid()}
+        dialog = ProcessPickerDialog(self.process_index, exclude, tree, self)
+        try:
+            accepted = dialog.exec() == QDialog.DialogCode.Accepted
+        finally:
+            self.process_index.stop()
+        if not accepted:
+            return
+
+        tree = dialog.tree_checkbox.isChecked()
+        gone = []
+        for pid in dialog.selected_pids():
             try:
-                if target_name_lower in proc.info['name'].lower() and proc.pid not in self.monitored_processes:
-                    return proc
+                process = psutil.Process(pid)
+                process.name()
             except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                gone.append(str(pid))
                 continue
-        return None
-
-    def add_process_dialog(self):
-        """Hiển thị hộp thoại yêu cầu người dùng nhập tên process."""
-        process_name, ok = QInputDialog.getText(self, "Add Process", "Enter process name:")
-
-        if ok and process_name:
-            process = self.find_process_by_name(process_name)
-            if process:
-                self.add_process_tab(process)
-            else:
-                already_monitored_pid = None
-                for pid, data in self.monitored_processes.items():
-                     if 'tab' in data and process_name.lower() in data['tab'].process_name.lower():
-                         already_monitored_pid = pid
-                         break
-
-                if already_monitored_pid is not None:
-                     QMessageBox.information(self, "Process Already Monitored",
-                                           f"Process '{self.monitored_processes[already_monitored_pid]['tab'].process_name}' (PID: {already_monitored_pid}) matching '{process_name}' is already being monitored.")
-                     if 'tab_index' in self.monitored_processes[already_monitored_pid]:
-                         tab_index = self.monitored_processes[already_monitored_pid]['tab_index']
-                         if 0 <= tab_index < self.tab_widget.count():
-                             self.tab_widget.setCurrentIndex(tab_index)
-                else:
-                    QMessageBox.warning(self, "Process Not Found",
-                                        f"No running process found matching '{process_name}' that isn't already monitored.")
-        elif ok and not process_name:
-             QMessageBox.warning(self, "Input Error", "Process name cannot be empty.")
-
-
-    def add_process_tab(self, process):
-        """Tạo tab mới cho process được tìm thấy."""
+            self.add_process_tab(process, tree=tree)
+        if gone:
+            QMessageBox.warning(self, "Process Not Found",
+                                f"These processes have exited and were not added: PID {', '.join(gone)}.")
+
+    def add_process_tab(self, process, tree=False, rule_id=None):
+        """
+        Tạo tab mới cho process được tìm thấy (tree=True: gộp cả các process con cháu).
+        rule_id: luật auto-attach mà tab sẽ đi theo khi process khởi động lại.
+        """
         pid = process.pid
         process_name = process.name()
 
@@ -425,49 +1282,419 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "Already Monitoring", f"Process '{process_name}' (PID: {pid}) is already being monitored.")
             return
 
-        tab_content = ProcessTabWidget(pid, process_name)
-        worker = ProcessMonitorWorker(pid, process, self.update_interval_ms)
+        tab_content = ProcessTabWidget(pid, process_name, tree=tree)
+        if rule_id is not None:
+            tab_content.rule_id = rule_id
+            self.rule_tabs[rule_id] = tab_content
+
+        tab_title = f"{process_name} ({pid}) [tree]" if tree else f"{process_name} ({pid})"
+        tab_index = self._add_tab(tab_content, tab_title)
+
+        self.monitored_processes[pid] = {
+            'tab': tab_content,
+            'tab_index': tab_index,
+            'overview': False  # Đóng tab thì dừng theo dõi
+        }
+        self._update_tab_indices()
+        self.overview.model.add_processes([(pid, f"{process_name} [tree]" if tree else process_name,
+                                            tab_content.start_time)])
+
+        # Việc khởi tạo diễn ra trên thread lấy mẫu; nếu lỗi, tab sẽ nhận process_error
+        if tree:
+            self.monitor_worker.add_process_tree(pid, process)
+        else:
+            self.monitor_worker.add_process(pid, process)
 
-        # Kết nối tín hiệu, sử dụng lambda để khớp tham số slot
-        worker.data_updated.connect(lambda p, ts, cpu, ram: tab_content.update_data(ts, cpu, ram))
-        worker.process_terminated.connect(self.handle_process_terminated)
-        worker.process_error.connect(self.handle_process_error)
 
-        # Chỉ thêm tab và lưu thông tin nếu worker được khởi tạo thành công
-        if worker.timer is not None:  # Kiểm tra xem timer có được tạo không (tức là ko lỗi ngay)
-            if self.tab_widget.indexOf(self.placeholder_widget) != -1:
-                self.tab_widget.removeTab(self.tab_widget.indexOf(self.placeholder_widget))
-                self.tab_widget.tabBar().setVisible(True)  # Show the tab bar when a process is added
+    def _add_tab(self, widget, title, index=-1):
+        """Thêm tab (ẩn trang Welcome nếu đang hiển thị) và chuyển sang tab đó."""
+        if self.tab_widget.indexOf(self.placeholder_widget) != -1:
+            self.tab_widget.removeTab(self.tab_widget.indexOf(self.placeholder_widget))
+            self.tab_widget.tabBar().setVisible(True)  # Show the tab bar when a process is added
 
-            tab_index = self.tab_widget.addTab(tab_content, f"{process_name} ({pid})")
-            self.tab_widget.setCurrentIndex(tab_index)
+        tab_index = self.tab_widget.insertTab(index, widget, title)
+        self.tab_widget.setCurrentIndex(tab_index)
+        return tab_index
 
-            self.monitored_processes[pid] = {
-                'worker': worker,
-                'tab': tab_content,
-                'tab_index': tab_index
-            }
+    def show_overview(self):
+        """Hiện tab Overview (luôn là tab đầu tiên, không đóng được)."""
+        if self.tab_widget.indexOf(self.overview) == -1:
+            self._add_tab(self.overview, "Overview", 0)
+            self.tab_widget.tabBar().setTabButton(0, QTabBar.ButtonPosition.RightSide, None)
             self._update_tab_indices()
-        else:
-            # Nếu worker bị lỗi ngay khi tạo, không thêm tab và báo lỗi
-            QMessageBox.critical(self, "Initialization Error", f"Could not start monitoring process '{process_name}' (PID: {pid}). It might have terminated or access was denied.")
+        self.tab_widget.setCurrentWidget(self.overview)
+
+    def show_health(self):
+        """Hiện tab Monitor Health (tạo khi mở lần đầu)."""
+        if self.health_tab is None:
+            self.health_tab = MonitorHealthWidget(self.health, self.monitor_worker.engine)
+        if self.tab_widget.indexOf(self.health_tab) == -1:
+            self._add_tab(self.health_tab, "Monitor Health")
+            self._update_tab_indices()
+        self.tab_widget.setCurrentWidget(self.health_tab)
+        self.health_tab.refresh()
+
+    def add_overview_dialog(self):
+        """Thêm mọi process có tên chứa chuỗi nhập vào (để trống: mọi process) vào bảng tổng quan."""
+        text, ok = QInputDialog.getText(self, "Add Processes to Overview",
+                                        "Add every process whose name contains\n(leave empty for all processes):")
+        if not ok:
+            return
+        text = text.strip().lower()
+        own_pid = os.getpid()
+        processes = []
+        for proc in psutil.process_iter(['pid', 'name']):
+            name = proc.info['name'] or ''
+            if proc.pid != own_pid and proc.pid not in self.monitored_processes and text in name.lower():
+                processes.append(proc)
+        if not processes:
+            QMessageBox.warning(self, "Process Not Found",
+                                f"No running process found matching '{text}' that isn't already monitored.")
+            return
+        self.add_overview_processes(processes)
+
+    def add_overview_processes(self, processes):
+        """Theo dõi các process chỉ trong bảng tổng quan, chưa tạo tab chi tiết."""
+        start_time = wall_clock()
+        entries = []
+        for proc in processes:
+            self.monitored_processes[proc.pid] = {'tab': None, 'tab_index': None, 'overview': True}
+            self.monitor_worker.add_process(proc.pid, proc)
+            entries.append((proc.pid, proc.info['name'], start_time))
+        self.overview.model.add_processes(entries)
+        self.show_overview()
+        print(f"Added {len(entries)} processes to the overview.")
+
+    def open_overview_details(self, pid):
+        """Mở (hoặc chuyển tới) tab chi tiết của một dòng trong bảng tổng quan."""
+        data = self.monitored_processes.get(pid)
+        row = self.overview.model.row_for(pid)
+        if data is None or row is None:
+            return
+        if data['tab'] is not None:
+            self.tab_widget.setCurrentWidget(data['tab'])
+            return
 
+        tab_content = ProcessTabWidget(pid, row.name, start_time=row.start_time)
+        tab_content.update_data(list(row.history))  # Nạp sẵn các mẫu gần nhất mà bảng còn giữ
+        if row.status != 'running':
+            tab_content.mark_terminated()
+        data['tab'] = tab_content
+        data['tab_index'] = self._add_tab(tab_content, f"{row.name} ({pid})")
+        self._update_tab_indices()
+        self._show_firing_alerts(tab_content, pid)
+        self.render_scheduler.mark_dirty(tab_content)
+
+    def stop_monitoring(self, pids):
+        """Dừng theo dõi các PID chọn trong bảng tổng quan (đóng luôn tab chi tiết nếu có)."""
+        for pid in pids:
+            data = self.monitored_processes.pop(pid, None)
+            if data is None:
+                continue
+            self.monitor_worker.remove_process(pid)
+            self.alerts.remove(pid)
+            tab = data['tab']
+            if tab is not None:
+                if self.rule_tabs.get(tab.rule_id) is tab:
+                    del self.rule_tabs[tab.rule_id]
+                    self.rule_pending.pop(tab.rule_id, None)
+                self.render_scheduler.discard(tab)
+                self.tab_widget.removeTab(self.tab_widget.indexOf(tab))
+        self.overview.model.remove_processes(pids)
+        self._update_tab_indices()
+        print(f"Stopped monitoring {len(pids)} processes.")
+
+    def connect_collector_dialog(self):
+        """Hỏi địa chỉ của một collector rồi kết nối tới nó."""
+        address, ok = QInputDialog.getText(self, "Connect to Collector",
+                                           "Collector address (host:port or unix:/path/to/socket):")
+        address = address.strip()
+        if ok and address:
+            self.connect_collector(address)
+
+    def connect_collector(self, address):
+        """Theo dõi các process của một collector trong một bảng tổng quan riêng."""
+        host = self.remote_hosts.get(address)
+        if host is not None:
+            self.tab_widget.setCurrentWidget(host['overview'])
+            return
+        try:
+            worker = RemoteHostWorker(address)
+        except ValueError as e:  # Địa chỉ sai dạng (port không phải số)
+            QMessageBox.warning(self, "Connect to Collector", f"Invalid collector address '{address}': {e}")
+            return
+        overview = OverviewWidget()
+        self.remote_hosts[address] = {'worker': worker, 'overview': overview, 'tabs': {}, 'hidden': set()}
+        worker.samples_ready.connect(lambda batch, emitted_at: self.handle_remote_samples(address, batch, emitted_at))
+        worker.process_terminated.connect(lambda pid: self.handle_remote_status(address, pid, 'terminated'))
+        worker.process_error.connect(lambda pid, message: self.handle_remote_status(address, pid, 'error', message))
+        worker.processes_received.connect(lambda processes: self.handle_remote_processes(address, processes))
+        worker.connection_changed.connect(lambda connected, message: self.handle_remote_connection(address, connected, message))
+        overview.open_requested.connect(lambda pid: self.open_remote_details(address, pid))
+        overview.stop_requested.connect(lambda pids: self.hide_remote_processes(address, pids))
+        self._add_tab(overview, f"{address} (connecting)")
+        print(f"Connecting to collector {address}...")
+
+    def handle_remote_processes(self, address, processes):
+        host = self.remote_hosts.get(address)
+        if host is not None:
+            host['overview'].model.add_processes([entry for entry in processes if entry[0] not in host['hidden']])
+
+    def handle_remote_samples(self, address, batch, emitted_at):
+        """Như handle_samples, cho bảng tổng quan và các tab của một collector."""
+        host = self.remote_hosts.get(address)
+        if host is None:
+            return
+        started = time.monotonic()
+        self.health.histograms['signal_delay'].record(started - emitted_at)
+        model = host['overview'].model
+        model.update_samples(batch)
+        alerts = []
+        for pid, samples in batch.items():
+            tab = host['tabs'].get(pid)
+            if tab is not None:
+                tab.update_data(samples)
+                self.render_scheduler.mark_dirty(tab)
+            row = model.row_for(pid)
+            if row is not None:
+                alerts += self.alerts.feed((address, pid), row.name, samples)
+        if alerts:
+            self.handle_alerts(alerts)
+        self.health.histograms['batch_handling'].record(time.monotonic() - started)
+
+    def handle_remote_status(self, address, pid, status, message=None):
+        host = self.remote_hosts.get(address)
+        if host is None:
+            return
+        host['overview'].model.set_status(pid, status, message)
+        self.alerts.remove((address, pid))
+        tab = host['tabs'].get(pid)
+        if tab is not None:
+            if status == 'error':
+                tab.mark_error(message)
+            else:
+                tab.mark_terminated()
+
+    def handle_remote_connection(self, address, connected, message):
+        """Trạng thái kết nối hiện trên tiêu đề tab của collector; client tự kết nối lại."""
+        host = self.remote_hosts.get(address)
+        if host is None:
+            return
+        print(f"Collector {address}: {message}")
+        index = self.tab_widget.indexOf(host['overview'])
+        if index != -1:
+            self.tab_widget.setTabText(index, address if connected else f"{address} (disconnected)")
+            self.tab_widget.setTabToolTip(index, message)
+
+    def open_remote_details(self, address, pid):
+        """Mở (hoặc chuyển tới) tab chi tiết của một process trên collector."""
+        host = self.remote_hosts.get(address)
+        row = host['overview'].model.row_for(pid) if host is not None else None
+        if row is None:
+            return
+        tab = host['tabs'].get(pid)
+        if tab is not None:
+            self.tab_widget.setCurrentWidget(tab)
+            return
+        tab = ProcessTabWidget(pid, row.name, start_time=row.start_time)
+        tab.host = address
+        tab.update_data(list(row.history))
+        if row.status != 'running':
+            tab.mark_terminated()
+        host['tabs'][pid] = tab
+        self._add_tab(tab, f"{row.name} ({pid}) @ {address}")
+        self._update_tab_indices()
+        self._show_firing_alerts(tab, (address, pid))
+        self.render_scheduler.mark_dirty(tab)
+
+    def hide_remote_processes(self, address, pids):
+        """Bỏ các dòng khỏi bảng của collector; collector vẫn tiếp tục lấy mẫu chúng."""
+        host = self.remote_hosts.get(address)
+        if host is None:
+            return
+        host['hidden'].update(pids)
+        for pid in pids:
+            self.alerts.remove((address, pid))
+            tab = host['tabs'].pop(pid, None)
+            if tab is not None:
+                self.render_scheduler.discard(tab)
+                self.tab_widget.removeTab(self.tab_widget.indexOf(tab))
+        host['overview'].model.remove_processes(pids)
+        self._update_tab_indices()
+
+    def disconnect_collector(self, address):
+        """Ngắt kết nối một collector và đóng các tab của nó."""
+        host = self.remote_hosts.pop(address, None)
+        if host is None:
+            return
+        host['worker'].stop()
+        model = host['overview'].model
+        for row in range(model.rowCount()):
+            self.alerts.remove((address, model.pid_at(row)))
+        for tab in host['tabs'].values():
+            self.render_scheduler.discard(tab)
+            self.tab_widget.removeTab(self.tab_widget.indexOf(tab))
+        self.tab_widget.removeTab(self.tab_widget.indexOf(host['overview']))
+        print(f"Disconnected from collector {address}.")
+
+    def open_recording_dialog(self):
+        """Mở file recording (ghi bằng record.py) thành các tab để phân tích offline."""
+        # Recording .pmts là một thư mục: chọn file manifest.json bên trong
+        path, _ = QFileDialog.getOpenFileName(self, "Open Recording", "",
+                                              "Recordings (*.csv manifest.json);;All files (*)")
+        if path:
+            self.open_recording(path)
+
+    def open_recording(self, path):
+        # Các module đọc recording dùng NumPy: chỉ nạp khi thực sự mở recording
+        from recording import read_recording
+        from tsreader import ArraySeries, is_timeseries_recording, open_timeseries
+        if os.path.basename(path) == MANIFEST_NAME:
+            path = os.path.dirname(path)  # Recording .pmts được đại diện bởi thư mục của nó
+        try:
+            if is_timeseries_recording(path):
+                series_list = open_timeseries(path)
+            else:
+                series_list = [ArraySeries.from_recorded(series) for series in read_recording(path)]
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.warning(self, "Open Recording", f"Could not read recording '{path}': {e}")
+            return
+        series_list = [series for series in series_list if len(series)]
+        if not series_list:
+            QMessageBox.information(self, "Open Recording", "The recording does not contain any samples.")
+            return
+
+        for series in series_list:
+            tab_content = RecordingTabWidget(series, path)
+            self._add_tab(tab_content, f"{series.name} ({series.pid}) [recording]")
+
+    def export_session_dialog(self):
+        """Xuất toàn bộ lịch sử của mọi tab ra CSV hoặc định dạng columnar (.pmcol)."""
+        if self._export_job is not None:
+            QMessageBox.information(self, "Export Session", "An export is already running.")
+            return
+        from export import SeriesSource, StoreSource
+        sources = []
+        for index in range(self.tab_widget.count()):
+            widget = self.tab_widget.widget(index)
+            if isinstance(widget, RecordingTabWidget):
+                sources.append(SeriesSource(widget.series))
+            elif isinstance(widget, ProcessTabWidget) and len(widget.history):
+                key = f"rule:{widget.rule_id}" if widget.rule_id is not None else f"pid:{widget.pid}"
+                sources.append(StoreSource(widget.history, key, widget.process_name, widget.pid, widget.start_time,
+                                           widget.metric_history))
+        # Process chỉ có trong bảng tổng quan chỉ giữ vài mẫu cho sparkline, không có lịch sử để xuất
+        skipped = []
+        for pid, data in self.monitored_processes.items():
+            row = self.overview.model.row_for(pid) if data['tab'] is None else None
+            if row is not None:
+                skipped.append(f"{row.name} ({pid})")
+        note = ""
+        if skipped:
+            shown = ", ".join(skipped[:10]) + (f" and {len(skipped) - 10} more" if len(skipped) > 10 else "")
+            note = (f"{len(skipped)} processes monitored only in the Overview have no recorded history and "
+                    f"were not exported: {shown}. Open their detailed tabs to record full history.")
+        if not sources:
+            QMessageBox.information(self, "Export Session",
+                                    "There is no data to export." + (f"\n{note}" if note else ""))
+            return
+
+        path, selected_filter = QFileDialog.getSaveFileName(self, "Export Session", "session.csv",
+                                                            "CSV (*.csv);;Columnar binary (*.pmcol)")
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += '.pmcol' if 'pmcol' in selected_filter else '.csv'
+        self.start_export(sources, path, note)
+
+    def start_export(self, sources, path, note=""):
+        """Chạy export_session theo từng lượt ngắn trên GUI thread để giao diện không bị treo."""
+        progress = QProgressDialog("Exporting session...", "Cancel", 0, 1000, self)
+        progress.setWindowTitle("Export Session")
+        progress.setMinimumDuration(500)
+        progress.canceled.connect(self._cancel_export)
+        from export import export_session
+        timer = QTimer(self)
+        timer.timeout.connect(self._export_step)
+        self._export_job = (export_session(sources, path, chunk_rows=EXPORT_CHUNK_ROWS), progress, timer, sources, path,
+                            note)
+        timer.start(0)
+
+    def _export_step(self):
+        generator, progress, timer, sources, path, note = self._export_job
+        deadline = time.monotonic() + EXPORT_STEP_MS / 1000
+        try:
+            while time.monotonic() < deadline:
+                done, total = next(generator)
+                progress.setValue(done * 1000 // max(total, 1))
+        except StopIteration:
+            self._finish_export()
+            lost = sum(source.lost for source in sources)
+            message = f"Session exported to '{path}'."
+            if lost:
+                message += f"\n{lost} of the oldest samples were dropped from history during the export."
+            if note:
+                message += f"\n{note}"
+            QMessageBox.information(self, "Export Session", message)
+        except Exception as e:
+            # Lỗi không được thoát khỏi slot của Qt (PyQt6 sẽ dừng cả chương trình); file tạm đã bị xóa
+            self._finish_export()
+            QMessageBox.warning(self, "Export Session", f"Could not export to '{path}': {e}")
+
+    def _cancel_export(self):
+        if self._export_job is not None:
+            generator, _, _, _, path, _ = self._export_job
+            self._finish_export()
+            generator.close()  # File tạm bị xóa
+            print(f"Export to {path} canceled.")
+
+    def _finish_export(self):
+        _, progress, timer, _, _, _ = self._export_job
+        self._export_job = None
+        timer.stop()
+        progress.canceled.disconnect(self._cancel_export)
+        progress.close()
 
     def close_tab(self, index):
         """Xử lý khi người dùng nhấn nút đóng tab."""
         widget_to_close = self.tab_widget.widget(index)
-        if isinstance(widget_to_close, ProcessTabWidget):
+        remote_overview = next((address for address, host in self.remote_hosts.items()
+                                if host['overview'] is widget_to_close), None)
+        if remote_overview is not None:
+            self.disconnect_collector(remote_overview)
+            self._update_tab_indices()
+        elif isinstance(widget_to_close, ProcessTabWidget) and widget_to_close.host is not None:
+            # Tab của process trên collector: chỉ đóng tab, dòng trong bảng của collector vẫn còn
+            host = self.remote_hosts.get(widget_to_close.host)
+            if host is not None:
+                host['tabs'].pop(widget_to_close.pid, None)
+            self.render_scheduler.discard(widget_to_close)
+            self.tab_widget.removeTab(index)
+            self._update_tab_indices()
+        elif isinstance(widget_to_close, ProcessTabWidget):
+            if self.rule_tabs.get(widget_to_close.rule_id) is widget_to_close:
+                del self.rule_tabs[widget_to_close.rule_id]
+                self.rule_pending.pop(widget_to_close.rule_id, None)
             pid_to_remove = widget_to_close.pid
-            if pid_to_remove in self.monitored_processes:
-                # Lấy worker từ dict trước khi xóa entry
-                worker_to_stop = self.monitored_processes[pid_to_remove].get('worker')
-                if worker_to_stop:
-                    worker_to_stop.stop()
+            data = self.monitored_processes.get(pid_to_remove)
+            if data is not None and data['overview'] and data['tab'] is widget_to_close:
+                # Process thêm từ bảng tổng quan: chỉ đóng tab chi tiết, vẫn tiếp tục theo dõi
+                data['tab'] = None
+                data['tab_index'] = None
+                self.render_scheduler.discard(widget_to_close)
+            elif data is not None:
+                self.monitor_worker.remove_process(pid_to_remove)
+                self.alerts.remove(pid_to_remove)
+                self.render_scheduler.discard(widget_to_close)
                 del self.monitored_processes[pid_to_remove]
+                self.overview.model.remove_processes([pid_to_remove])
                 print(f"Stopped monitoring process PID: {pid_to_remove}")
 
             self.tab_widget.removeTab(index)
             self._update_tab_indices()  # Cập nhật index sau khi xóa
+        elif widget_to_close is self.health_tab:
+            self.tab_widget.removeTab(index)
+            self._update_tab_indices()
 
         # Show the placeholder widget if no tabs are left
         if self.tab_widget.count() == 0:
@@ -479,6 +1706,8 @@ class MainWindow(QMainWindow):
         pids_to_remove = []
         for pid, data in self.monitored_processes.items():
             widget = data.get('tab')
+            if widget is None and data.get('overview'):
+                continue  # Chỉ có dòng trong bảng tổng quan, chưa mở tab chi tiết
             if widget:
                 try:
                     current_index = self.tab_widget.indexOf(widget)
@@ -499,21 +1728,42 @@ class MainWindow(QMainWindow):
         # Xóa các entry không hợp lệ sau khi duyệt xong
         for pid in pids_to_remove:
             if pid in self.monitored_processes:
-                 worker_to_stop = self.monitored_processes[pid].get('worker')
-                 if worker_to_stop:
-                     worker_to_stop.stop() # Đảm bảo worker dừng lại
+                 self.monitor_worker.remove_process(pid) # Đảm bảo PID không còn được lấy mẫu
                  del self.monitored_processes[pid]
 
 
+    def handle_samples(self, batch, emitted_at):
+        """Phân phối batch dữ liệu của một tick tới bảng tổng quan và các tab tương ứng."""
+        started = time.monotonic()
+        self.health.histograms['signal_delay'].record(started - emitted_at)
+        self.overview.model.update_samples(batch)
+        alerts = []
+        for pid, samples in batch.items():
+            data = self.monitored_processes.get(pid)
+            if data and data.get('tab'):
+                data['tab'].update_data(samples)
+                self.render_scheduler.mark_dirty(data['tab'])
+                alerts += self.alerts.feed(pid, data['tab'].process_name, samples)
+            elif data:
+                row = self.overview.model.row_for(pid)
+                alerts += self.alerts.feed(pid, row.name if row else "?", samples)
+        if alerts:
+            self.handle_alerts(alerts)
+        self.health.histograms['batch_handling'].record(time.monotonic() - started)
+
     def handle_process_terminated(self, pid):
         """Xử lý khi nhận được tín hiệu process đã kết thúc."""
         print(f"Process PID {pid} terminated.")
+        self.alerts.remove(pid)  # PID có thể được dùng lại cho process khác
         if pid in self.monitored_processes:
             # Kiểm tra xem 'tab' có tồn tại không trước khi truy cập
             tab = self.monitored_processes[pid].get('tab')
             if tab:
                 tab.mark_terminated()
-            # Worker đã tự dừng
+            self.overview.model.set_status(pid, 'terminated')
+            # Engine đã tự bỏ PID này khỏi danh sách lấy mẫu
+            if tab:
+                self._claim_rule_pending(tab)
 
     def handle_process_error(self, pid, error_message):
         """Xử lý khi nhận được tín hiệu lỗi từ worker."""
@@ -523,22 +1773,187 @@ class MainWindow(QMainWindow):
             tab = self.monitored_processes[pid].get('tab')
             if tab:
                 tab.mark_error(error_message)
-            # Worker thường đã tự dừng khi phát hiện lỗi
+            self.overview.model.set_status(pid, 'error', error_message)
+            # Engine thường đã tự bỏ PID này khi phát hiện lỗi
+            if tab:
+                self._claim_rule_pending(tab)
+
+    def _claim_rule_pending(self, tab):
+        """Tab theo luật vừa dừng: gắn ngay process mới của luật đã khớp trong lúc tab còn chạy."""
+        if self.rule_tabs.get(tab.rule_id) is tab and tab.rule_id in self.rule_pending:
+            self.handle_rule_match(tab.rule_id, self.rule_pending.pop(tab.rule_id))
+
+    def handle_rule_match(self, rule_id, pid):
+        """Một process khớp luật auto-attach: tạo tab mới hoặc gắn lại vào tab cũ đã kết thúc."""
+        rule = next((rule for rule in self.rules if rule.rule_id == rule_id), None)
+        if rule is None or pid in self.monitored_processes:
+            return
+        tab = self.rule_tabs.get(rule_id)
+        if tab is not None and not tab.terminated:
+            # Tab vẫn đang theo dõi process cũ của luật này; process cũ có thể vừa kết thúc
+            # mà tín hiệu chưa tới, nên giữ PID này lại để gắn khi tab kết thúc
+            self.rule_pending[rule_id] = pid
+            return
+
+        try:
+            process = psutil.Process(pid)
+            process_name = process.name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return
+
+        if tab is None:
+            self.add_process_tab(process, tree=rule.tree, rule_id=rule_id)
+            return
+
+        # Gắn lại: cùng tab, cùng chuỗi dữ liệu, chỉ đổi PID
+        old_pid = tab.pid
+        self.monitor_worker.remove_process(old_pid)
+        self.monitored_processes.pop(old_pid, None)
+        self.alerts.remove(old_pid)
+        tab.reattach(pid)
+        self._set_tab_alert_title(tab, False)
+        tab_index = self.tab_widget.indexOf(tab)
+        suffix = " [tree]" if tab.tree else ""
+        self.tab_widget.setTabText(tab_index, f"{process_name} ({pid}){suffix}")
+        self.monitored_processes[pid] = {'tab': tab, 'tab_index': tab_index, 'overview': False}
+        self.overview.model.reattach(old_pid, pid)
+        if tab.tree:
+            self.monitor_worker.add_process_tree(pid, process)
+        else:
+            self.monitor_worker.add_process(pid, process)
+        print(f"Rule {rule_id}: reattached tab from PID {old_pid} to PID {pid}.")
+
+    def handle_alerts(self, alerts):
+        """Cảnh báo mới: ghi log, đánh dấu trên đồ thị và tiêu đề tab, hiện thông báo desktop."""
+        for alert in alerts:
+            print(alert.message())
+            tab = self._tab_for_alert_key(alert.key)
+            if tab is not None:
+                tab.add_alert_marker(alert)
+                self._set_tab_alert_title(tab, bool(self.alerts.firing(alert.key)))
+        try:
+            self.alert_log.write(alerts)
+        except OSError as e:
+            print(f"Warning: could not write alert log: {e}")
+
+        firing = [alert for alert in alerts if alert.firing]
+        if not firing:
+            return
+        # Một thông báo cho cả batch để hàng trăm process cùng vượt ngưỡng không gây bão thông báo
+        title = "Process Monitor alert" if len(firing) == 1 else f"Process Monitor: {len(firing)} alerts"
+        text = "\n".join(alert.message() for alert in firing[:3])
+        if len(firing) > 3:
+            text += f"\n... and {len(firing) - 3} more (see {self.alert_log.path})"
+        if self.tray_icon is None and QSystemTrayIcon.isSystemTrayAvailable():
+            self.tray_icon = QSystemTrayIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MessageBoxWarning), self)
+            self.tray_icon.show()
+        if self.tray_icon is not None:
+            self.tray_icon.showMessage(title, text, QSystemTrayIcon.MessageIcon.Warning)
+        self.statusBar().showMessage(firing[-1].message(), 10000)
+
+    def _tab_for_alert_key(self, key):
+        """Tab chi tiết của một key cảnh báo (PID, hoặc (địa chỉ collector, PID)), nếu đang mở."""
+        if isinstance(key, tuple):
+            host = self.remote_hosts.get(key[0])
+            return host['tabs'].get(key[1]) if host is not None else None
+        data = self.monitored_processes.get(key)
+        return data['tab'] if data is not None else None
+
+    def _set_tab_alert_title(self, tab, alerting):
+        index = self.tab_widget.indexOf(tab)
+        if index == -1:
+            return
+        title = self.tab_widget.tabText(index).removeprefix(ALERT_TITLE_PREFIX)
+        self.tab_widget.setTabText(index, ALERT_TITLE_PREFIX + title if alerting else title)
+
+    def _show_firing_alerts(self, tab, key):
+        """Tab vừa mở cho process đang có cảnh báo: hiện luôn các cảnh báo đó."""
+        firing = self.alerts.firing(key)
+        for alert in firing:
+            tab.add_alert_marker(alert)
+        self._set_tab_alert_title(tab, bool(firing))
+
+    def alert_rules_dialog(self):
+        """Mở hộp thoại quản lý luật cảnh báo."""
+        dialog = AlertRulesDialog(self.alert_rules, self)
+        if dialog.exec():
+            self.alert_rules = dialog.rules
+            try:
+                save_alert_rules(self.alert_rules)
+            except OSError as e:
+                QMessageBox.warning(self, "Alert Rules", f"Could not save alert rules: {e}")
+            self.alerts.set_rules(self.alert_rules)
+            # Cảnh báo của luật đã xóa không còn: cập nhật lại tiêu đề các tab
+            for key in [*self.monitored_processes, *((address, pid) for address, host in self.remote_hosts.items()
+                                                     for pid in host['tabs'])]:
+                tab = self._tab_for_alert_key(key)
+                if tab is not None:
+                    self._set_tab_alert_title(tab, bool(self.alerts.firing(key)))
+
+    def add_rule_dialog(self):
+        """Mở hộp thoại tạo luật auto-attach mới."""
+        dialog = RuleDialog(self)
+        if dialog.exec():
+            self.rules.append(dialog.get_rule(next_rule_id(self.rules)))
+            self._apply_rules()
+
+    def manage_rules_dialog(self):
+        """Mở hộp thoại quản lý (xóa) luật auto-attach."""
+        dialog = ManageRulesDialog(self.rules, self)
+        if dialog.exec():
+            self.rules = dialog.rules
+            remaining = {rule.rule_id for rule in self.rules}
+            for rule_id in list(self.rule_tabs):
+                if rule_id not in remaining:
+                    self.rule_tabs[rule_id].rule_id = None
+                    del self.rule_tabs[rule_id]
+                    self.rule_pending.pop(rule_id, None)
+            self._apply_rules()
+
+    def _apply_rules(self):
+        """Lưu luật ra file và gửi cho engine."""
+        try:
+            save_rules(self.rules)
+        except OSError as e:
+            QMessageBox.warning(self, "Rules", f"Could not save rules: {e}")
+        self.monitor_worker.set_rules(self.rules)
 
     def set_update_interval_dialog(self):
         """Mở hộp thoại để đặt khoảng thời gian cập nhật."""
-        current_interval_sec = self.update_interval_ms // 1000
-        dialog = IntervalDialog(current_interval_sec, self)
+        dialog = IntervalDialog(self.update_interval_ms, self)
+        if dialog.exec():
+            self.update_interval_ms = dialog.get_interval_ms()
+            print(f"Set update interval to {self.update_interval_ms} ms.")
+            self.monitor_worker.set_interval(self.update_interval_ms)
+            self.update_timing_status()
+
+    def set_metrics_dialog(self):
+        """Chọn các metric mở rộng (I/O, context switch, FD, thread, PSS/USS)."""
+        dialog = MetricsDialog(self.enabled_metrics, self)
         if dialog.exec():
-            new_interval_sec = dialog.get_interval_sec()
-            self.update_interval_ms = new_interval_sec * 1000
-            print(f"Set update interval to {new_interval_sec} seconds.")
-            for pid_data in self.monitored_processes.values():
-                # Kiểm tra cả tab và worker trước khi cập nhật interval
-                tab = pid_data.get('tab')
-                worker = pid_data.get('worker')
-                if tab and not tab.terminated and worker:
-                    worker.set_interval(self.update_interval_ms)
+            self.enabled_metrics = dialog.get_metrics()
+            print(f"Extended metrics: {', '.join(self.enabled_metrics) or 'none'}")
+            self.monitor_worker.set_metrics(self.enabled_metrics)
+
+    def update_health(self):
+        """Đo CPU/RSS của chính monitor (mỗi giây) và làm mới tab Monitor Health nếu đang xem."""
+        self.health.sample_usage()
+        if self.health_tab is not None and self.health_tab.isVisible():
+            self.health_tab.refresh()
+
+    def update_timing_status(self):
+        """Hiển thị chu kỳ lấy mẫu thực tế và jitter của engine trên thanh trạng thái."""
+        summary = self.monitor_worker.engine.timing.summary
+        text = f"Interval: {self.update_interval_ms} ms"
+        if summary is not None and self.monitored_processes:
+            text += (f" | jitter avg {summary['jitter_mean_ms']:.2f} ms, p99 {summary['jitter_p99_ms']:.2f} ms"
+                     f" | sampling cost {summary['cost_mean_ms']:.2f} ms/tick | skipped ticks {summary['skipped']}")
+            # Chế độ phân mảnh: tải (chi phí/chu kỳ) và độ trễ chuyển batch của từng shard
+            for stats in getattr(self.monitor_worker.engine, 'shard_stats', ()):
+                if 'load' in stats:
+                    text += (f" | shard {stats['shard']}: {stats['pids']} PIDs, load {stats['load'] * 100:.0f}%,"
+                             f" lag {stats.get('delivery_ms', 0.0):.1f} ms")
+        self.timing_label.setText(text)
 
     def closeEvent(self, event: QCloseEvent):
         """Được gọi khi cửa sổ chính sắp đóng."""
@@ -549,11 +1964,10 @@ class MainWindow(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
             print("Stopping all monitors...")
-            for pid_data in self.monitored_processes.values():
-                 # Kiểm tra worker tồn tại trước khi dừng
-                worker = pid_data.get('worker')
-                if worker:
-                    worker.stop()
+            self._cancel_export()
+            self.monitor_worker.stop()
+            for host in self.remote_hosts.values():
+                host['worker'].stop()
             print("Monitors stopped. Exiting.")
             event.accept()
         else:
@@ -561,10 +1975,27 @@ class MainWindow(QMainWindow):
 
 # --- Chạy ứng dụng ---
 if __name__ == "__main__":
-    # Bật antialiasing cho đồ thị mượt hơn (tùy chọn)
-    pg.setConfigOptions(antialias=True)
-
-    app = QApplication(sys.argv)
-    main_window = MainWindow()
+    parser = argparse.ArgumentParser(description="Process Monitor")
+    parser.add_argument("--backend", choices=["auto", *BACKENDS], default="auto",
+                        help="Backend lấy mẫu (mặc định: procfs trên Linux, psutil trên hệ điều hành khác)")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="Chia việc lấy mẫu cho N process worker (cho hàng nghìn PID; mặc định: 0, không chia)")
+    parser.add_argument("--connect", action="append", default=[], metavar="ADDRESS",
+                        help="Kết nối tới collector (host:port hoặc unix:/đường/dẫn), có thể lặp lại")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="In 'startup-ready' khi cửa sổ chính đã hiện rồi thoát (benchmarks/bench_startup.py)")
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication([sys.argv[0], *qt_args])
+    main_window = MainWindow(args.backend, args.shards)
+    for address in args.connect:
+        main_window.connect_collector(address)
+    if args.measure_startup:
+        # Chạy sau khi event loop đã xử lý lượt vẽ đầu tiên của cửa sổ
+        def report_startup():
+            print(f"startup-ready plotting_loaded={pg is not None}", flush=True)
+            main_window.monitor_worker.stop()
+            os._exit(0)  # Bỏ qua hộp thoại xác nhận thoát
+        QTimer.singleShot(0, report_startup)
     sys.exit(app.exec())
 # --- Kết thúc ---
\ No newline at end of file
@@ -0,0 +1,431 @@
+"""
+Engine lấy mẫu dùng chung cho tất cả các PID đang được theo dõi.
+
+Engine chạy trên một thread riêng (không phải GUI thread). Mỗi tick nó duyệt
+toàn bộ PID trong một lượt thông qua một backend (xem backends.py), rồi gọi
+callback on_batch đúng một lần với batch {pid: (timestamp, cpu_percent_irix, memory_mb)}.
+
+Ngoài các PID đơn lẻ, engine còn theo dõi được cả cây process (một PID gốc cùng mọi
+con cháu). Với cây, mẫu trong batch là tổng CPU/RAM của cả cây kèm phần tử thứ tư
+{'children': [(pid, name, cpu, ram), ...], 'members': số process} chứa top-N process
+tốn CPU nhất. Mỗi PID chỉ được đọc một lần mỗi tick dù thuộc nhiều nhóm.
+
+Khi có metric mở rộng được bật (metrics.py), mẫu của các PID đơn lẻ có thêm phần tử thứ tư
+{'metrics': {trường: giá trị}} ở những tick metric được đọc.
+
+Engine cũng kiểm tra các luật auto-attach (rules.py) trên bảng process: khi có luật,
+mỗi tick chỉ các PID mới xuất hiện được so khớp, và on_rule_match(rule_id, pid) được gọi
+cho mỗi PID khớp, sau khi các process kết thúc trong tick đã được báo qua on_terminated.
+Việc gắn PID đó vào tab nào do phía gọi quyết định.
+
+Process kết thúc được phát hiện theo sự kiện khi có thể (lifecycle.py): mỗi PID có một
+pidfd, và on_terminated được gọi ngay khi process kết thúc thay vì đợi tới tick sau. Khi
+cần bảng process (cây, luật) và có quyền mở proc connector, bảng được cập nhật theo sự kiện
+fork/exec/exit thay vì liệt kê /proc mỗi tick. Không có hai cơ chế này thì engine polling như cũ.
+
+Lịch tick bám theo đồng hồ đơn điệu với các mốc cố định (tick thứ n ở start + n * interval),
+nên chu kỳ không bị trôi kể cả ở chế độ tần số cao (10–100 ms). Độ lệch giữa mốc theo lịch và
+lúc thực sự lấy mẫu (jitter), thời gian của mỗi lượt lấy mẫu và số tick bị bỏ do quá tải
+được ghi lại trong engine.timing, cùng histogram của chúng và của thời gian đọc từng PID
+(health.Histogram) cho tab Monitor Health.
+
+Module này không import Qt để có thể dùng lại ở các chế độ không có giao diện.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+import psutil
+
+from backends import create_backend, wall_clock
+from health import Histogram
+from lifecycle import LifecycleWatcher, pidfd_supported
+from metrics import MetricCollector
+from proctable import ProcessTable, ProcessTree
+
+TREE_TOP_N = 10  # Số process con được gửi kèm mẫu của một cây
+TIMING_WINDOW = 1000  # Số tick gần nhất dùng để tính thống kê jitter
+TIMING_PUBLISH_S = 1.0  # Chu kỳ cập nhật TickTiming.summary
+
+
+class TickTiming:
+    """
+    Thống kê lịch tick của engine: jitter (lấy mẫu muộn bao nhiêu so với mốc theo lịch),
+    thời gian mỗi lượt lấy mẫu và số tick bị bỏ vì lượt trước chạy quá chu kỳ.
+
+    Được cập nhật trên thread lấy mẫu; summary là một dict mới được gán định kỳ nên các
+    thread khác đọc được mà không cần khóa.
+    """
+
+    def __init__(self, window=TIMING_WINDOW):
+        self.ticks = 0
+        self.skipped = 0
+        self._jitter = deque(maxlen=window)
+        self._cost = deque(maxlen=window)
+        self._last_publish = time.monotonic()
+        self.summary = None
+        # Histogram từ lúc bắt đầu (không giới hạn cửa sổ); sample_latency do engine ghi
+        self.histograms = {name: Histogram() for name in ('tick_jitter', 'tick_cost', 'sample_latency')}
+
+    def record(self, jitter_s, cost_s):
+        self.ticks += 1
+        self._jitter.append(jitter_s)
+        self._cost.append(cost_s)
+        self.histograms['tick_jitter'].record(jitter_s)
+        self.histograms['tick_cost'].record(cost_s)
+        now = time.monotonic()
+        if now - self._last_publish >= TIMING_PUBLISH_S:
+            self._last_publish = now
+            self.publish()
+
+    def publish(self):
+        if not self._jitter:
+            return
+        jitter = sorted(self._jitter)
+        self.summary = {
+            'ticks': self.ticks,
+            'skipped': self.skipped,
+            'jitter_mean_ms': sum(jitter) / len(jitter) * 1000,
+            'jitter_p99_ms': jitter[min(len(jitter) - 1, int(len(jitter) * 0.99))] * 1000,
+            'jitter_max_ms': jitter[-1] * 1000,
+            'cost_mean_ms': sum(self._cost) / len(self._cost) * 1000,
+        }
+
+    def reset(self):
+        self.ticks = 0
+        self.skipped = 0
+        self._jitter.clear()
+        self._cost.clear()
+        # Jitter/chi phí ở chu kỳ cũ không so sánh được với chu kỳ mới
+        self.histograms['tick_jitter'].reset()
+        self.histograms['tick_cost'].reset()
+
+
+class SamplingEngine:
+    """Một thread lấy mẫu duy nhất cho mọi PID."""
+
+    def __init__(self, interval_s, on_batch, on_terminated=None, on_error=None, backend=None,
+                 on_rule_match=None):
+        self._interval_s = interval_s
+        self._on_batch = on_batch
+        self._on_terminated = on_terminated or (lambda pid: None)
+        self._on_error = on_error or (lambda pid, message: None)
+        self._on_rule_match = on_rule_match or (lambda rule_id, pid: None)
+
+        # Backend chỉ được truy cập từ thread lấy mẫu
+        self.backend = backend if backend is not None else create_backend()
+        self._pids = {}  # PID theo dõi đơn lẻ, dùng dict làm tập có thứ tự
+        self._trees = {}  # PID gốc -> ProcessTree
+        self._refs = {}  # PID -> số nhóm đang dùng handle của backend
+        self._rules = []  # Các AttachRule đang có hiệu lực
+        self.process_table = None  # Chỉ tạo khi cần (theo dõi cây process hoặc có luật)
+        self.metrics = MetricCollector()  # Metric mở rộng, mặc định không bật metric nào
+        self.lifecycle = None  # LifecycleWatcher, tạo khi thread lấy mẫu bắt đầu (nếu có pidfd)
+        self._pending = deque()  # Lệnh add/remove từ các thread khác, deque.append là thread-safe
+
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._interval_changed = False
+        self._thread = None
+        self.timing = TickTiming()
+
+    def start(self):
+        """Khởi động thread lấy mẫu (không chặn)."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="SamplingEngine", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Yêu cầu thread dừng lại. Không chờ thread kết thúc để không chặn event loop."""
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def add(self, pid, process=None):
+        """Thêm PID vào danh sách lấy mẫu. Việc khởi tạo cpu_percent diễn ra trên thread lấy mẫu."""
+        self._pending.append(('add', pid, process))
+        self._wakeup.set()
+
+    def add_tree(self, pid, process=None):
+        """Theo dõi PID cùng toàn bộ con cháu của nó như một nhóm."""
+        self._pending.append(('add_tree', pid, process))
+        self._wakeup.set()
+
+    def set_rules(self, rules):
+        """
+        Thay toàn bộ danh sách luật auto-attach. Các process đang chạy được so khớp
+        một lần ngay khi nhận luật, sau đó chỉ so khớp các PID mới.
+        """
+        self._pending.append(('rules', None, list(rules)))
+        self._wakeup.set()
+
+    def set_metrics(self, names):
+        """Chọn các metric mở rộng (tên trong metrics.METRICS) đọc cho các PID đơn lẻ."""
+        self._pending.append(('metrics', None, list(names)))
+        self._wakeup.set()
+
+    def remove(self, pid):
+        """Bỏ PID (hoặc cây có gốc là PID) khỏi danh sách lấy mẫu."""
+        self._pending.append(('remove', pid, None))
+        self._wakeup.set()
+
+    def set_interval(self, interval_s):
+        """Thay đổi tần suất lấy mẫu, áp dụng ngay từ tick kế tiếp."""
+        self._interval_s = interval_s
+        self._interval_changed = True
+        self._wakeup.set()
+
+    def _exit_detected(self, pid):
+        # Gọi trên thread của LifecycleWatcher: chuyển cho thread lấy mẫu xử lý ngay
+        self._pending.append(('exited', pid, None))
+        self._wakeup.set()
+
+    def _run(self):
+        if pidfd_supported():
+            self.lifecycle = LifecycleWatcher(self._exit_detected)
+        next_tick = time.monotonic() + self._interval_s
+        while not self._stop_event.is_set():
+            # Chờ tới tick kế tiếp; các lệnh add/remove được xử lý ngay khi tới
+            while True:
+                timeout = next_tick - time.monotonic()
+                if timeout <= 0:
+                    break
+                if self._wakeup.wait(timeout):
+                    self._wakeup.clear()
+                    if self._stop_event.is_set():
+                        break
+                    self._apply_pending()
+                    if self._interval_changed:
+                        self._interval_changed = False
+                        self.timing.reset()
+                        next_tick = time.monotonic() + self._interval_s
+            if self._stop_event.is_set():
+                break
+
+            started = time.monotonic()
+            self._apply_pending()
+            batch = self._sample_all()
+            if batch and not self._stop_event.is_set():
+                self._on_batch(batch)
+            now = time.monotonic()
+            self.timing.record(started - next_tick, now - started)
+
+            # Lịch tick tính theo mốc cố định để các tick không bị trôi dần. Nếu lượt này chạy
+            # quá chu kỳ, bỏ qua các mốc đã lỡ nhưng vẫn giữ nguyên pha của lịch.
+            next_tick += self._interval_s
+            if next_tick < now:
+                missed = math.ceil((now - next_tick) / self._interval_s)
+                self.timing.skipped += missed
+                next_tick += missed * self._interval_s
+
+        self.backend.close_all()
+        if self.lifecycle is not None:
+            self.lifecycle.stop()
+
+    def _apply_pending(self):
+        while self._pending:
+            op, pid, process = self._pending.popleft()
+            if op == 'rules':
+                self._set_rules(process)
+                continue
+            if op == 'metrics':
+                self.metrics.set_enabled(process)
+                continue
+            if op == 'exited':
+                self._handle_exit(pid)
+                continue
+            if op == 'remove':
+                if pid in self._pids:
+                    del self._pids[pid]
+                    self._release(pid)
+                    self.metrics.close(pid)
+                tree = self._trees.pop(pid, None)
+                if tree is not None:
+                    for member in tree.members:
+                        self._release(member)
+                continue
+
+            try:
+                self._acquire(pid, process)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                self._on_error(pid, "Process không tồn tại hoặc không có quyền truy cập khi khởi tạo.")
+                continue
+
+            if op == 'add':
+                self._pids[pid] = None
+                self.metrics.open(pid, process)
+            else:
+                self._add_tree(pid)
+
+    def _handle_exit(self, pid):
+        """Process đã kết thúc (báo qua pidfd): bỏ khỏi danh sách lấy mẫu và báo ngay."""
+        if pid not in self._refs:
+            return  # Đã thôi theo dõi trước khi sự kiện tới
+        new_pids = ()
+        if self.process_table is not None and self.lifecycle.connector is not None:
+            # Nhận các process con được fork trước khi process này kết thúc, để cây không mất chúng
+            new_pids = self._process_new_pids()
+        if pid in self._pids:
+            del self._pids[pid]
+            self._release(pid)
+            self.metrics.close(pid)
+            self._on_terminated(pid)
+        for root, tree in list(self._trees.items()):
+            if pid in tree.members:
+                tree.discard(pid)
+                self._release(pid)
+                if not tree.members:
+                    del self._trees[root]
+                    self._on_terminated(root)
+        self._match_rules(new_pids)  # Sau khi đã báo kết thúc, như trong _sample_all
+
+    def _ensure_process_table(self):
+        if self.process_table is None:
+            self.process_table = ProcessTable()
+            # Đăng ký nhận sự kiện trước khi quét để không lỡ process nào được tạo giữa chừng
+            if self.lifecycle is not None:
+                self.lifecycle.enable_connector()
+            self.process_table.refresh()
+
+    def _set_rules(self, rules):
+        self._rules = rules
+        if rules:
+            self._ensure_process_table()
+            for rule in rules:
+                for pid in self.process_table.matching(rule):
+                    self._on_rule_match(rule.rule_id, pid)
+
+    def _add_tree(self, root):
+        self._ensure_process_table()
+        tree = ProcessTree(root, self.process_table)
+        # Các con cháu có sẵn được khởi tạo bình thường, giá trị CPU có từ tick sau
+        for pid in tree.attach():
+            try:
+                self._acquire(pid)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                tree.discard(pid)
+        self._trees[root] = tree
+
+    def _acquire(self, pid, process=None, fresh=False):
+        count = self._refs.get(pid, 0)
+        if not count:
+            self.backend.open(pid, process, fresh=fresh)
+            if self.lifecycle is not None and self.lifecycle.watch(pid):
+                self.backend.watched.add(pid)
+        self._refs[pid] = count + 1
+
+    def _release(self, pid):
+        count = self._refs.get(pid, 0) - 1
+        if count > 0:
+            self._refs[pid] = count
+        elif count == 0:
+            del self._refs[pid]
+            self.backend.close(pid)
+            if pid in self.backend.watched:
+                self.backend.watched.discard(pid)
+                self.lifecycle.unwatch(pid)
+
+    def _process_new_pids(self):
+        """
+        Cập nhật bảng process (chỉ đọc thông tin PID mới) và thêm con mới vào các cây.
+        Trả về các PID mới; phía gọi so khớp luật (_match_rules) sau khi đã báo các process kết thúc.
+        """
+        connector = self.lifecycle.connector if self.lifecycle is not None else None
+        if connector is not None and not connector.overflowed:
+            new_pids = self.process_table.apply_events(connector.drain())
+        else:
+            if connector is not None:
+                # Đã mất sự kiện: bỏ hàng đợi và quét lại toàn bộ một lần
+                connector.overflowed = False
+                connector.drain()
+            new_pids, _ = self.process_table.refresh()
+        if not new_pids:
+            return ()
+        for tree in self._trees.values():
+            for pid in tree.update(new_pids):
+                try:
+                    # Mốc CPU là lúc process con bắt đầu, nên mẫu đầu tiên không bị 0% hay 100% giả
+                    self._acquire(pid, fresh=True)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    tree.discard(pid)
+        return new_pids
+
+    def _match_rules(self, new_pids):
+        if not new_pids:
+            return
+        for rule in self._rules:
+            for pid in self.process_table.matching(rule, new_pids):
+                self._on_rule_match(rule.rule_id, pid)
+
+    def _sample_all(self):
+        """Lấy CPU và RAM của tất cả PID trong một lượt, mỗi PID đúng một lần."""
+        new_pids = ()
+        if self._trees or self._rules:
+            new_pids = self._process_new_pids()
+
+        results = {}
+        failures = {}  # pid -> exception
+        sample = self.backend.sample
+        record_latency = self.timing.histograms['sample_latency'].record
+        clock = time.perf_counter
+        for pid in self._refs:
+            started = clock()
+            try:
+                results[pid] = sample(pid)
+            except Exception as e:
+                failures[pid] = e
+            record_latency(clock() - started)
+
+        batch = {}
+        for pid in list(self._pids):
+            if pid in results:
+                batch[pid] = results[pid]
+                continue
+            error = failures[pid]
+            if isinstance(error, psutil.NoSuchProcess):
+                del self._pids[pid]
+                self._release(pid)
+                self.metrics.close(pid)
+                self._on_terminated(pid)
+            elif isinstance(error, psutil.AccessDenied):
+                del self._pids[pid]
+                self._release(pid)
+                self.metrics.close(pid)
+                self._on_error(pid, f"Không có quyền truy cập process PID {pid}.")
+            else:
+                self._on_error(pid, f"Lỗi không xác định khi lấy dữ liệu: {error}")
+
+        if self.metrics.enabled:
+            for pid, values in self.metrics.collect(list(batch)).items():
+                batch[pid] = batch[pid] + ({'metrics': values},)
+
+        for root, tree in list(self._trees.items()):
+            sample = self._aggregate_tree(tree, results, failures)
+            if sample is not None:
+                batch[root] = sample
+            elif not tree.members:
+                del self._trees[root]
+                self._on_terminated(root)
+        # Báo kết thúc trước rồi mới so khớp luật: process khởi động lại trong cùng tick
+        # được gắn vào tab của process cũ thay vì bị bỏ qua vì tab đó vẫn đang chạy
+        self._match_rules(new_pids)
+        return batch
+
+    def _aggregate_tree(self, tree, results, failures):
+        """Cộng dồn mẫu của mọi process trong cây; bỏ các process đã kết thúc."""
+        for pid in [pid for pid in tree.members if pid in failures]:
+            if isinstance(failures[pid], (psutil.NoSuchProcess, psutil.AccessDenied)):
+                tree.discard(pid)
+                self._release(pid)
+
+        members = [(pid, results[pid]) for pid in tree.members if pid in results]
+        if not members:
+            return None
+
+        cpu_total = sum(sample[1] for _, sample in members)
+        ram_total = sum(sample[2] for _, sample in members)
+        names = self.process_table.names
+        top = sorted(members, key=lambda item: item[1][1], reverse=True)[:TREE_TOP_N]
+        children = [(pid, names.get(pid, '?'), sample[1], sample[2]) for pid, sample in top]
+        return wall_clock(), cpu_total, ram_total, {'children': children, 'members': len(members)}
@@ -0,0 +1,406 @@
+"""
+Lấy mẫu phân mảnh (sharded) trên nhiều process để dùng nhiều core khi theo dõi hàng nghìn PID.
+
+ShardedSamplingEngine có cùng giao diện với SamplingEngine nhưng chia PID cho N process
+worker. Mỗi worker là một tiến trình Python riêng (python shards.py --worker) chạy một
+SamplingEngine với phần PID của nó, nên không bị chung GIL với GUI và không import Qt.
+
+Giao tiếp qua pipe stdin/stdout của worker, mỗi thông điệp có 4 byte độ dài ở đầu:
+- Lệnh tới worker: tuple được pickle (add, remove, interval, rules, metrics, stop).
+- Batch từ worker: dạng nhị phân gọn, header BATCH_HEADER rồi mỗi mẫu một bản ghi SAMPLE
+  (pid, timestamp, cpu, ram); phần tử thứ tư của mẫu (cây process, metric mở rộng) nếu có
+  được pickle riêng ở cuối.
+- Các thông điệp khác (kết thúc, lỗi, khớp luật, thống kê) được pickle.
+
+Mỗi worker gọi on_batch riêng cho phần PID của nó, nên một tick có thể tới thành nhiều batch.
+Mọi callback đều được gọi trên cùng một thread điều phối của engine.
+
+PID mới được giao cho shard đang nhẹ nhất; cây process nằm trọn trong một shard và luật
+auto-attach chỉ chạy ở shard còn sống đầu tiên. Worker thoát bất ngờ thì shard đó bị loại:
+các PID của nó được báo lỗi qua on_error, không nhận thêm PID nào và luật được chuyển sang
+shard còn sống kế tiếp. Định kỳ, nếu chênh lệch số PID giữa các shard quá lớn, một số
+PID đơn lẻ được chuyển từ shard nặng nhất sang shard nhẹ nhất (PID được chuyển mất một mẫu).
+Độ trễ của từng shard (jitter, chi phí mỗi tick, thời gian chuyển batch qua pipe) có trong
+shard_stats để chọn số shard phù hợp.
+"""
+import os
+import pickle
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from health import Histogram
+
+FRAME = struct.Struct('<I')
+BATCH_HEADER = struct.Struct('<cdI')  # loại 'B', thời điểm gửi (monotonic), số mẫu
+SAMPLE = struct.Struct('<Idff')  # pid, timestamp, cpu_percent_irix, memory_mb
+REBALANCE_INTERVAL_S = 5.0
+REBALANCE_SLACK = 0.1  # Chỉ chuyển PID khi chênh lệch vượt 10% số PID trung bình của một shard
+REBALANCE_MIN_GAP = 8  # ... và vượt số PID này
+
+
+def _encode_batch(batch):
+    extras = {pid: sample[3] for pid, sample in batch.items() if len(sample) > 3}
+    parts = [BATCH_HEADER.pack(b'B', time.monotonic(), len(batch))]
+    parts.extend(SAMPLE.pack(pid, *sample[:3]) for pid, sample in batch.items())
+    if extras:
+        parts.append(pickle.dumps(extras, pickle.HIGHEST_PROTOCOL))
+    return b''.join(parts)
+
+
+def _decode_batch(payload):
+    """Trả về (thời điểm gửi, batch {pid: mẫu})."""
+    _, sent, count = BATCH_HEADER.unpack_from(payload)
+    end = BATCH_HEADER.size + count * SAMPLE.size
+    batch = {pid: (timestamp, cpu_percent, memory_mb)
+             for pid, timestamp, cpu_percent, memory_mb in SAMPLE.iter_unpack(payload[BATCH_HEADER.size:end])}
+    if len(payload) > end:
+        for pid, extra in pickle.loads(payload[end:]).items():
+            batch[pid] = batch[pid] + (extra,)
+    return sent, batch
+
+
+def _read_frame(stream):
+    header = stream.read(FRAME.size)
+    if len(header) < FRAME.size:
+        return None
+    (size,) = FRAME.unpack(header)
+    payload = stream.read(size)
+    return payload if len(payload) == size else None
+
+
+class ShardTiming:
+    """Thống kê lịch tick gộp từ các shard, cùng khóa với sampler.TickTiming.summary/histograms."""
+
+    def __init__(self):
+        self.summary = None
+        self.histograms = {}
+
+
+class _Shard:
+    """Một process worker và trạng thái của nó ở phía engine."""
+
+    def __init__(self, index, backend_name, interval_s):
+        self.index = index
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--worker', backend_name, repr(interval_s)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._write_lock = threading.Lock()
+        self.pids = {}  # PID đơn lẻ đang giao cho shard này
+        self.trees = {}  # PID gốc của các cây trong shard này
+        self.tree_members = 0  # Tổng số process trong các cây, theo batch gần nhất của worker
+        self.histograms = {}  # Trạng thái (Histogram.state()) gần nhất của worker
+        self.stats = {'shard': index}
+        self.alive = True  # False khi worker đã thoát; chỉ đổi trong _shard_exited, dưới khóa của engine
+
+    @property
+    def size(self):
+        # Số PID được lấy mẫu, tính cả mọi thành viên của các cây process
+        return len(self.pids) + (max(self.tree_members, len(self.trees)) if self.trees else 0)
+
+    def send(self, *command):
+        payload = pickle.dumps(command, pickle.HIGHEST_PROTOCOL)
+        with self._write_lock:
+            try:
+                self.process.stdin.write(FRAME.pack(len(payload)) + payload)
+                self.process.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                pass  # Worker đã dừng; thread đọc sẽ báo lỗi cho các PID của nó
+
+    def close(self):
+        with self._write_lock:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+
+class ShardedSamplingEngine:
+    """SamplingEngine chia PID cho `shards` process worker (xem docstring của module)."""
+
+    def __init__(self, interval_s, on_batch, on_terminated=None, on_error=None, backend_name="auto",
+                 on_rule_match=None, shards=2):
+        if getattr(sys, 'frozen', False):
+            raise ValueError("Sharded sampling needs a Python interpreter and is not available in the packaged app.")
+        self._interval_s = interval_s
+        self._on_batch = on_batch
+        self._on_terminated = on_terminated or (lambda pid: None)
+        self._on_error = on_error or (lambda pid, message: None)
+        self._on_rule_match = on_rule_match or (lambda rule_id, pid: None)
+        # Worker được khởi động ngay để add() trước start() vẫn dùng được như SamplingEngine
+        self._shards = [_Shard(index, backend_name, interval_s) for index in range(max(1, shards))]
+        self._worker_pids = {shard.process.pid for shard in self._shards}
+        self._owner = {}  # pid (đơn lẻ hoặc gốc cây) -> _Shard
+        self._moved = set()  # PID vừa được chuyển shard: lỗi khởi tạo nghĩa là process đã kết thúc
+        self._rules = []  # Luật auto-attach hiện tại, gửi lại khi shard chạy luật bị mất
+        self._lock = threading.Lock()
+        self._inbox = queue.SimpleQueue()  # (shard, payload | None) từ các thread đọc, (None, (pid, lỗi)) từ _assign
+        self._stopping = False
+        self._thread = None
+        self.timing = ShardTiming()
+        self.shard_stats = []  # Thống kê gần nhất của từng shard
+
+    def start(self):
+        if self._thread is not None:
+            return
+        for shard in self._shards:
+            threading.Thread(target=self._read_shard, args=(shard,), name=f"ShardReader-{shard.index}",
+                             daemon=True).start()
+        self._thread = threading.Thread(target=self._dispatch, name="ShardedSamplingEngine", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Yêu cầu các worker dừng (chúng tự thoát khi stdin bị đóng). Không chờ."""
+        self._stopping = True
+        for shard in self._shards:
+            shard.close()
+        self._inbox.put((None, None))
+
+    def add(self, pid, process=None):
+        self._assign(pid, tree=False)
+
+    def add_tree(self, pid, process=None):
+        self._assign(pid, tree=True)
+
+    def remove(self, pid):
+        with self._lock:
+            shard = self._owner.pop(pid, None)
+            if shard is None:
+                return
+            shard.pids.pop(pid, None)
+            shard.trees.pop(pid, None)
+        shard.send('remove', pid)
+
+    def set_rules(self, rules):
+        # Luật chỉ được so khớp ở một shard để mỗi process mới chỉ khớp một lần
+        with self._lock:
+            self._rules = list(rules)
+            shard = self._rule_shard()
+        if shard is not None:
+            shard.send('rules', list(rules))
+
+    def set_metrics(self, names):
+        for shard in self._live_shards():
+            shard.send('metrics', list(names))
+
+    def set_interval(self, interval_s):
+        self._interval_s = interval_s
+        for shard in self._live_shards():
+            shard.send('interval', interval_s)
+
+    def _live_shards(self):
+        return [shard for shard in self._shards if shard.alive]
+
+    def _rule_shard(self):
+        return next((shard for shard in self._shards if shard.alive), None)
+
+    def _assign(self, pid, tree):
+        with self._lock:
+            live = self._live_shards()
+            if not live:
+                # Báo lỗi qua thread điều phối như mọi callback khác
+                self._inbox.put((None, (pid, "All sampling shards have exited.")))
+                return
+            shard = min(live, key=lambda shard: shard.size)
+            self._owner[pid] = shard
+            (shard.trees if tree else shard.pids)[pid] = None
+        shard.send('add', pid, tree)
+
+    def _read_shard(self, shard):
+        """Thread đọc của một shard: chuyển nguyên các thông điệp sang thread điều phối."""
+        stream = shard.process.stdout
+        while True:
+            payload = _read_frame(stream)
+            self._inbox.put((shard, payload))
+            if payload is None:
+                return
+
+    def _dispatch(self):
+        next_rebalance = time.monotonic() + REBALANCE_INTERVAL_S
+        while True:
+            shard, payload = self._inbox.get()
+            if self._stopping:
+                return
+            if shard is None:
+                # Lỗi do chính engine tạo ra (không còn shard nào để nhận PID)
+                self._on_error(*payload)
+                continue
+            if payload is None:
+                self._shard_exited(shard)
+                continue
+
+            kind = payload[:1]
+            if kind == b'B':
+                sent, batch = _decode_batch(payload)
+                shard.stats['delivery_ms'] = (time.monotonic() - sent) * 1000
+                self._moved.difference_update(batch)
+                self._on_batch(batch)
+            else:
+                message = pickle.loads(payload[1:])
+                if kind == b'T':
+                    self._forget(message)
+                    self._on_terminated(message)
+                elif kind == b'E':
+                    pid, text = message
+                    self._forget(pid)
+                    if pid in self._moved:
+                        self._moved.discard(pid)
+                        self._on_terminated(pid)
+                    else:
+                        self._on_error(pid, text)
+                elif kind == b'R':
+                    if message[1] not in self._worker_pids:  # Không tự theo dõi các worker
+                        self._on_rule_match(*message)
+                elif kind == b'S':
+                    shard.tree_members = message.pop('tree_members')
+                    shard.histograms = message.pop('histograms')
+                    shard.stats.update(message)
+                    self._publish_stats()
+
+            if time.monotonic() >= next_rebalance:
+                next_rebalance = time.monotonic() + REBALANCE_INTERVAL_S
+                self._rebalance()
+
+    def _forget(self, pid):
+        with self._lock:
+            shard = self._owner.pop(pid, None)
+            if shard is not None:
+                shard.pids.pop(pid, None)
+                shard.trees.pop(pid, None)
+
+    def _shard_exited(self, shard):
+        with self._lock:
+            # Shard chết không được nhận thêm PID hay luật: send() tới nó chỉ bị bỏ qua
+            had_rules = shard is self._rule_shard()
+            shard.alive = False
+            lost = list(shard.pids) + list(shard.trees)
+            for pid in lost:
+                del self._owner[pid]
+            shard.pids.clear()
+            shard.trees.clear()
+            rule_shard = self._rule_shard() if had_rules and self._rules else None
+            rules = list(self._rules)
+        print(f"Warning: sampling shard {shard.index} exited unexpectedly.", file=sys.stderr)
+        if rule_shard is not None:
+            rule_shard.send('rules', rules)
+        for pid in lost:
+            self._on_error(pid, f"Sampling shard {shard.index} exited unexpectedly.")
+
+    def _rebalance(self):
+        """Chuyển PID đơn lẻ từ shard nặng nhất sang shard nhẹ nhất khi chênh lệch quá lớn."""
+        with self._lock:
+            live = self._live_shards()
+            if len(live) < 2:
+                return
+            heaviest = max(live, key=lambda shard: shard.size)
+            lightest = min(live, key=lambda shard: shard.size)
+            average = sum(shard.size for shard in live) / len(live)
+            gap = heaviest.size - lightest.size
+            if gap <= max(REBALANCE_MIN_GAP, average * REBALANCE_SLACK):
+                return
+            moving = list(heaviest.pids)[:gap // 2]
+            for pid in moving:
+                del heaviest.pids[pid]
+                lightest.pids[pid] = None
+                self._owner[pid] = lightest
+        self._moved.update(moving)
+        for pid in moving:
+            heaviest.send('remove', pid)
+            lightest.send('add', pid, False)
+
+    def _publish_stats(self):
+        stats = [shard.stats for shard in self._live_shards() if 'jitter_p99_ms' in shard.stats]
+        if not stats:
+            return
+        self.shard_stats = [dict(shard.stats, pids=shard.size) for shard in self._shards]
+        self.timing.summary = {
+            'ticks': sum(item['ticks'] for item in stats),
+            'skipped': sum(item['skipped'] for item in stats),
+            'jitter_mean_ms': sum(item['jitter_mean_ms'] for item in stats) / len(stats),
+            'jitter_p99_ms': max(item['jitter_p99_ms'] for item in stats),
+            'jitter_max_ms': max(item['jitter_max_ms'] for item in stats),
+            'cost_mean_ms': max(item['cost_mean_ms'] for item in stats),  # Shard chậm nhất quyết định
+        }
+        histograms = {}
+        for shard in self._shards:
+            for name, state in shard.histograms.items():
+                histograms.setdefault(name, Histogram()).merge(state)
+        self.timing.histograms = histograms
+
+
+def worker_main(backend_name, interval_s):
+    """Vòng lặp của một process worker: nhận lệnh từ stdin, gửi mẫu ra stdout."""
+    import psutil
+
+    from backends import create_backend
+    from sampler import SamplingEngine
+
+    # stdout dành cho thông điệp nhị phân; print() trong worker đi ra stderr
+    channel = os.fdopen(os.dup(1), 'wb', buffering=0)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+
+    def send(payload):
+        with write_lock:
+            channel.write(FRAME.pack(len(payload)) + payload)
+
+    def send_message(kind, message):
+        send(kind + pickle.dumps(message, pickle.HIGHEST_PROTOCOL))
+
+    last_summary = None
+
+    def on_batch(batch):
+        nonlocal last_summary
+        send(_encode_batch(batch))
+        summary = engine.timing.summary
+        if summary is not None and summary is not last_summary:
+            last_summary = summary
+            send_message(b'S', dict(summary, load=summary['cost_mean_ms'] / (engine_interval[0] * 1000),
+                                    tree_members=sum(sample[3]['members'] for sample in batch.values()
+                                                     if len(sample) > 3 and 'members' in sample[3]),
+                                    histograms={name: histogram.state()
+                                                for name, histogram in engine.timing.histograms.items()}))
+
+    engine_interval = [interval_s]
+    engine = SamplingEngine(interval_s, on_batch=on_batch,
+                            on_terminated=lambda pid: send_message(b'T', pid),
+                            on_error=lambda pid, text: send_message(b'E', (pid, text)),
+                            backend=create_backend(backend_name),
+                            on_rule_match=lambda rule_id, pid: send_message(b'R', (rule_id, pid)))
+    engine.start()
+
+    commands = sys.stdin.buffer
+    while True:
+        payload = _read_frame(commands)
+        if payload is None:
+            break  # stdin bị đóng: engine chính đã dừng (hoặc đã thoát)
+        op, *args = pickle.loads(payload)
+        if op == 'add':
+            pid, tree = args
+            try:
+                process = psutil.Process(pid)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                send_message(b'E', (pid, "Process không tồn tại hoặc không có quyền truy cập khi khởi tạo."))
+                continue
+            (engine.add_tree if tree else engine.add)(pid, process)
+        elif op == 'remove':
+            engine.remove(*args)
+        elif op == 'interval':
+            engine_interval[0] = args[0]
+            engine.set_interval(args[0])
+        elif op == 'rules':
+            engine.set_rules(args[0])
+        elif op == 'metrics':
+            engine.set_metrics(args[0])
+    engine.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--worker':
+        worker_main(sys.argv[2], float(sys.argv[3]))
+    else:
+        sys.exit("usage: shards.py --worker <backend> <interval_s>")
@@ -0,0 +1,240 @@
+"""
+Thống kê dạng luồng (streaming) cho chuỗi mẫu CPU/RAM.
+
+Mọi cấu trúc ở đây cập nhật O(1) cho mỗi mẫu và dùng bộ nhớ giới hạn:
+- Trung bình và phương sai theo thuật toán Welford (hỗ trợ cả bỏ mẫu).
+- Quantile xấp xỉ bằng histogram bucket theo thang log (sai số tương đối cố định,
+  kiểu DDSketch), hỗ trợ cả thêm và bớt mẫu nên dùng được cho cửa sổ trượt.
+- Min/max của cửa sổ trượt bằng deque đơn điệu.
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """Histogram bucket theo log, sai số tương đối ~relative_accuracy cho mỗi quantile."""
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-3):
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._gamma = gamma
+        self._inv_log_gamma = 1.0 / math.log(gamma)
+        self._min_value = min_value
+        self._buckets = {}  # key -> số mẫu
+        self._zero_count = 0  # Các mẫu <= min_value (ví dụ CPU 0%)
+        self.count = 0
+
+    def _key(self, x):
+        return math.ceil(math.log(x) * self._inv_log_gamma)
+
+    def add(self, x):
+        self.count += 1
+        if x <= self._min_value:
+            self._zero_count += 1
+            return
+        key = self._key(x)
+        self._buckets[key] = self._buckets.get(key, 0) + 1
+
+    def remove(self, x):
+        self.count -= 1
+        if x <= self._min_value:
+            self._zero_count -= 1
+            return
+        key = self._key(x)
+        remaining = self._buckets[key] - 1
+        if remaining:
+            self._buckets[key] = remaining
+        else:
+            del self._buckets[key]
+
+    def clear(self):
+        self._buckets.clear()
+        self._zero_count = 0
+        self.count = 0
+
+    def quantile(self, q):
+        """Giá trị xấp xỉ tại quantile q (0..1). Chi phí tỉ lệ với số bucket, không phụ thuộc số mẫu."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self._zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if seen > rank:
+                # Điểm giữa (theo log) của bucket
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self._buckets) / (self._gamma + 1)
+
+
+class _Moments:
+    """Trung bình/phương sai theo Welford, có hỗ trợ bỏ mẫu."""
+    __slots__ = ('count', 'mean', '_m2')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    def remove(self, x):
+        if self.count <= 1:
+            self.clear()
+            return
+        self.count -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.count
+        self._m2 -= delta * (x - self.mean)
+
+    @property
+    def stddev(self):
+        return math.sqrt(max(self._m2, 0.0) / self.count) if self.count else None
+
+
+def _summary(moments, sketch, min_value, max_value):
+    result = {
+        'avg': moments.mean,
+        'min': min_value,
+        'max': max_value,
+        'stddev': moments.stddev,
+    }
+    for q in QUANTILES:
+        result[f'p{round(q * 100)}'] = sketch.quantile(q)
+    return result
+
+
+class StreamingStats:
+    """Thống kê toàn phiên của một chuỗi: avg, min, max, stddev, p50/p95/p99."""
+
+    def __init__(self):
+        self._moments = _Moments()
+        self.sketch = QuantileSketch()
+        self.min = None
+        self.max = None
+
+    @property
+    def count(self):
+        return self._moments.count
+
+    @property
+    def mean(self):
+        return self._moments.mean
+
+    def add(self, x):
+        self._moments.add(x)
+        self.sketch.add(x)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    def summary(self):
+        """Trả về dict các chỉ số, hoặc None nếu chưa có mẫu."""
+        if not self._moments.count:
+            return None
+        return _summary(self._moments, self.sketch, self.min, self.max)
+
+
+class WindowedStats:
+    """
+    Thống kê của một cột SampleStore trong cửa sổ thời gian trượt [t_from, hiện tại].
+
+    Cửa sổ chỉ trượt về phía trước; mẫu rời cửa sổ được trừ khỏi các cấu trúc
+    nên chi phí khấu hao vẫn là O(1) cho mỗi mẫu.
+    """
+
+    def __init__(self, store, column):
+        self.store = store
+        self.column = column
+        self._moments = _Moments()
+        self.sketch = QuantileSketch()
+        self._min_deque = deque()  # (chỉ số tuyệt đối, giá trị), giá trị tăng dần
+        self._max_deque = deque()  # (chỉ số tuyệt đối, giá trị), giá trị giảm dần
+        self._start = 0  # Chỉ số tuyệt đối của mẫu đầu tiên trong cửa sổ
+        self._end = 0  # Chỉ số tuyệt đối ngay sau mẫu cuối cùng đã đưa vào
+
+    def reset(self, t_from):
+        """Tính lại từ đầu cho cửa sổ bắt đầu tại t_from (dùng khi đổi độ dài cửa sổ)."""
+        self._moments.clear()
+        self.sketch.clear()
+        self._min_deque.clear()
+        self._max_deque.clear()
+        store = self.store
+        self._start = self._end = store.dropped + store.index_at(t_from)
+        self.update(t_from)
+
+    def update(self, t_from):
+        """Đưa các mẫu mới vào cửa sổ và bỏ các mẫu có thời gian < t_from."""
+        store = self.store
+        if self._start < store.dropped:
+            # Ring buffer đã bỏ mất các mẫu cũ mà cửa sổ còn giữ, tính lại từ dữ liệu hiện có
+            self.reset(max(t_from, store.column(store.time_column)[0]))
+            return
+
+        values = store.column(self.column)
+        offset = store.dropped
+        for i in range(self._end, store.total):
+            self._push(i, float(values[i - offset]))
+        self._end = store.total
+
+        new_start = offset + store.index_at(t_from)
+        for i in range(self._start, new_start):
+            self._pop(i, float(values[i - offset]))
+        self._start = max(self._start, new_start)
+
+    def _push(self, i, x):
+        self._moments.add(x)
+        self.sketch.add(x)
+        while self._min_deque and self._min_deque[-1][1] >= x:
+            self._min_deque.pop()
+        self._min_deque.append((i, x))
+        while self._max_deque and self._max_deque[-1][1] <= x:
+            self._max_deque.pop()
+        self._max_deque.append((i, x))
+
+    def _pop(self, i, x):
+        self._moments.remove(x)
+        self.sketch.remove(x)
+        if self._min_deque and self._min_deque[0][0] == i:
+            self._min_deque.popleft()
+        if self._max_deque and self._max_deque[0][0] == i:
+            self._max_deque.popleft()
+
+    def summary(self):
+        if not self._moments.count:
+            return None
+        return _summary(self._moments, self.sketch, self._min_deque[0][1], self._max_deque[0][1])
+
+
+def array_summary(values, max_quantile_samples=1 << 20):
+    """
+    Thống kê của một mảng tĩnh (ví dụ cột của recording ánh xạ bằng mmap), cùng khóa với summary().
+    Quantile được tính trên một mẫu con cách đều tối đa max_quantile_samples phần tử để
+    chi phí không tăng theo độ dài recording.
+    """
+    if not len(values):
+        return None
+    values = values.astype(np.float64, copy=False)
+    step = max(1, len(values) // max_quantile_samples)
+    quantiles = np.quantile(values[::step], QUANTILES)
+    result = {
+        'avg': float(values.mean()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'stddev': float(values.std()),
+    }
+    for q, value in zip(QUANTILES, quantiles):
+        result[f'p{round(q * 100)}'] = float(value)
+    return result
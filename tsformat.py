@@ -0,0 +1,243 @@
+"""
+Định dạng lưu chuỗi thời gian nhị phân, chỉ ghi nối (append-only).
+
+Một recording là một thư mục (thường có đuôi .pmts) gồm:
+- manifest.json: phiên bản định dạng và danh sách series (khóa, tên process, tên file).
+- series-<n>.dat: header HEADER_SIZE byte rồi tới các bản ghi cố định RECORD_SIZE byte
+  (timestamp f8, cpu_percent_irix f4, memory_mb f4, pid u4, flags u4), theo thứ tự thời gian.
+- series-<n>.idx: khối chỉ mục định kỳ, mỗi khối INDEX_EVERY bản ghi đầy đủ có một mục gồm
+  bản ghi đầu, timestamp đầu/cuối, min/max/tổng/tổng bình phương của CPU và RAM, PID đầu/cuối. Chỉ mục
+  giúp tìm khoảng thời gian, tính thống kê và vẽ khoảng dài mà không phải đọc dữ liệu thô.
+
+Bản ghi được gom thành chunk trong bộ nhớ và ghi ra đĩa định kỳ. Khi bị dừng đột ngột,
+phần đuôi có thể là một bản ghi dở dang hoặc thiếu mục chỉ mục: recover_series() cắt bỏ
+bản ghi dở dang và dựng lại các mục chỉ mục còn thiếu từ dữ liệu.
+
+Module này chỉ dùng thư viện chuẩn để recorder không giao diện không phải nạp numpy;
+phần đọc bằng memory map nằm ở tsreader.py.
+"""
+import json
+import math
+import os
+import struct
+import time
+
+FORMAT_NAME = "pmts"
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+DATA_MAGIC = b"PMTSDAT1"
+INDEX_MAGIC = b"PMTSIDX1"
+HEADER_SIZE = 32  # magic (8) + record size u4 + index_every u4 + dự phòng
+RECORD = struct.Struct('<dffII')  # timestamp, cpu_percent_irix, memory_mb, pid, flags
+RECORD_SIZE = RECORD.size
+# bản ghi đầu, t đầu, t cuối, (min, max, tổng, tổng bình phương) của cpu và của memory, pid đầu, pid cuối
+INDEX_ENTRY = struct.Struct('<QddffddffddII')
+INDEX_EVERY = 4096
+
+CHUNK_RECORDS = 1024  # Ghi ra đĩa khi bộ đệm của một series đủ số bản ghi này
+FLUSH_INTERVAL_S = 5.0  # ... hoặc khi đã quá khoảng thời gian này kể từ lần ghi trước
+
+
+def _header(magic):
+    return magic + struct.pack('<II', RECORD_SIZE, INDEX_EVERY) + bytes(HEADER_SIZE - len(magic) - 8)
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_NAME or manifest.get('version') != FORMAT_VERSION:
+        raise ValueError(f"'{path}' is not a version {FORMAT_VERSION} {FORMAT_NAME} recording")
+    return manifest
+
+
+class _BlockAggregate:
+    """Min/max/tổng/tổng bình phương của CPU và RAM trong khối chỉ mục đang mở."""
+    __slots__ = ('first', 't_first', 't_last', 'cpu', 'mem', 'pid_first', 'pid_last')
+
+    def __init__(self, first, timestamp, pid):
+        self.first = first
+        self.t_first = self.t_last = timestamp
+        self.pid_first = self.pid_last = pid
+        self.cpu = [math.inf, -math.inf, 0.0, 0.0]
+        self.mem = [math.inf, -math.inf, 0.0, 0.0]
+
+    def add(self, timestamp, cpu_percent, memory_mb, pid):
+        self.t_last = timestamp
+        self.pid_last = pid
+        for agg, value in ((self.cpu, cpu_percent), (self.mem, memory_mb)):
+            if value < agg[0]:
+                agg[0] = value
+            if value > agg[1]:
+                agg[1] = value
+            agg[2] += value
+            agg[3] += value * value
+
+    def pack(self):
+        return INDEX_ENTRY.pack(self.first, self.t_first, self.t_last, *self.cpu, *self.mem,
+                                self.pid_first, self.pid_last)
+
+
+def recover_series(data_path, index_path, truncate=False):
+    """
+    Kiểm tra phần đuôi của một series sau khi có thể đã bị dừng đột ngột.
+
+    Trả về (số bản ghi hợp lệ, số mục chỉ mục hợp lệ). Mục chỉ mục của các khối đầy đủ
+    bị thiếu (dữ liệu đã ghi nhưng chỉ mục chưa kịp ghi) được tính lại từ dữ liệu.
+    Nếu truncate=True, file dữ liệu bị cắt về bản ghi đầy đủ cuối cùng và file chỉ mục
+    được ghi lại cho khớp (dùng khi mở để ghi tiếp); nếu không, các file không bị sửa và
+    phần chỉ mục dựng lại được trả về dạng bytes để người đọc tự dùng.
+    """
+    size = os.path.getsize(data_path)
+    count = max(size - HEADER_SIZE, 0) // RECORD_SIZE
+    complete_blocks = count // INDEX_EVERY
+
+    try:
+        with open(index_path, 'rb') as f:
+            index_bytes = f.read()[HEADER_SIZE:]
+    except FileNotFoundError:
+        index_bytes = b''
+    valid = min(len(index_bytes) // INDEX_ENTRY.size, complete_blocks)
+    index_bytes = index_bytes[:valid * INDEX_ENTRY.size]
+
+    rebuilt = bytearray()
+    if valid < complete_blocks:
+        with open(data_path, 'rb') as f:
+            for block in range(valid, complete_blocks):
+                f.seek(HEADER_SIZE + block * INDEX_EVERY * RECORD_SIZE)
+                data = f.read(INDEX_EVERY * RECORD_SIZE)
+                aggregate = None
+                for timestamp, cpu_percent, memory_mb, pid, _ in RECORD.iter_unpack(data):
+                    if aggregate is None:
+                        aggregate = _BlockAggregate(block * INDEX_EVERY, timestamp, pid)
+                    aggregate.add(timestamp, cpu_percent, memory_mb, pid)
+                rebuilt += aggregate.pack()
+
+    if truncate:
+        with open(data_path, 'r+b') as f:
+            f.truncate(HEADER_SIZE + count * RECORD_SIZE)
+        with open(index_path, 'wb') as f:
+            f.write(_header(INDEX_MAGIC) + index_bytes + rebuilt)
+    return count, index_bytes + bytes(rebuilt)
+
+
+class _SeriesFile:
+    """File dữ liệu và chỉ mục của một series đang được ghi."""
+
+    def __init__(self, data_path, index_path):
+        if os.path.exists(data_path):
+            self.count, _ = recover_series(data_path, index_path, truncate=True)
+            self._aggregate = self._reload_open_block(data_path)
+        else:
+            for path, magic in ((data_path, DATA_MAGIC), (index_path, INDEX_MAGIC)):
+                with open(path, 'wb') as f:
+                    f.write(_header(magic))
+            self.count = 0
+            self._aggregate = None
+        self._data_fd = os.open(data_path, os.O_WRONLY | os.O_APPEND)
+        self._index_fd = os.open(index_path, os.O_WRONLY | os.O_APPEND)
+        self._buffer = bytearray()
+        self._index_buffer = bytearray()
+        self.pending = 0
+
+    def _reload_open_block(self, data_path):
+        """Tính lại tổng hợp của khối chưa đầy ở cuối file khi ghi tiếp."""
+        first = self.count - self.count % INDEX_EVERY
+        aggregate = None
+        with open(data_path, 'rb') as f:
+            f.seek(HEADER_SIZE + first * RECORD_SIZE)
+            for timestamp, cpu_percent, memory_mb, pid, _ in RECORD.iter_unpack(f.read()):
+                if aggregate is None:
+                    aggregate = _BlockAggregate(first, timestamp, pid)
+                aggregate.add(timestamp, cpu_percent, memory_mb, pid)
+        return aggregate
+
+    def append(self, timestamp, cpu_percent, memory_mb, pid, flags=0):
+        self._buffer += RECORD.pack(timestamp, cpu_percent, memory_mb, pid, flags)
+        if self._aggregate is None:
+            self._aggregate = _BlockAggregate(self.count, timestamp, pid)
+        self._aggregate.add(timestamp, cpu_percent, memory_mb, pid)
+        self.count += 1
+        self.pending += 1
+        # Khối đầy: ghi mục chỉ mục của nó (cùng lần flush với dữ liệu)
+        if self.count % INDEX_EVERY == 0:
+            self._index_buffer += self._aggregate.pack()
+            self._aggregate = None
+
+    def flush(self):
+        # Dữ liệu được ghi trước chỉ mục: nếu bị dừng giữa chừng, recover_series dựng lại chỉ mục
+        if self._buffer:
+            os.write(self._data_fd, self._buffer)
+            self._buffer.clear()
+        if self._index_buffer:
+            os.write(self._index_fd, self._index_buffer)
+            self._index_buffer.clear()
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        os.close(self._data_fd)
+        os.close(self._index_fd)
+
+
+class TimeSeriesWriter:
+    """Ghi mẫu vào một recording .pmts (cùng giao diện với recording.CsvRecorder)."""
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL_S):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._files = {}  # series_key -> _SeriesFile
+        try:
+            self._manifest = read_manifest(path)
+        except FileNotFoundError:
+            self._manifest = {'format': FORMAT_NAME, 'version': FORMAT_VERSION,
+                              'record_size': RECORD_SIZE, 'index_every': INDEX_EVERY, 'series': []}
+            self._write_manifest()
+        # Mở lại các series có sẵn (ghi tiếp sau khi bị dừng đột ngột)
+        for entry in self._manifest['series']:
+            self._files[entry['key']] = self._open_series(entry)
+        self.samples_written = 0
+        self.closed = False
+
+    def write(self, series, pid, name, sample):
+        """Ghi một mẫu (timestamp, cpu_percent_irix, memory_mb) vào series."""
+        series_file = self._files.get(series)
+        if series_file is None:
+            series_file = self._add_series(series, name)
+        timestamp, cpu_percent, memory_mb = sample[:3]
+        series_file.append(timestamp, cpu_percent, memory_mb, pid)
+        self.samples_written += 1
+
+        if series_file.pending >= CHUNK_RECORDS or time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        for series_file in self._files.values():
+            series_file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.closed = True
+        for series_file in self._files.values():
+            series_file.close()
+
+    def _add_series(self, key, name):
+        entry = {'key': key, 'name': name, 'file': f"series-{len(self._manifest['series'])}"}
+        series_file = self._open_series(entry)
+        self._manifest['series'].append(entry)
+        self._write_manifest()
+        self._files[key] = series_file
+        return series_file
+
+    def _open_series(self, entry):
+        base = os.path.join(self.path, entry['file'])
+        return _SeriesFile(base + '.dat', base + '.idx')
+
+    def _write_manifest(self):
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
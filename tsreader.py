@@ -0,0 +1,225 @@
+"""
+Đọc recording .pmts bằng memory map.
+
+Dữ liệu của mỗi series được ánh xạ thẳng thành mảng numpy có cấu trúc (không copy,
+không parse). Tìm một mốc thời gian dùng chỉ mục định kỳ rồi tìm nhị phân trong một
+khối INDEX_EVERY bản ghi, nên mở file nhiều GB và lấy một khoảng thời gian bất kỳ đều
+là O(log n) và chỉ chạm tới vài trang bộ nhớ. Thống kê và đồ thị của khoảng dài dùng
+tổng hợp theo khối trong chỉ mục, chỉ đọc dữ liệu thô ở hai khối dở dang hai đầu.
+
+Quantile không suy ra được từ chỉ mục nên phải đọc dữ liệu thô: với recording ánh xạ
+(lazy_quantiles), summary(quantiles=False) trả về ngay các giá trị từ chỉ mục và GUI tính
+quantiles() sau, ngoài luồng giao diện. Mẫu con là QUANTILE_RUNS đoạn liền nhau trải đều
+trên khoảng cần tính, nên chỉ chạm vài trăm trang thay vì một trang cho mỗi mẫu.
+"""
+import math
+import mmap
+import os
+
+import numpy as np
+
+from rollup import bucket_envelope
+from stats import QUANTILES, array_summary
+from tsformat import HEADER_SIZE, INDEX_EVERY, MANIFEST_NAME, read_manifest, recover_series
+
+RECORD_DTYPE = np.dtype([('t', '<f8'), ('cpu', '<f4'), ('mem', '<f4'), ('pid', '<u4'), ('flags', '<u4')])
+INDEX_DTYPE = np.dtype([('first', '<u8'), ('t_first', '<f8'), ('t_last', '<f8'),
+                        ('cpu_min', '<f4'), ('cpu_max', '<f4'), ('cpu_sum', '<f8'), ('cpu_sumsq', '<f8'),
+                        ('mem_min', '<f4'), ('mem_max', '<f4'), ('mem_sum', '<f8'), ('mem_sumsq', '<f8'),
+                        ('pid_first', '<u4'), ('pid_last', '<u4')])
+QUANTILE_SAMPLES = 1 << 16  # Số mẫu tối đa khi tính quantile của recording
+QUANTILE_RUNS = 64  # ... lấy thành chừng này đoạn liền nhau (mỗi đoạn 1024 bản ghi, vài trang bộ nhớ)
+
+
+def _quantile_keys(values=None):
+    """{'p50': ..., 'p95': ..., 'p99': ...} theo QUANTILES; None khi chưa tính."""
+    if values is None:
+        values = (None,) * len(QUANTILES)
+    return {f'p{round(q * 100)}': None if value is None else float(value) for q, value in zip(QUANTILES, values)}
+
+
+class ArraySeries:
+    """Một series dạng cột numpy (time, cpu, ram, pid) đã nằm trong bộ nhớ, ví dụ đọc từ CSV."""
+    lazy_quantiles = False  # Dữ liệu đã ở trong bộ nhớ: quantile rẻ, tính luôn trong summary()
+
+    def __init__(self, key, name, time, cpu, ram, pid_column):
+        self.key = key
+        self.name = name
+        self.time = time
+        self.cpu = cpu
+        self.ram = ram
+        self.pid_column = pid_column
+
+    @classmethod
+    def from_recorded(cls, series):
+        """Chuyển recording.RecordedSeries (đọc từ CSV) sang dạng cột."""
+        samples = np.array(series.samples, dtype=np.float64).reshape(-1, 3)
+        pid_column = np.empty(len(samples), dtype=np.uint32)
+        for timestamp, pid in series.pid_changes:
+            pid_column[np.searchsorted(samples[:, 0], timestamp):] = pid
+        return cls(series.key, series.name, samples[:, 0], samples[:, 1], samples[:, 2], pid_column)
+
+    def __len__(self):
+        return len(self.time)
+
+    @property
+    def pid(self):
+        return int(self.pid_column[-1]) if len(self) else None
+
+    def index_at(self, t):
+        """Chỉ số mẫu đầu tiên có timestamp >= t."""
+        return int(np.searchsorted(self.time, t, side='left'))
+
+    def pid_changes(self):
+        """[(timestamp, pid), ...] tại các điểm series chuyển sang PID mới (kể cả PID đầu tiên)."""
+        if not len(self):
+            return []
+        positions = np.concatenate(([0], np.flatnonzero(np.diff(self.pid_column)) + 1))
+        return [(float(self.time[i]), int(self.pid_column[i])) for i in positions]
+
+    def summary(self, metric, start=0, stop=None, quantiles=True):
+        """
+        Thống kê (cùng khóa với StreamingStats.summary()) của metric ('cpu'/'ram') trong [start, stop).
+        quantiles=False: các khóa p50/p95/p99 là None (tính sau bằng quantiles()).
+        """
+        result = array_summary(getattr(self, metric)[start:stop], QUANTILE_SAMPLES)
+        if result is not None and not quantiles:
+            result.update(_quantile_keys())
+        return result
+
+    def quantiles(self, metric, start=0, stop=None):
+        """{p50, p95, p99} của metric trong [start, stop), trên một mẫu con gồm các đoạn liền nhau."""
+        values = getattr(self, metric)
+        start, stop, _ = slice(start, stop).indices(len(values))
+        if stop <= start:
+            return _quantile_keys()
+        if stop - start > QUANTILE_SAMPLES:
+            run = QUANTILE_SAMPLES // QUANTILE_RUNS
+            firsts = np.linspace(start, stop - run, QUANTILE_RUNS).astype(np.int64)
+            sample = np.concatenate([values[first:first + run] for first in firsts])
+        else:
+            sample = values[start:stop]
+        return _quantile_keys(np.quantile(sample.astype(np.float64), QUANTILES))
+
+    def envelope(self, metric, start, stop, bucket_count):
+        """(t, min, mean, max) của [start, stop) gom thành khoảng bucket_count bucket."""
+        return bucket_envelope(self.time[start:stop], getattr(self, metric)[start:stop], bucket_count)
+
+
+class MappedSeries(ArraySeries):
+    """Một series của recording .pmts, ánh xạ từ file bằng mmap (các cột là view, không copy)."""
+    lazy_quantiles = True  # Quantile phải đọc dữ liệu thô rải khắp file: GUI tính sau, ngoài luồng giao diện
+
+    def __init__(self, key, name, data_path, index_path):
+        count, index_bytes = recover_series(data_path, index_path)
+        if count:
+            with open(data_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=count, offset=HEADER_SIZE)
+        else:
+            self._mmap = None
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+        super().__init__(key, name, self.records['t'], self.records['cpu'], self.records['mem'],
+                         self.records['pid'])
+        self.index = np.frombuffer(index_bytes, dtype=INDEX_DTYPE)
+
+    def index_at(self, t):
+        # Tìm khối trong chỉ mục trước, rồi chỉ tìm nhị phân trong khối đó của dữ liệu
+        block = int(np.searchsorted(self.index['t_last'], t, side='left'))
+        lo = block * INDEX_EVERY
+        hi = min(lo + INDEX_EVERY, len(self))
+        return lo + int(np.searchsorted(self.time[lo:hi], t, side='left'))
+
+    def range(self, t_from, t_to):
+        """View (không copy) các bản ghi có t_from <= timestamp < t_to."""
+        return self.records[self.index_at(t_from):self.index_at(t_to)]
+
+    def pid_changes(self):
+        # Chỉ quét các khối mà chỉ mục cho thấy có đổi PID, cùng phần đuôi chưa có chỉ mục
+        if not len(self):
+            return []
+        pid_first, pid_last = self.index['pid_first'], self.index['pid_last']
+        changed = np.flatnonzero((pid_first != pid_last) | (pid_first != np.roll(pid_last, 1)))
+        spans = [(block * INDEX_EVERY, (block + 1) * INDEX_EVERY) for block in changed]
+        spans.append((max(len(self.index) * INDEX_EVERY - 1, 0), len(self)))
+        changes = [(float(self.time[0]), int(self.pid_column[0]))]
+        for lo, hi in spans:
+            lo = max(lo - 1, 0)  # Gồm cả bản ghi cuối của khối trước để thấy thay đổi ở ranh giới
+            for i in np.flatnonzero(np.diff(self.pid_column[lo:hi])) + lo + 1:
+                if changes[-1][1] != self.pid_column[i]:
+                    changes.append((float(self.time[i]), int(self.pid_column[i])))
+        return changes
+
+    def _full_blocks(self, start, stop):
+        """Các khối chỉ mục nằm trọn trong [start, stop): (khối đầu, khối cuối + 1)."""
+        return -(-start // INDEX_EVERY), min(stop // INDEX_EVERY, len(self.index))
+
+    def summary(self, metric, start=0, stop=None, quantiles=True):
+        stop = len(self) if stop is None else stop
+        first_block, end_block = self._full_blocks(start, stop)
+        if end_block - first_block < 2:
+            return super().summary(metric, start, stop, quantiles)
+
+        # Khối đầy đủ lấy từ chỉ mục, hai đầu dở dang đọc từ dữ liệu thô
+        prefix = 'cpu' if metric == 'cpu' else 'mem'
+        blocks = self.index[first_block:end_block]
+        values = getattr(self, metric)
+        edges = [values[start:first_block * INDEX_EVERY], values[end_block * INDEX_EVERY:stop]]
+        edges = [edge.astype(np.float64) for edge in edges if len(edge)]
+        count = stop - start
+        total = blocks[f'{prefix}_sum'].sum() + sum(edge.sum() for edge in edges)
+        total_sq = blocks[f'{prefix}_sumsq'].sum() + sum((edge * edge).sum() for edge in edges)
+        mean = total / count
+        result = {
+            'avg': float(mean),
+            'min': float(min([blocks[f'{prefix}_min'].min()] + [edge.min() for edge in edges])),
+            'max': float(max([blocks[f'{prefix}_max'].max()] + [edge.max() for edge in edges])),
+            'stddev': math.sqrt(max(total_sq / count - mean * mean, 0.0)),
+        }
+        result.update(self.quantiles(metric, start, stop) if quantiles else _quantile_keys())
+        return result
+
+    def envelope(self, metric, start, stop, bucket_count):
+        first_block, end_block = self._full_blocks(start, stop)
+        if end_block - first_block < 2 * bucket_count:
+            return super().envelope(metric, start, stop, bucket_count)
+
+        # Mỗi bucket phủ nhiều khối: gom từ tổng hợp theo khối, không đọc dữ liệu thô
+        prefix = 'cpu' if metric == 'cpu' else 'mem'
+        blocks = self.index[first_block:end_block]
+        times, mins, means, maxs = bucket_envelope(blocks['t_first'], blocks[f'{prefix}_sum'] / INDEX_EVERY,
+                                                   bucket_count, blocks[f'{prefix}_min'], blocks[f'{prefix}_max'])
+        # Hai khối dở dang ở hai đầu vẫn được vẽ (mỗi khối một điểm) để không mất đỉnh ở mép cửa sổ
+        values = getattr(self, metric)
+        head = values[start:first_block * INDEX_EVERY]
+        if len(head):
+            times = np.insert(times, 0, self.time[start])
+            mins = np.insert(mins, 0, head.min())
+            means = np.insert(means, 0, head.mean())
+            maxs = np.insert(maxs, 0, head.max())
+        tail = values[end_block * INDEX_EVERY:stop]
+        if len(tail):
+            times = np.append(times, self.time[end_block * INDEX_EVERY])
+            mins = np.append(mins, tail.min())
+            means = np.append(means, tail.mean())
+            maxs = np.append(maxs, tail.max())
+        return times, mins, means, maxs
+
+
+def is_timeseries_recording(path):
+    """path là thư mục .pmts hoặc file manifest.json bên trong nó."""
+    if os.path.basename(path) == MANIFEST_NAME:
+        path = os.path.dirname(path)
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def open_timeseries(path):
+    """Mở recording .pmts (thư mục hoặc manifest.json), trả về danh sách MappedSeries."""
+    if os.path.basename(path) == MANIFEST_NAME:
+        path = os.path.dirname(path)
+    manifest = read_manifest(path)
+    series = []
+    for entry in manifest['series']:
+        base = os.path.join(path, entry['file'])
+        series.append(MappedSeries(entry['key'], entry['name'], base + '.dat', base + '.idx'))
+    return series